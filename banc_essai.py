@@ -0,0 +1,266 @@
+"""
+Module d'évaluation des performances des fonctions de l'inventaire des bornes sur des inventaires synthétiques de la
+région de Québec, de 10³ à 10⁶ bornes.
+
+Les inventaires sont générés dans le même format que le fichier de la ville. Pour chaque taille, le temps
+d'exécution et la mémoire maximale allouée (mesurée avec tracemalloc) de chaque fonction sont enregistrés dans un
+rapport JSON, qui peut ensuite être comparé à un rapport de référence pour détecter les régressions. Les inventaires
+générés sont conservés dans le dossier .banc_essai, pour être réutilisés par les exécutions suivantes.
+
+Utilisation:
+    python banc_essai.py --tailles 1000 10000 --rapport rapport.json
+    python banc_essai.py --reference rapport.json --tolerance 0.25
+"""
+
+import argparse
+import csv
+from datetime import datetime, timezone
+import json
+from math import cos, pi, sin
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import inventaire_bornes as ibornes
+
+EN_TETE = ('ID', 'NO_BORNE', 'COTE_RUE', 'ID_VOIE_PUBLIQUE', 'NOM_TOPOGRAPHIQUE', 'LONGITUDE', 'LATITUDE')
+
+# dossier par défaut des inventaires générés, ignoré par git
+DOSSIER_INVENTAIRES = '.banc_essai'
+
+# région couverte par les inventaires générés (latitude, longitude)
+LATITUDES = (46.74, 46.88)
+LONGITUDES = (-71.40, -71.15)
+
+TYPES_RUE = ('Rue', 'Avenue', 'Boulevard', 'Chemin', 'Côte', 'Place')
+NOMS_RUE = ('Saint-Jean', 'Cartier', 'Maguire', 'Charest', 'de la Couronne', 'Saint-Joseph', 'Crémazie',
+            'René-Lévesque', 'des Érables', 'Myrand', 'Laurier', 'Belvédère', 'de Salaberry', 'Saint-Vallier',
+            'du Pont', 'Dorchester', 'Racine', 'Wilfrid-Hamel', 'Sainte-Anne', "D'Estimauville", 'Holland',
+            'Bourlamaque', 'Marie-de-l\'Incarnation', 'Lavigerie', 'de l\'Église', 'Frontenac', 'Champlain')
+
+# fonctions évaluées: (nom, fonction recevant les données préparées, True si le calcul est quadratique)
+CAS = (
+    ('lire_fichier_bornes', lambda donnees: ibornes.lire_fichier_bornes(donnees['fichier']), False),
+    ('selectionner_bornes_par_rue',
+     lambda donnees: ibornes.selectionner_bornes_par_rue(donnees['inventaire'], donnees['rue']), False),
+    ('selectionner_bornes_par_cote',
+     lambda donnees: ibornes.selectionner_bornes_par_cote(donnees['inventaire'], 'N'), False),
+    ('selectionner_borne_par_numero',
+     lambda donnees: ibornes.selectionner_borne_par_numero(donnees['inventaire'], donnees['numero']), False),
+    ('trouver_borne_plus_pres',
+     lambda donnees: ibornes.trouver_borne_plus_pres(donnees['inventaire'], donnees['numero'], False), False),
+    ('trouver_bornes_plus_eloignees', lambda donnees: ibornes.trouver_bornes_plus_eloignees(donnees['inventaire']),
+     False),
+    ('trouver_borne_centrale', lambda donnees: ibornes.trouver_borne_centrale(donnees['inventaire']), True),
+)
+
+
+def generer_inventaire(nom_fichier, nb_bornes, graine=0):
+    """
+    Génère un inventaire synthétique de bornes dans le format du fichier de la ville de Québec. Les bornes sont
+    placées le long de rues rectilignes réparties dans la région de Québec, en alternant les côtés de la rue.
+
+    Args:
+        nom_fichier (str): Le fichier texte à créer
+        nb_bornes (int): Le nombre de bornes à générer
+        graine (int): La graine du générateur aléatoire, pour obtenir toujours le même inventaire
+    """
+    generateur = random.Random(graine)
+    with open(nom_fichier, 'w', encoding='utf-8', newline='') as f:
+        ecrivain = csv.writer(f, lineterminator='\n')
+        ecrivain.writerow(EN_TETE)
+        numero = 0
+        id_voie = 0
+        while numero < nb_bornes:
+            nom_rue = generateur.choice(TYPES_RUE) + ' ' + generateur.choice(NOMS_RUE)
+            if id_voie >= len(TYPES_RUE) * len(NOMS_RUE):
+                nom_rue += f' {id_voie // (len(TYPES_RUE) * len(NOMS_RUE))}'
+            angle = generateur.uniform(0, pi)
+            cotes = ('N', 'S') if abs(cos(angle)) < 0.5 else ('E', 'O')
+            latitude = generateur.uniform(*LATITUDES)
+            longitude = generateur.uniform(*LONGITUDES)
+
+            for rang in range(min(generateur.randint(5, 60), nb_bornes - numero)):
+                distance = rang * generateur.uniform(0.01, 0.03)  # en kilomètres
+                ecrivain.writerow((100001 + numero, 1000 + numero, cotes[rang % 2], 200001 + id_voie, nom_rue,
+                                   longitude + distance * sin(angle) / 78.85, latitude + distance * cos(angle) / 110.6))
+                numero += 1
+            id_voie += 1
+
+
+def obtenir_inventaire_synthetique(dossier, nb_bornes, graine=0):
+    """
+    Retourne le fichier d'un inventaire synthétique, en le générant seulement s'il n'existe pas déjà dans le dossier.
+
+    Args:
+        dossier (str): Le dossier où les inventaires générés sont conservés
+        nb_bornes (int): Le nombre de bornes de l'inventaire
+        graine (int): La graine du générateur aléatoire
+
+    Returns:
+        str: Le chemin du fichier de l'inventaire
+    """
+    nom_fichier = os.path.join(dossier, f'bornes-synthetiques-{nb_bornes}-{graine}.txt')
+    if not os.path.exists(nom_fichier):
+        generer_inventaire(nom_fichier + '.tmp', nb_bornes, graine)
+        os.replace(nom_fichier + '.tmp', nom_fichier)
+    return nom_fichier
+
+
+def mesurer(fonction, donnees, nb_repetitions):
+    """
+    Mesure le temps d'exécution et la mémoire maximale allouée par une fonction.
+
+    Les temps sont mesurés sur nb_repetitions exécutions. La mémoire est mesurée lors d'une exécution
+    supplémentaire avec tracemalloc, pour que son coût ne fausse pas les temps.
+
+    Args:
+        fonction (function): La fonction à évaluer, qui reçoit les données
+        donnees (dict): Les données préparées pour la fonction
+        nb_repetitions (int): Le nombre d'exécutions chronométrées
+
+    Returns:
+        dict: Le temps minimal et le temps médian en secondes, ainsi que la mémoire maximale allouée en octets
+    """
+    temps = []
+    for _ in range(nb_repetitions):
+        debut = time.perf_counter()
+        fonction(donnees)
+        temps.append(time.perf_counter() - debut)
+
+    tracemalloc.start()
+    try:
+        fonction(donnees)
+        memoire_max = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {'temps_min_s': min(temps), 'temps_median_s': statistics.median(temps), 'memoire_max_octets': memoire_max}
+
+
+def executer_banc_essai(tailles, dossier, nb_repetitions=3, taille_max_quadratique=10000, fonctions=None, graine=0,
+                        afficher=print):
+    """
+    Évalue les fonctions de l'inventaire sur des inventaires synthétiques de différentes tailles.
+
+    Les fonctions en O(n²) ne sont évaluées que jusqu'à taille_max_quadratique bornes. Les recherches sont faites sur
+    l'Inventaire retourné par lire_fichier_bornes(): comme les temps retenus sont les plus courts, ils correspondent
+    à des appels où les index de l'inventaire sont déjà construits.
+
+    Args:
+        tailles (list): Les nombres de bornes des inventaires à évaluer
+        dossier (str): Le dossier où les inventaires générés sont conservés
+        nb_repetitions (int): Le nombre d'exécutions chronométrées par fonction
+        taille_max_quadratique (int): La taille maximale des inventaires pour les fonctions en O(n²)
+        fonctions (list): Les noms des fonctions à évaluer. Par défaut, toutes les fonctions de CAS.
+        graine (int): La graine du générateur des inventaires
+        afficher (function): La fonction utilisée pour afficher la progression
+
+    Returns:
+        dict: Le rapport, avec la description de l'environnement et la liste des résultats
+    """
+    resultats = []
+    for nb_bornes in tailles:
+        nom_fichier = obtenir_inventaire_synthetique(dossier, nb_bornes, graine)
+        inventaire = ibornes.lire_fichier_bornes(nom_fichier)
+        borne = inventaire[len(inventaire) // 2]
+        donnees = {'fichier': nom_fichier, 'inventaire': inventaire, 'rue': borne['Rue'], 'numero': borne['Numero']}
+
+        for nom, fonction, quadratique in CAS:
+            if (fonctions is not None and nom not in fonctions) or (quadratique and nb_bornes > taille_max_quadratique):
+                continue
+            mesure = mesurer(fonction, donnees, nb_repetitions)
+            afficher(f"{nom:32} {nb_bornes:>9} bornes: {mesure['temps_min_s'] * 1000:12.3f} ms "
+                     f"{mesure['memoire_max_octets'] / 2 ** 20:10.2f} Mio")
+            resultats.append({'fonction': nom, 'nb_bornes': nb_bornes, 'repetitions': nb_repetitions, **mesure})
+
+    return {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plateforme': platform.platform(),
+        'graine': graine,
+        'resultats': resultats,
+    }
+
+
+def comparer_rapports(rapport, reference, tolerance=0.25):
+    """
+    Compare les temps d'un rapport avec ceux d'un rapport de référence. Seuls les résultats présents dans les deux
+    rapports (même fonction et même taille) sont comparés.
+
+    Args:
+        rapport (dict): Le rapport à vérifier, tel que retourné par executer_banc_essai()
+        reference (dict): Le rapport de référence
+        tolerance (float): L'augmentation relative du temps minimal tolérée avant de signaler une régression
+
+    Returns:
+        list: Les comparaisons, sous forme de dictionnaires contenant la fonction, la taille, les deux temps
+            minimaux, leur ratio et un booléen indiquant s'il s'agit d'une régression
+    """
+    temps_reference = {(resultat['fonction'], resultat['nb_bornes']): resultat['temps_min_s']
+                       for resultat in reference['resultats']}
+    comparaisons = []
+    for resultat in rapport['resultats']:
+        cle = (resultat['fonction'], resultat['nb_bornes'])
+        if cle not in temps_reference:
+            continue
+        ratio = resultat['temps_min_s'] / temps_reference[cle] if temps_reference[cle] > 0 else 1.0
+        comparaisons.append({'fonction': cle[0], 'nb_bornes': cle[1], 'temps_min_s': resultat['temps_min_s'],
+                             'temps_reference_s': temps_reference[cle], 'ratio': ratio,
+                             'regression': ratio > 1 + tolerance})
+    return comparaisons
+
+
+def main(arguments=None):
+    """
+    Exécute le banc d'essai à partir des arguments de la ligne de commande.
+
+    Args:
+        arguments (list): Les arguments de la ligne de commande. Par défaut, ceux de sys.argv.
+
+    Returns:
+        int: 0 si aucune régression n'est détectée, 1 sinon
+    """
+    analyseur = argparse.ArgumentParser(description="Banc d'essai des fonctions de l'inventaire des bornes")
+    analyseur.add_argument('--tailles', type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                           help="nombres de bornes des inventaires générés")
+    analyseur.add_argument('--repetitions', type=int, default=3, help="nombre d'exécutions chronométrées")
+    analyseur.add_argument('--taille-max-quadratique', type=int, default=10000,
+                           help="taille maximale des inventaires pour les fonctions en O(n²)")
+    analyseur.add_argument('--fonctions', nargs='+', choices=[nom for nom, _, _ in CAS],
+                           help="fonctions à évaluer (toutes par défaut)")
+    analyseur.add_argument('--graine', type=int, default=0, help="graine du générateur des inventaires")
+    analyseur.add_argument('--dossier', default=DOSSIER_INVENTAIRES,
+                           help="dossier où conserver les inventaires générés, réutilisés d'une exécution à l'autre")
+    analyseur.add_argument('--rapport', default='banc_essai.json', help="fichier JSON du rapport")
+    analyseur.add_argument('--reference', help="rapport JSON de référence à comparer")
+    analyseur.add_argument('--tolerance', type=float, default=0.25,
+                           help="augmentation relative du temps tolérée par rapport à la référence")
+    options = analyseur.parse_args(arguments)
+
+    os.makedirs(options.dossier, exist_ok=True)
+    rapport = executer_banc_essai(options.tailles, options.dossier, options.repetitions, options.taille_max_quadratique,
+                                  options.fonctions, options.graine)
+
+    with open(options.rapport, 'w', encoding='utf-8') as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+    print(f'Rapport enregistré dans {options.rapport}')
+
+    if options.reference is None:
+        return 0
+
+    with open(options.reference, encoding='utf-8') as f:
+        reference = json.load(f)
+    comparaisons = comparer_rapports(rapport, reference, options.tolerance)
+    for comparaison in comparaisons:
+        print(f"{comparaison['fonction']:32} {comparaison['nb_bornes']:>9} bornes: x{comparaison['ratio']:.2f}"
+              + ('  RÉGRESSION' if comparaison['regression'] else ''))
+    return 1 if any(comparaison['regression'] for comparaison in comparaisons) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,325 @@
+"""
+Module gérant une copie binaire (instantané) de l'inventaire des bornes, enregistrée à côté du fichier texte. Au
+démarrage suivant, l'inventaire est reconstruit à partir de cet instantané projeté en mémoire, sans relire ni
+analyser le fichier texte: les colonnes sont copiées telles quelles, les bornes sont créées directement à partir
+d'elles et les index de l'inventaire ne sont construits qu'à leur première utilisation. L'instantané est ignoré et
+régénéré dès que la taille, la date de modification (ou, sur demande, le contenu) du fichier source ne correspond
+plus, ou s'il est tronqué ou corrompu.
+
+Format de l'instantané (entiers little-endian pour l'en-tête, tableaux dans l'ordre d'octets de la machine):
+    - en-tête: signature, ordre des octets, taille et date du fichier source, empreinte SHA-256 du fichier source,
+      nombre de bornes, nombre de chaînes et taille de la table des chaînes;
+    - colonnes de n float (latitude, longitude), puis de n entiers (indices du numéro, du côté, de la rue et des
+      attributs ATTRIBUTS_SOURCE dans la table des chaînes);
+    - table des chaînes: les chaînes encodées en UTF-8, séparées par le caractère nul.
+"""
+
+from array import array
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+import inventaire_bornes as ibornes
+import metriques_distance
+
+SIGNATURE = b'BORNES04'
+FORMAT_EN_TETE = '<8s8sqq32sqqq'
+TAILLE_EN_TETE = struct.calcsize(FORMAT_EN_TETE)
+
+
+def obtenir_chemin_cache(nom_fichier):
+    """
+    Retourne le chemin de l'instantané associé à un fichier d'inventaire.
+
+    Args:
+        nom_fichier (str): Le fichier texte contenant l'inventaire des bornes
+
+    Returns:
+        str: Le chemin de l'instantané
+    """
+    return nom_fichier + '.cache'
+
+
+def calculer_empreinte(nom_fichier):
+    """
+    Calcule l'empreinte SHA-256 du contenu d'un fichier.
+
+    Args:
+        nom_fichier (str): Le nom du fichier
+
+    Returns:
+        bytes: L'empreinte sur 32 octets
+    """
+    empreinte = hashlib.sha256()
+    with open(nom_fichier, 'rb') as f:
+        for bloc in iter(lambda: f.read(1 << 20), b''):
+            empreinte.update(bloc)
+    return empreinte.digest()
+
+
+def ecrire_cache(inventaire, nom_fichier):
+    """
+    Enregistre l'instantané d'un inventaire lu à partir d'un fichier texte. L'écriture passe par un fichier temporaire
+    propre à chaque appel, pour qu'un instantané incomplet ne soit jamais lu, même si plusieurs processus écrivent
+    l'instantané en même temps.
+
+    Args:
+        inventaire (list): La liste des bornes lues dans le fichier
+        nom_fichier (str): Le fichier texte dont l'inventaire provient
+
+    Raises:
+        OSError: Si l'instantané ne peut pas être écrit
+        ValueError: Si une chaîne de l'inventaire contient le caractère nul
+    """
+    chaines = {}
+    indices = {cle: array('i') for cle in ('Numero', 'Cote', 'Rue') + ibornes.ATTRIBUTS_SOURCE}
+    latitudes = array('d')
+    longitudes = array('d')
+    for borne in inventaire:
+        valeurs = dict(borne)
+        valeurs.update(ibornes.obtenir_attributs_borne(inventaire, borne))
+        for cle, colonne in indices.items():
+            colonne.append(chaines.setdefault(str(valeurs.get(cle, '')), len(chaines)))
+        latitudes.append(float(borne['Coordonnees'][0]))
+        longitudes.append(float(borne['Coordonnees'][1]))
+
+    if any('\0' in chaine for chaine in chaines):
+        raise ValueError("le caractère nul ne peut pas être enregistré dans la table des chaînes")
+    table = '\0'.join(chaines).encode('utf-8')
+
+    etat = os.stat(nom_fichier)
+    en_tete = struct.pack(FORMAT_EN_TETE, SIGNATURE, sys.byteorder.encode('ascii').ljust(8), etat.st_size,
+                          etat.st_mtime_ns, calculer_empreinte(nom_fichier), len(latitudes), len(chaines), len(table))
+
+    chemin = obtenir_chemin_cache(nom_fichier)
+    descripteur, chemin_temporaire = tempfile.mkstemp(prefix=os.path.basename(chemin) + '.', suffix='.tmp',
+                                                      dir=os.path.dirname(chemin) or '.')
+    try:
+        with os.fdopen(descripteur, 'wb') as f:
+            f.write(en_tete)
+            for colonne in (latitudes, longitudes, *indices.values()):
+                f.write(b'\0' * (-f.tell() % colonne.itemsize))
+                colonne.tofile(f)
+            f.write(table)
+        os.replace(chemin_temporaire, chemin)
+    finally:
+        if os.path.exists(chemin_temporaire):
+            os.remove(chemin_temporaire)
+
+
+def lire_cache(nom_fichier, verifier_contenu=False, compacte=False):
+    """
+    Reconstruit l'inventaire à partir de l'instantané associé à un fichier texte, s'il existe et est à jour.
+
+    Les colonnes de l'instantané sont copiées en bloc hors de sa projection en mémoire et conservées comme colonnes
+    de l'inventaire (voir obtenir_colonnes()). Les index de l'inventaire sont différés (voir Inventaire).
+
+    Args:
+        nom_fichier (str): Le fichier texte contenant l'inventaire des bornes
+        verifier_contenu (bool): True pour comparer aussi l'empreinte du contenu du fichier texte, en plus de sa
+            taille et de sa date de modification
+        compacte (bool): True pour représenter les bornes avec la classe Borne plutôt qu'avec des dictionnaires
+
+    Returns:
+        Inventaire: L'inventaire des bornes, ou None si l'instantané est absent, invalide ou périmé
+    """
+    chemin = obtenir_chemin_cache(nom_fichier)
+    try:
+        etat = os.stat(nom_fichier)
+        f = open(chemin, 'rb')
+    except OSError:
+        return None
+
+    with f:
+        try:
+            colonnes = _lire_colonnes(f, nom_fichier, etat, verifier_contenu)
+        except (OSError, ValueError, struct.error):
+            return None  # instantané illisible: il sera régénéré
+    if colonnes is None:
+        return None
+
+    latitudes, longitudes, numeros, cotes, rues, *attributs, chaines = colonnes
+    fabrique = ibornes.creer_borne_compacte if compacte else ibornes.creer_borne
+    bornes = [fabrique(chaines[numero], chaines[cote], chaines[rue], longitude, latitude)
+              for numero, cote, rue, latitude, longitude in zip(numeros, cotes, rues, latitudes, longitudes)]
+    inventaire = ibornes.Inventaire(bornes, differer_index=True)
+    inventaire._attributs = {id(borne): attributs_borne for borne, attributs_borne in
+                             zip(bornes, zip(*(map(chaines.__getitem__, colonne) for colonne in attributs)))}
+    inventaire._colonnes = {
+        'Numero': [borne['Numero'] for borne in bornes],
+        'Cote': [chaines[cote] for cote in cotes],
+        'Rue': [chaines[rue] for rue in rues],
+        'Latitude': latitudes,
+        'Longitude': longitudes,
+        'X': array('d', [latitude * metriques_distance.KM_PAR_DEGRE_LATITUDE for latitude in latitudes]),
+        'Y': array('d', [longitude * metriques_distance.KM_PAR_DEGRE_LONGITUDE for longitude in longitudes]),
+    }
+    return inventaire
+
+
+def _lire_colonnes(f, nom_fichier, etat, verifier_contenu):
+    """
+    Lit les colonnes d'un instantané, après avoir vérifié son en-tête et la cohérence de ses sections.
+
+    Args:
+        f (file): L'instantané ouvert en lecture binaire
+        nom_fichier (str): Le fichier texte contenant l'inventaire des bornes
+        etat (os.stat_result): L'état du fichier texte
+        verifier_contenu (bool): True pour comparer aussi l'empreinte du contenu du fichier texte
+
+    Returns:
+        list: Les colonnes des latitudes et des longitudes, les colonnes d'indices (numéro, côté, rue et attributs)
+            et la liste des chaînes, ou None si l'instantané est périmé ou incohérent
+    """
+    if os.fstat(f.fileno()).st_size < TAILLE_EN_TETE:
+        return None
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as projection:
+        (signature, ordre_octets, taille, date, empreinte,
+         nb_bornes, nb_chaines, taille_table) = struct.unpack_from(FORMAT_EN_TETE, projection)
+        if (signature != SIGNATURE or ordre_octets.rstrip() != sys.byteorder.encode('ascii')
+                or taille != etat.st_size or date != etat.st_mtime_ns):
+            return None
+        if verifier_contenu and empreinte != calculer_empreinte(nom_fichier):
+            return None
+
+        # les sections annoncées par l'en-tête doivent remplir exactement le fichier
+        if min(nb_bornes, nb_chaines, taille_table) < 0:
+            return None
+        sections = []
+        position = TAILLE_EN_TETE
+        for code in 'dd' + 'i' * (3 + len(ibornes.ATTRIBUTS_SOURCE)):
+            taille_element = array(code).itemsize
+            position += -position % taille_element
+            sections.append((code, position, position + nb_bornes * taille_element))
+            position += nb_bornes * taille_element
+        if position + taille_table != len(projection):
+            return None
+
+        # copies en bloc: aucune vue sur la projection ne survit à sa fermeture
+        colonnes = []
+        for code, debut, fin in sections:
+            colonne = array(code)
+            colonne.frombytes(projection[debut:fin])
+            colonnes.append(colonne)
+        chaines = projection[position:].decode('utf-8').split('\0') if nb_chaines else []
+
+    if len(chaines) != nb_chaines:
+        return None
+    for colonne in colonnes[2:]:
+        if colonne and not 0 <= min(colonne) <= max(colonne) < nb_chaines:
+            return None
+    return colonnes + [chaines]
+
+
+def charger_inventaire(nom_fichier, verifier_contenu=False, compacte=False):
+    """
+    Charge l'inventaire des bornes d'un fichier texte en utilisant son instantané s'il est à jour. Sinon, le fichier
+    texte est lu avec lire_fichier_bornes() et l'instantané est régénéré.
+
+    Args:
+        nom_fichier (str): Le fichier texte contenant l'inventaire des bornes
+        verifier_contenu (bool): True pour valider l'instantané avec l'empreinte du contenu du fichier texte
+        compacte (bool): True pour représenter les bornes avec la classe Borne plutôt qu'avec des dictionnaires
+
+    Returns:
+        Inventaire: L'inventaire des bornes
+    """
+    inventaire = lire_cache(nom_fichier, verifier_contenu, compacte)
+    if inventaire is not None:
+        return inventaire
+
+    inventaire = ibornes.lire_fichier_bornes(nom_fichier, compacte)
+    if os.path.exists(nom_fichier):
+        try:
+            ecrire_cache(inventaire, nom_fichier)
+        except (OSError, ValueError):
+            pass  # dossier en lecture seule, chaîne impossible à enregistrer: l'instantané n'est qu'une optimisation
+    return inventaire
+
+
+if __name__ == '__main__':
+    import shutil
+    import tempfile
+
+    print('Exécution des tests...')
+    print('-----------------------')
+
+    with tempfile.TemporaryDirectory() as dossier_temporaire:
+        nom_fichier_test = os.path.join(dossier_temporaire, 'bornes.txt')
+        shutil.copyfile('vdq-bornestationnement.txt', nom_fichier_test)
+        inventaire_texte = ibornes.lire_fichier_bornes(nom_fichier_test)
+
+# tests pour charger_inventaire et lire_cache
+        assert lire_cache(nom_fichier_test) is None
+        assert charger_inventaire(nom_fichier_test) == inventaire_texte
+        assert os.path.exists(obtenir_chemin_cache(nom_fichier_test))
+        inventaire_cache = lire_cache(nom_fichier_test, verifier_contenu=True)
+        assert isinstance(inventaire_cache, ibornes.Inventaire)
+        assert inventaire_cache == inventaire_texte
+        assert ibornes.selectionner_borne_par_numero(inventaire_cache, 4005)['Rue'] == '1re Avenue'
+        assert ibornes.obtenir_attributs_borne(inventaire_cache, inventaire_cache[0]) == \
+            ibornes.obtenir_attributs_borne(inventaire_texte, inventaire_texte[0])
+        assert lire_cache(nom_fichier_test, compacte=True) == ibornes.lire_fichier_bornes(nom_fichier_test, True)
+        assert ibornes.obtenir_colonnes(inventaire_cache) == ibornes.obtenir_colonnes(list(inventaire_texte))
+
+        # les index différés sont construits à partir du contenu, même après une modification
+        inventaire_cache = lire_cache(nom_fichier_test)
+        inventaire_cache.append(ibornes.creer_borne('99999', 'N', 'Rue Nouvelle', -71.2, 46.8))
+        assert ibornes.retirer_borne(inventaire_cache, 3008)
+        assert ibornes.selectionner_borne_par_numero(inventaire_cache, 99999)['Rue'] == 'Rue Nouvelle'
+        assert ibornes.selectionner_borne_par_numero(inventaire_cache, 3008) == {'Numero': -1}
+        assert ibornes.selectionner_bornes_par_rue(inventaire_cache, 'Nouvelle') == [inventaire_cache[-1]]
+
+        # un instantané tronqué ou corrompu est ignoré, puis régénéré
+        with open(obtenir_chemin_cache(nom_fichier_test), 'rb') as f:
+            contenu_valide = f.read()
+        (signature, ordre_octets, taille, date, empreinte,
+         nb_bornes, nb_chaines, taille_table) = struct.unpack_from(FORMAT_EN_TETE, contenu_valide)
+        debut_indices = TAILLE_EN_TETE + 16 * nb_bornes
+        invalides = [contenu_valide[:len(contenu_valide) // 2], contenu_valide[:TAILLE_EN_TETE + 3], b'',
+                     contenu_valide[:-1],
+                     struct.pack(FORMAT_EN_TETE, signature, ordre_octets, taille, date, empreinte, nb_bornes + 1,
+                                 nb_chaines, taille_table) + contenu_valide[TAILLE_EN_TETE:],
+                     struct.pack(FORMAT_EN_TETE, signature, ordre_octets, taille, date, empreinte, nb_bornes,
+                                 nb_chaines + 1, taille_table) + contenu_valide[TAILLE_EN_TETE:],
+                     contenu_valide[:debut_indices] + array('i', [nb_chaines]).tobytes()
+                     + contenu_valide[debut_indices + 4:],
+                     contenu_valide[:-4] + b'\xff\xfe\xfd\xfc']
+        for contenu_invalide in invalides:
+            with open(obtenir_chemin_cache(nom_fichier_test), 'wb') as f:
+                f.write(contenu_invalide)
+            assert lire_cache(nom_fichier_test) is None
+            assert charger_inventaire(nom_fichier_test) == inventaire_texte
+            assert lire_cache(nom_fichier_test) == inventaire_texte
+
+        # des écritures simultanées ne se partagent pas de fichier temporaire
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(4) as executeur:
+            list(executeur.map(lambda _: ecrire_cache(inventaire_texte, nom_fichier_test), range(8)))
+        assert lire_cache(nom_fichier_test) == inventaire_texte
+        assert [nom for nom in os.listdir(dossier_temporaire) if nom.endswith('.tmp')] == []
+
+        with open(nom_fichier_test, 'a', encoding='utf-8') as f:
+            f.write("999999,9999,N,1,Rue Nouvelle,-71.2,46.8\n")
+        assert lire_cache(nom_fichier_test) is None
+        assert ibornes.nombre_de_bornes(charger_inventaire(nom_fichier_test)) == 1794
+        assert ibornes.nombre_de_bornes(lire_cache(nom_fichier_test)) == 1794
+
+        etat = os.stat(nom_fichier_test)
+        with open(nom_fichier_test, 'r+', encoding='utf-8') as f:
+            f.seek(etat.st_size - 5)
+            f.write("47.8\n")
+            f.truncate()
+        os.utime(nom_fichier_test, ns=(etat.st_atime_ns, etat.st_mtime_ns))
+        assert lire_cache(nom_fichier_test) is not None
+        assert lire_cache(nom_fichier_test, verifier_contenu=True) is None
+
+        inventaire_vide = os.path.join(dossier_temporaire, 'vide.txt')
+        with open(inventaire_vide, 'w', encoding='utf-8') as f:
+            f.write("ID,NO_BORNE,COTE_RUE,ID_VOIE_PUBLIQUE,NOM_TOPOGRAPHIQUE,LONGITUDE,LATITUDE\n")
+        assert charger_inventaire(inventaire_vide) == []
+        assert lire_cache(inventaire_vide) == []
+    print('cache_inventaire: OK')
@@ -0,0 +1,151 @@
+"""
+Module offrant une cache des résultats des requêtes sur l'inventaire des bornes (recherches par rue, par côté, borne
+la plus proche, bornes les plus éloignées, borne centrale, etc.).
+
+Les résultats sont conservés dans une cache LRU (les moins récemment utilisés sont retirés en premier) de taille
+configurable. La clé d'un résultat comprend la fonction, ses paramètres et la version de l'Inventaire interrogé.
+Comme chaque modification d'un Inventaire (dont ajouter_borne() et retirer_borne()) incrémente sa version, un
+résultat calculé avant une modification n'est jamais retourné après.
+"""
+
+from collections import OrderedDict
+
+import inventaire_bornes as ibornes
+
+
+class CacheRequetes:
+    """
+    Cache LRU des résultats des fonctions de requête sur un Inventaire.
+
+    Seuls les appels sur un Inventaire dont les autres paramètres sont hachables sont mis en cache; les autres
+    appels sont simplement transmis à la fonction. Les listes retournées sont des copies, pour que l'appelant
+    puisse les modifier sans altérer la cache.
+    """
+
+    def __init__(self, taille_max=128):
+        """
+        Args:
+            taille_max (int): Le nombre maximal de résultats conservés. Avec 0, aucun résultat n'est conservé.
+        """
+        self.taille_max = taille_max
+        self.nb_succes = 0
+        self.nb_echecs = 0
+        self._resultats = OrderedDict()
+
+    def __len__(self):
+        return len(self._resultats)
+
+    def executer(self, fonction, inventaire, *args):
+        """
+        Retourne le résultat de fonction(inventaire, *args), en le calculant seulement s'il n'est pas déjà dans la
+        cache pour la version courante de l'inventaire.
+
+        Args:
+            fonction (function): La fonction de requête, qui reçoit l'inventaire en premier paramètre
+            inventaire (list): La liste des bornes de l'inventaire
+            args: Les autres paramètres de la fonction
+
+        Returns:
+            Le résultat de la fonction
+        """
+        if not isinstance(inventaire, ibornes.Inventaire) or self.taille_max <= 0:
+            return fonction(inventaire, *args)
+
+        cle = (fonction, id(inventaire), inventaire.version, args)
+        try:
+            element = self._resultats.get(cle)
+        except TypeError:  # paramètre non hachable
+            return fonction(inventaire, *args)
+
+        if element is not None and element[0] is inventaire:
+            self._resultats.move_to_end(cle)
+            self.nb_succes += 1
+            resultat = element[1]
+        else:
+            self.nb_echecs += 1
+            resultat = fonction(inventaire, *args)
+            self._resultats[cle] = (inventaire, resultat)
+            while len(self._resultats) > self.taille_max:
+                self._resultats.popitem(last=False)
+
+        return list(resultat) if isinstance(resultat, list) else resultat
+
+    def envelopper(self, fonction):
+        """
+        Construit une fonction qui s'utilise comme la fonction donnée, mais dont les résultats passent par la cache.
+
+        Args:
+            fonction (function): La fonction de requête, qui reçoit l'inventaire en premier paramètre
+
+        Returns:
+            function: La fonction utilisant la cache
+        """
+        def fonction_en_cache(inventaire, *args):
+            return self.executer(fonction, inventaire, *args)
+
+        fonction_en_cache.__name__ = fonction.__name__
+        fonction_en_cache.__doc__ = fonction.__doc__
+        return fonction_en_cache
+
+    def vider(self):
+        """
+        Retire tous les résultats de la cache.
+        """
+        self._resultats.clear()
+
+
+if __name__ == '__main__':
+    print('Exécution des tests...')
+    print('-----------------------')
+
+    inventaire_test = ibornes.lire_fichier_bornes('vdq-bornestationnement-reduit.txt')
+    appels = []
+
+    def compter_appels(inventaire, *args):
+        appels.append(args)
+        return ibornes.selectionner_bornes_par_rue(inventaire, *args)
+
+# tests pour CacheRequetes.executer
+    cache = CacheRequetes(taille_max=2)
+    resultat_1 = cache.executer(compter_appels, inventaire_test, 'Charest')
+    resultat_2 = cache.executer(compter_appels, inventaire_test, 'Charest')
+    assert resultat_1 == resultat_2 == ibornes.selectionner_bornes_par_rue(inventaire_test, 'Charest')
+    assert resultat_1 is not resultat_2
+    assert len(appels) == 1 and (cache.nb_succes, cache.nb_echecs) == (1, 1)
+    resultat_2.clear()
+    assert cache.executer(compter_appels, inventaire_test, 'Charest') == resultat_1
+
+    # un ajout ou un retrait invalide les résultats
+    borne_nouvelle = ibornes.creer_borne('9999', 'N', 'Boulevard Charest Ouest', -71.23, 46.81)
+    assert ibornes.ajouter_borne(inventaire_test, borne_nouvelle)
+    assert cache.executer(compter_appels, inventaire_test, 'Charest')[-1] is borne_nouvelle
+    assert ibornes.retirer_borne(inventaire_test, '9999')
+    assert cache.executer(compter_appels, inventaire_test, 'Charest') == resultat_1
+    assert len(appels) == 3
+
+    # le résultat le moins récemment utilisé est retiré
+    cache.executer(compter_appels, inventaire_test, '1re')
+    cache.executer(compter_appels, inventaire_test, 'Rue')
+    assert len(cache) == 2
+    cache.executer(compter_appels, inventaire_test, 'Charest')
+    assert len(appels) == 6
+
+    # les listes et les paramètres non hachables ne sont pas mis en cache
+    assert cache.executer(compter_appels, list(inventaire_test), 'Charest') == resultat_1
+    assert cache.executer(ibornes.selectionner_borne_par_numero, inventaire_test, ['3008']) == {'Numero': -1}
+    assert len(appels) == 7
+    assert CacheRequetes(0).executer(compter_appels, inventaire_test, 'Charest') == resultat_1
+    assert len(appels) == 8
+
+
+# tests pour CacheRequetes.envelopper
+    trouver_borne_centrale = CacheRequetes().envelopper(ibornes.trouver_borne_centrale)
+    assert trouver_borne_centrale.__name__ == 'trouver_borne_centrale'
+    assert trouver_borne_centrale(inventaire_test) is trouver_borne_centrale(inventaire_test)
+    assert trouver_borne_centrale(inventaire_test) == ibornes.trouver_borne_centrale(inventaire_test)
+
+
+# tests pour CacheRequetes.vider
+    cache.vider()
+    assert len(cache) == 0
+    print('cache_requetes: OK')
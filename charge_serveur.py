@@ -0,0 +1,236 @@
+"""
+Module générateur de charge pour le serveur de requêtes (voir serveur_bornes). Plusieurs clients simultanés envoient
+chacun une suite de requêtes et attendent chaque réponse avant d'envoyer la suivante. Le débit total et la
+distribution des latences (dont le 99e centile) sont ensuite affichés.
+
+Les requêtes sont lues dans un fichier (une par ligne, dans le format du module requetes_bornes) ou générées à partir
+de l'inventaire: recherches par rue et par côté, distances et bornes les plus proches.
+
+Utilisation:
+    python charge_serveur.py --port 8765 --clients 16 --requetes 2000
+    python charge_serveur.py --unix /tmp/bornes.sock --fichier-requetes requetes.txt
+    python charge_serveur.py --tests
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import inventaire_bornes as ibornes
+
+
+def generer_requetes(inventaire, nb_requetes, graine=0, proportion_lourdes=0.0):
+    """
+    Génère un mélange de requêtes portant sur les bornes d'un inventaire.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        nb_requetes (int): Le nombre de requêtes à générer
+        graine (int): La graine du générateur aléatoire
+        proportion_lourdes (float): La proportion de requêtes coûteuses (borne centrale, bornes les plus éloignées)
+
+    Returns:
+        list: Les lignes de requêtes
+    """
+    generateur = random.Random(graine)
+    requetes = []
+    for _ in range(nb_requetes):
+        borne = generateur.choice(inventaire)
+        if generateur.random() < proportion_lourdes:
+            requetes.append(generateur.choice(('centrale', 'eloignees')))
+            continue
+        requetes.append(generateur.choice((
+            f"rue {borne['Rue']}",
+            json.dumps({'requete': 'cote', 'cote': borne['Cote']}),  # le côté peut être vide
+            f"numero {borne['Numero']}",
+            f"distance {borne['Numero']} {generateur.choice(inventaire)['Numero']}",
+            f"plus_pres {borne['Numero']}",
+            f"plus_pres {borne['Numero']} autre_rue",
+        )))
+    return requetes
+
+
+async def _executer_client(requetes, hote, port, chemin_unix, latences):
+    """
+    Envoie des requêtes au serveur sur une connexion, une à la fois, et mesure la latence de chacune.
+
+    Args:
+        requetes (list): Les lignes de requêtes à envoyer
+        hote (str): L'adresse TCP du serveur
+        port (int): Le port TCP du serveur
+        chemin_unix (str): Le chemin du socket Unix du serveur, utilisé à la place de TCP s'il est donné
+        latences (list): La liste où ajouter les latences mesurées, en secondes
+
+    Returns:
+        int: Le nombre de réponses en erreur
+    """
+    if chemin_unix is not None:
+        lecteur, ecrivain = await asyncio.open_unix_connection(chemin_unix, limit=2 ** 24)
+    else:
+        lecteur, ecrivain = await asyncio.open_connection(hote, port, limit=2 ** 24)
+
+    nb_erreurs = 0
+    try:
+        for requete in requetes:
+            debut = time.perf_counter()
+            ecrivain.write(requete.encode('utf-8') + b'\n')
+            await ecrivain.drain()
+            reponse = await lecteur.readline()
+            latences.append(time.perf_counter() - debut)
+            if not reponse:
+                raise ConnectionError('connexion fermée par le serveur')
+            if 'erreur' in json.loads(reponse):
+                nb_erreurs += 1
+    finally:
+        ecrivain.close()
+    return nb_erreurs
+
+
+def _calculer_centile(valeurs_triees, centile):
+    """
+    Calcule un centile d'une liste triée par la méthode du rang le plus proche.
+
+    Args:
+        valeurs_triees (list): Les valeurs triées
+        centile (float): Le centile recherché, entre 0 et 100
+
+    Returns:
+        float: La valeur du centile
+    """
+    rang = max(1, -(-len(valeurs_triees) * centile // 100))
+    return valeurs_triees[int(rang) - 1]
+
+
+async def mesurer_charge(requetes, nb_clients, hote='127.0.0.1', port=8765, chemin_unix=None):
+    """
+    Répartit des requêtes entre plusieurs clients simultanés et mesure le débit et les latences du serveur.
+
+    Args:
+        requetes (list): Les lignes de requêtes à envoyer
+        nb_clients (int): Le nombre de connexions simultanées
+        hote (str): L'adresse TCP du serveur
+        port (int): Le port TCP du serveur
+        chemin_unix (str): Le chemin du socket Unix du serveur, utilisé à la place de TCP s'il est donné
+
+    Returns:
+        dict: Le nombre de requêtes et d'erreurs, la durée totale, le débit (requêtes par seconde) et les centiles
+            50, 90 et 99 des latences en secondes
+    """
+    latences = []
+    debut = time.perf_counter()
+    nb_erreurs = await asyncio.gather(*(_executer_client(requetes[client::nb_clients], hote, port, chemin_unix,
+                                                         latences) for client in range(nb_clients)))
+    duree = time.perf_counter() - debut
+
+    latences.sort()
+    return {
+        'requetes': len(latences),
+        'erreurs': sum(nb_erreurs),
+        'duree_s': duree,
+        'debit_par_s': len(latences) / duree if duree > 0 else 0.0,
+        'p50_s': _calculer_centile(latences, 50) if latences else 0.0,
+        'p90_s': _calculer_centile(latences, 90) if latences else 0.0,
+        'p99_s': _calculer_centile(latences, 99) if latences else 0.0,
+    }
+
+
+def main(arguments=None):
+    """
+    Exécute le générateur de charge à partir des arguments de la ligne de commande.
+
+    Args:
+        arguments (list): Les arguments de la ligne de commande. Par défaut, ceux de sys.argv.
+    """
+    analyseur = argparse.ArgumentParser(description="Générateur de charge pour le serveur de requêtes des bornes")
+    analyseur.add_argument('--hote', default='127.0.0.1', help="adresse TCP du serveur")
+    analyseur.add_argument('--port', type=int, default=8765, help="port TCP du serveur")
+    analyseur.add_argument('--unix', help="chemin du socket Unix du serveur, à utiliser à la place de TCP")
+    analyseur.add_argument('--clients', type=int, default=8, help="nombre de connexions simultanées")
+    analyseur.add_argument('--requetes', type=int, default=1000, help="nombre de requêtes générées")
+    analyseur.add_argument('--proportion-lourdes', type=float, default=0.0,
+                           help="proportion de requêtes centrale et eloignees parmi les requêtes générées")
+    analyseur.add_argument('--inventaire', default='vdq-bornestationnement.txt',
+                           help="inventaire servant à générer les requêtes")
+    analyseur.add_argument('--fichier-requetes', help="fichier de requêtes à utiliser au lieu d'en générer")
+    analyseur.add_argument('--json', action='store_true', help="afficher le résultat en JSON")
+    options = analyseur.parse_args(arguments)
+
+    if options.fichier_requetes:
+        with open(options.fichier_requetes, encoding='utf-8') as f:
+            requetes = [ligne.strip() for ligne in f if ligne.strip() and not ligne.startswith('#')]
+    else:
+        requetes = generer_requetes(ibornes.lire_fichier_bornes(options.inventaire), options.requetes,
+                                    proportion_lourdes=options.proportion_lourdes)
+
+    mesures = asyncio.run(mesurer_charge(requetes, options.clients, options.hote, options.port, options.unix))
+    if options.json:
+        print(json.dumps(mesures, indent=2))
+    else:
+        print(f"{mesures['requetes']} requêtes ({mesures['erreurs']} en erreur) en {mesures['duree_s']:.2f} s: "
+              f"{mesures['debit_par_s']:.0f} requêtes/s")
+        print(f"latence p50 {mesures['p50_s'] * 1000:.2f} ms, p90 {mesures['p90_s'] * 1000:.2f} ms, "
+              f"p99 {mesures['p99_s'] * 1000:.2f} ms")
+
+
+if __name__ == '__main__' and sys.argv[1:] != ['--tests']:
+    main()
+elif __name__ == '__main__':
+    import requetes_bornes
+    from serveur_bornes import ServeurBornes
+
+    print('Exécution des tests...')
+    print('-----------------------')
+
+    inventaire_test = ibornes.lire_fichier_bornes('vdq-bornestationnement.txt')
+
+# tests pour generer_requetes
+    requetes_test = generer_requetes(inventaire_test, 300, graine=3, proportion_lourdes=0.1)
+    assert len(requetes_test) == 300
+    assert requetes_test == generer_requetes(inventaire_test, 300, graine=3, proportion_lourdes=0.1)
+    assert requetes_test != generer_requetes(inventaire_test, 300, graine=4, proportion_lourdes=0.1)
+    assert all(requetes_bornes.analyser_requete(requete) is not None for requete in requetes_test)
+    assert {'centrale', 'eloignees'} & set(requetes_test)
+    assert not {'centrale', 'eloignees'} & set(generer_requetes(inventaire_test, 300))
+
+# tests pour _calculer_centile
+    assert _calculer_centile([5], 50) == 5
+    assert _calculer_centile([1, 2, 3, 4], 0) == 1
+    assert _calculer_centile([1, 2, 3, 4], 50) == 2
+    assert _calculer_centile([1, 2, 3, 4], 51) == 3
+    assert _calculer_centile([1, 2, 3, 4], 100) == 4
+    assert _calculer_centile(list(range(1, 201)), 99) == 198
+
+# tests pour mesurer_charge
+    def compter_erreurs(requetes):
+        nb_erreurs = 0
+        for requete in requetes:
+            try:
+                requetes_bornes.executer_requete(inventaire_test, *requetes_bornes.analyser_requete(requete))
+            except requetes_bornes.ERREURS_REQUETE:
+                nb_erreurs += 1
+        return nb_erreurs
+
+    async def mesurer_charge_locale(requetes, nb_clients):
+        serveur_test = ServeurBornes('vdq-bornestationnement.txt', nb_processus=1)
+        try:
+            serveur = await serveur_test.demarrer(port=0)
+            async with serveur:
+                return await mesurer_charge(requetes, nb_clients, port=serveur.sockets[0].getsockname()[1])
+        finally:
+            serveur_test.fermer()
+
+    requetes_test = requetes_test[:100] + ['numero 0', '{"requete": "rue"}']
+    mesures_test = asyncio.run(mesurer_charge_locale(requetes_test, 4))
+    assert mesures_test['requetes'] == len(requetes_test)
+    assert mesures_test['erreurs'] == compter_erreurs(requetes_test) >= 1
+    assert 0 < mesures_test['p50_s'] <= mesures_test['p90_s'] <= mesures_test['p99_s'] <= mesures_test['duree_s']
+    assert mesures_test['debit_par_s'] == len(requetes_test) / mesures_test['duree_s']
+
+    # plus de clients que de requêtes: les clients sans requête ne mesurent rien
+    mesures_test = asyncio.run(mesurer_charge_locale(requetes_test[:2], 3))
+    assert mesures_test['requetes'] == 2
+
+    print('charge_serveur: OK')
@@ -0,0 +1,485 @@
+"""
+Module de calcul et d'enregistrement des distances entre les bornes d'un inventaire, pour les analyses qui ont
+besoin de toutes les distances deux à deux ou des plus proches voisines de chaque borne. Deux formes sont offertes:
+    - la matrice complète des distances, calculée par blocs de lignes pour que la mémoire utilisée ne dépende pas de
+      la taille de la matrice, accompagnée de la somme de chaque ligne et des k plus proches voisines de chaque
+      borne, triées une seule fois à l'écriture;
+    - le graphe des k plus proches voisines de chaque borne, trouvées avec l'index spatial.
+
+Le résultat est écrit dans un fichier binaire qui est ensuite projeté en mémoire (mmap): les tableaux sont lus sur
+place, sans copie, par ouvrir_distances(), par trouver_borne_centrale() et trouver_borne_plus_pres() du module
+inventaire_bornes (paramètre distances) ou par des outils externes (voir DistancesEnregistrees.decalages).
+
+Format du fichier (entiers little-endian pour l'en-tête, tableaux dans l'ordre d'octets de la machine, chaque
+tableau aligné sur 8 octets):
+    - en-tête: signature, ordre des octets, forme ('matrice' ou 'voisins'), métrique, nombre de bornes n, nombre de
+      voisines k par borne et taille de la table des numéros;
+    - index des numéros de borne: positions de début de chaque numéro (n + 1 entiers 'q'), puis les numéros encodés
+      en UTF-8, dans l'ordre de l'inventaire;
+    - matrice: sommes des lignes (n float 'd'), les distances ligne par ligne (n x n float 'd'), puis les positions
+      des voisines (n x k entiers 'q', -1 s'il y en a moins de k), de la plus proche à la plus éloignée;
+    - voisins: positions des voisines (n x k entiers 'q', -1 s'il y en a moins de k), puis leurs distances
+      (n x k float 'd'), de la plus proche à la plus éloignée.
+"""
+
+from array import array
+from heapq import nsmallest
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+import index_spatial
+import inventaire_bornes as ibornes
+import metriques_distance
+
+SIGNATURE = b'DISTAN02'
+FORMAT_EN_TETE = '<8s8s8s24sqqq'
+TAILLE_EN_TETE = struct.calcsize(FORMAT_EN_TETE)
+
+
+def _ecrire_aligne(f, donnees):
+    """
+    Écrit des données dans un fichier, précédées des octets nuls nécessaires pour les aligner sur 8 octets.
+
+    Args:
+        f (file): Le fichier ouvert en écriture binaire
+        donnees (array): Les données à écrire (un tableau ou des octets)
+    """
+    f.write(b'\0' * (-f.tell() % 8))
+    if isinstance(donnees, array):
+        donnees.tofile(f)
+    else:
+        f.write(donnees)
+
+
+def _ecrire_fichier(nom_fichier, forme, metrique, inventaire, k, ecrire_tableaux):
+    """
+    Écrit un fichier de distances en passant par un fichier temporaire, pour qu'un fichier incomplet ne soit jamais
+    lu.
+
+    Args:
+        nom_fichier (str): Le fichier à créer
+        forme (str): 'matrice' ou 'voisins'
+        metrique (Metrique): La métrique des distances
+        inventaire (list): La liste des bornes de l'inventaire
+        k (int): Le nombre de valeurs par ligne
+        ecrire_tableaux (function): Fonction qui reçoit le fichier ouvert et y écrit les tableaux de distances
+    """
+    numeros = [str(borne['Numero']).encode('utf-8') for borne in inventaire]
+    debuts = array('q', [0])
+    for numero in numeros:
+        debuts.append(debuts[-1] + len(numero))
+    table = b''.join(numeros)
+
+    en_tete = struct.pack(FORMAT_EN_TETE, SIGNATURE, sys.byteorder.encode('ascii').ljust(8), forme.encode('ascii'),
+                          metrique.nom.encode('ascii'), len(inventaire), k, len(table))
+    # un fichier temporaire unique: deux constructions simultanées du même fichier ne s'écrasent pas
+    descripteur, chemin_temporaire = tempfile.mkstemp(prefix=os.path.basename(nom_fichier) + '.', suffix='.tmp',
+                                                      dir=os.path.dirname(nom_fichier) or '.')
+    try:
+        with os.fdopen(descripteur, 'wb') as f:
+            f.write(en_tete)
+            _ecrire_aligne(f, debuts)
+            _ecrire_aligne(f, table)
+            ecrire_tableaux(f)
+        os.replace(chemin_temporaire, nom_fichier)
+    finally:
+        if os.path.exists(chemin_temporaire):
+            os.remove(chemin_temporaire)
+
+
+def construire_matrice_distances(inventaire, nom_fichier, metrique='equirectangulaire', taille_bloc=256, k=32):
+    """
+    Calcule la matrice des distances entre toutes les bornes de l'inventaire et l'enregistre dans un fichier. Les
+    lignes sont calculées et écrites par blocs de taille_bloc lignes, à partir des colonnes de l'inventaire obtenues
+    une seule fois. Les k plus proches voisines de chaque borne sont aussi enregistrées, pour que la recherche de la
+    borne la plus proche n'ait pas à trier une ligne à chaque requête.
+
+    Le fichier occupe 8 x n² octets: pour les grands inventaires, voir construire_graphe_voisins().
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        nom_fichier (str): Le fichier à créer
+        metrique (str): La métrique de distance (voir le module metriques_distance)
+        taille_bloc (int): Le nombre de lignes calculées à la fois
+        k (int): Le nombre de voisines enregistrées par borne
+    """
+    if k < 1:
+        raise ValueError(f'le nombre de voisines doit être positif: {k}')
+    metrique = metriques_distance.obtenir_metrique(metrique)
+
+    def ecrire_tableaux(f):
+        colonnes = ibornes.obtenir_colonnes(inventaire)
+        xs, ys = colonnes['X'], colonnes['Y']
+        nb_bornes = len(xs)
+        positions = array('q', [-1]) * (nb_bornes * k)
+        position_sommes = f.tell() + (-f.tell() % 8)
+        sommes = array('d', bytes(8 * nb_bornes))
+        _ecrire_aligne(f, sommes)  # réservées, puis réécrites une fois les lignes calculées
+        for debut in range(0, nb_bornes, taille_bloc):
+            bloc = array('d')
+            for position in range(debut, min(debut + taille_bloc, nb_bornes)):
+                ligne = metrique.distances(xs[position], ys[position], xs, ys)
+                sommes[position] = sum(ligne)
+                bloc.extend(ligne)
+                # en cas d'égalité, la voisine qui apparaît le plus tôt dans l'inventaire vient en premier
+                voisines = [voisine for _, voisine in nsmallest(k + 1, zip(ligne, range(nb_bornes)))
+                            if voisine != position][:k]
+                positions[position * k:position * k + len(voisines)] = array('q', voisines)
+            ibornes._compter_distances(len(bloc))
+            bloc.tofile(f)
+        _ecrire_aligne(f, positions)
+        f.seek(position_sommes)
+        sommes.tofile(f)
+
+    _ecrire_fichier(nom_fichier, 'matrice', metrique, inventaire, k, ecrire_tableaux)
+
+
+def construire_graphe_voisins(inventaire, nom_fichier, k=8):
+    """
+    Trouve les k plus proches voisines de chaque borne de l'inventaire avec l'index spatial, en O(n k log n), et
+    enregistre le graphe dans un fichier. Les distances sont celles de la métrique equirectangulaire; en cas
+    d'égalité, la voisine qui apparaît le plus tôt dans l'inventaire vient en premier.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        nom_fichier (str): Le fichier à créer
+        k (int): Le nombre de voisines par borne
+    """
+    if k < 1:
+        raise ValueError(f'le nombre de voisines doit être positif: {k}')
+
+    def ecrire_tableaux(f):
+        colonnes = ibornes.obtenir_colonnes(inventaire)
+        arbre = ibornes.obtenir_index_spatial(inventaire)
+        positions = array('q', [-1]) * (len(inventaire) * k)
+        distances = array('d', [float('inf')]) * (len(inventaire) * k)
+        for position, (x, y) in enumerate(zip(colonnes['X'], colonnes['Y'])):
+            voisines = index_spatial.trouver_k_plus_proches(arbre, x, y, k,
+                                                            lambda candidate: candidate != position)
+            for rang, (distance, voisine) in enumerate(voisines, position * k):
+                positions[rang] = voisine
+                distances[rang] = distance
+        _ecrire_aligne(f, positions)
+        _ecrire_aligne(f, distances)
+
+    _ecrire_fichier(nom_fichier, 'voisins', metriques_distance.METRIQUES['equirectangulaire'], inventaire, k,
+                    ecrire_tableaux)
+
+
+class DistancesEnregistrees:
+    """
+    Distances enregistrées par construire_matrice_distances() ou construire_graphe_voisins(), lues directement dans
+    la projection en mémoire du fichier. S'utilise comme gestionnaire de contexte pour fermer le fichier.
+
+    Attributs:
+        forme (str): 'matrice' ou 'voisins'
+        metrique (str): Le nom de la métrique des distances
+        k (int): Le nombre de voisines enregistrées par borne
+        numeros (list): Les numéros des bornes, dans l'ordre de l'inventaire
+        decalages (dict): Pour chaque tableau du fichier ('debuts_numeros', 'table_numeros', 'sommes', 'matrice' et
+            'voisins', ou 'voisins' et 'distances'), le tuple (décalage en octets, code de type de array, nombre
+            d'éléments), pour lire le fichier avec d'autres outils (par exemple numpy.memmap)
+    """
+
+    def __init__(self, nom_fichier):
+        """
+        Args:
+            nom_fichier (str): Le fichier créé par construire_matrice_distances() ou construire_graphe_voisins()
+
+        Raises:
+            ValueError: Si le fichier n'est pas un fichier de distances valide
+        """
+        with open(nom_fichier, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < TAILLE_EN_TETE:
+                raise ValueError(f"{nom_fichier} n'est pas un fichier de distances")
+            self._projection = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (signature, ordre_octets, forme, metrique, nb_bornes, k,
+         taille_table) = struct.unpack_from(FORMAT_EN_TETE, self._projection)
+        if signature != SIGNATURE or ordre_octets.rstrip() != sys.byteorder.encode('ascii'):
+            self._projection.close()
+            raise ValueError(f"{nom_fichier} n'est pas un fichier de distances lisible sur cette machine")
+        self.forme = forme.rstrip(b'\0').decode('ascii')
+        self.metrique = metrique.rstrip(b'\0').decode('ascii')
+        self.k = k
+
+        self.decalages = {}
+        self._vue = memoryview(self._projection)
+        self._tableaux = {}
+        position = TAILLE_EN_TETE
+        sections = [('debuts_numeros', 'q', nb_bornes + 1), ('table_numeros', 'B', taille_table)]
+        if self.forme == 'matrice':
+            sections += [('sommes', 'd', nb_bornes), ('matrice', 'd', nb_bornes * nb_bornes),
+                         ('voisins', 'q', nb_bornes * k)]
+        else:
+            sections += [('voisins', 'q', nb_bornes * k), ('distances', 'd', nb_bornes * k)]
+        for nom, code, longueur in sections:
+            position += -position % 8
+            taille = longueur * array(code).itemsize
+            if longueur < 0 or position + taille > len(self._projection):
+                self.fermer()
+                raise ValueError(f'{nom_fichier} est incomplet')
+            self.decalages[nom] = (position, code, longueur)
+            self._tableaux[nom] = self._vue[position:position + taille].cast(code)
+            position += taille
+
+        debuts, table = self._tableaux['debuts_numeros'], self._tableaux['table_numeros']
+        self.numeros = [str(table[debuts[i]:debuts[i + 1]], 'utf-8') for i in range(nb_bornes)]
+        # comme selectionner_borne_par_numero(), un numéro en double désigne sa dernière borne
+        self._positions = {ibornes.normaliser_numero(numero): position for position, numero in enumerate(self.numeros)}
+
+    def __len__(self):
+        return len(self.numeros)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.fermer()
+
+    def fermer(self):
+        """
+        Libère les tableaux et ferme la projection en mémoire du fichier. Si une ligne retournée par obtenir_ligne()
+        est encore utilisée, la projection n'est fermée qu'une fois cette ligne libérée.
+        """
+        for tableau in self._tableaux.values():
+            tableau.release()
+        self._tableaux = {}
+        self._vue.release()
+        try:
+            self._projection.close()
+        except BufferError:
+            pass
+
+    def obtenir_position(self, numero_borne):
+        """
+        Retourne la position d'une borne à partir de son numéro.
+
+        Args:
+            numero_borne (int): Le numéro de la borne
+
+        Returns:
+            int: La position de la borne, ou -1 si le numéro est introuvable
+        """
+        return self._positions.get(ibornes.normaliser_numero(numero_borne), -1)
+
+    def obtenir_ligne(self, position):
+        """
+        Retourne les distances d'une borne avec toutes les autres, sans copie. Seulement pour la matrice.
+
+        Args:
+            position (int): La position de la borne
+
+        Returns:
+            memoryview: Les n distances de la ligne, dans l'ordre de l'inventaire
+        """
+        if self.forme != 'matrice':
+            raise ValueError("le graphe des voisines ne contient pas toutes les distances")
+        return self._tableaux['matrice'][position * len(self):(position + 1) * len(self)]
+
+    def obtenir_distance(self, position_1, position_2):
+        """
+        Retourne la distance entre deux bornes. Seulement pour la matrice.
+
+        Args:
+            position_1 (int): La position de la première borne
+            position_2 (int): La position de la deuxième borne
+
+        Returns:
+            float: La distance
+        """
+        if self.forme != 'matrice':
+            raise ValueError("le graphe des voisines ne contient pas toutes les distances")
+        return self._tableaux['matrice'][position_1 * len(self) + position_2]
+
+    def obtenir_voisines(self, position):
+        """
+        Retourne les positions des k plus proches voisines enregistrées d'une borne, de la plus proche à la plus
+        éloignée. En cas d'égalité, la borne qui apparaît le plus tôt dans l'inventaire vient en premier.
+
+        Args:
+            position (int): La position de la borne
+
+        Returns:
+            tuple: La liste des positions et un booléen qui indique si elle contient toutes les autres bornes
+        """
+        voisines = [voisine for voisine in self._tableaux['voisins'][position * self.k:(position + 1) * self.k]
+                    if voisine != -1]
+        return voisines, len(voisines) == len(self) - 1
+
+    def trouver_position_centrale(self):
+        """
+        Retourne la position de la borne dont la somme des distances avec les autres est minimale, en O(n) à partir
+        des sommes enregistrées. En cas d'égalité, la première borne est retenue. Seulement pour la matrice.
+
+        Returns:
+            int: La position de la borne centrale, ou -1 s'il n'y a aucune borne
+        """
+        if self.forme != 'matrice':
+            raise ValueError("le graphe des voisines ne permet pas de trouver la borne centrale")
+        sommes = self._tableaux['sommes']
+        return min(range(len(sommes)), key=sommes.__getitem__) if len(sommes) else -1
+
+    def correspond(self, inventaire):
+        """
+        Vérifie que les distances ont été calculées pour un inventaire de mêmes numéros de borne, dans le même ordre.
+        Les coordonnées ne sont pas comparées: un fichier doit être reconstruit quand l'inventaire change.
+
+        Args:
+            inventaire (list): La liste des bornes de l'inventaire
+
+        Returns:
+            bool: True si les numéros correspondent
+        """
+        return len(inventaire) == len(self) and all(
+            str(borne['Numero']) == numero for borne, numero in zip(inventaire, self.numeros))
+
+
+def ouvrir_distances(nom_fichier):
+    """
+    Ouvre un fichier de distances créé par construire_matrice_distances() ou construire_graphe_voisins().
+
+    Args:
+        nom_fichier (str): Le nom du fichier
+
+    Returns:
+        DistancesEnregistrees: Les distances, lues sans copie dans la projection en mémoire du fichier
+    """
+    return DistancesEnregistrees(nom_fichier)
+
+
+if __name__ == '__main__':
+    from concurrent.futures import ThreadPoolExecutor
+
+    print('Exécution des tests...')
+    print('-----------------------')
+
+    inventaire = ibornes.lire_fichier_bornes('vdq-bornestationnement.txt')
+    inventaire_test = ibornes.lire_fichier_bornes('vdq-bornestationnement-reduit.txt')
+
+    with tempfile.TemporaryDirectory() as dossier_temporaire:
+        nom_matrice = os.path.join(dossier_temporaire, 'matrice.bin')
+        nom_graphe = os.path.join(dossier_temporaire, 'voisins.bin')
+
+# tests pour construire_matrice_distances
+        with ThreadPoolExecutor(4) as executeur:
+            list(executeur.map(lambda _: construire_matrice_distances(inventaire_test, nom_matrice, taille_bloc=2),
+                               range(8)))
+        assert [nom for nom in os.listdir(dossier_temporaire) if nom.endswith('.tmp')] == []
+        with ouvrir_distances(nom_matrice) as matrice:
+            assert (matrice.forme, matrice.metrique, len(matrice), matrice.k) == ('matrice', 'equirectangulaire', 5, 32)
+            assert matrice.numeros == [borne['Numero'] for borne in inventaire_test]
+            assert list(matrice.obtenir_ligne(2)) == \
+                ibornes.calculer_distances_borne(inventaire_test, inventaire_test[2])
+            assert matrice.obtenir_distance(3, 0) == ibornes.calculer_distance_bornes(inventaire_test[3],
+                                                                                       inventaire_test[0])
+            assert matrice.obtenir_position('3170') == 4 and matrice.obtenir_position(5555) == -1
+            distances_4 = ibornes.calculer_distances_borne(inventaire_test, inventaire_test[4])
+            assert matrice.obtenir_voisines(4) == (sorted(range(4), key=distances_4.__getitem__), True)
+            assert matrice.correspond(inventaire_test) and not matrice.correspond(inventaire_test[1:])
+            assert not matrice.correspond(list(reversed(inventaire_test)))
+            assert ibornes.trouver_borne_centrale(inventaire_test, distances=matrice) is \
+                ibornes.trouver_borne_centrale(inventaire_test)
+            for borne in inventaire_test:
+                for autre_rue in (False, True):
+                    assert ibornes.trouver_borne_plus_pres(inventaire_test, borne['Numero'], autre_rue,
+                                                           distances=matrice) == \
+                        ibornes.trouver_borne_plus_pres(inventaire_test, borne['Numero'], autre_rue)
+
+            # un inventaire différent est refusé
+            for appel in (lambda: ibornes.trouver_borne_centrale(inventaire_test[:4], distances=matrice),
+                          lambda: ibornes.trouver_borne_centrale(inventaire_test, 'haversine', distances=matrice),
+                          lambda: ibornes.trouver_borne_plus_pres(inventaire_test[1:], 3170, False,
+                                                                  distances=matrice)):
+                try:
+                    appel()
+                    assert False
+                except ValueError:
+                    pass
+
+            # lecture externe, à partir des décalages
+            with open(nom_matrice, 'rb') as f:
+                contenu = f.read()
+            decalage, code, longueur = matrice.decalages['matrice']
+            externe = array(code, contenu[decalage:decalage + longueur * 8])
+            assert externe.tolist() == [distance for position in range(5)
+                                        for distance in matrice.obtenir_ligne(position)]
+            del externe, contenu
+
+        construire_matrice_distances(inventaire_test, nom_matrice, 'haversine')
+        with ouvrir_distances(nom_matrice) as matrice:
+            assert matrice.metrique == 'haversine'
+            assert ibornes.trouver_borne_centrale(inventaire_test, 'haversine', distances=matrice) is \
+                ibornes.trouver_borne_centrale(inventaire_test, 'haversine')
+
+        # une liste simple donne la même matrice qu'un Inventaire
+        construire_matrice_distances(list(inventaire), nom_matrice, k=4)
+        with open(nom_matrice, 'rb') as f:
+            contenu_liste = f.read()
+        construire_matrice_distances(inventaire, nom_matrice, k=4)
+        with open(nom_matrice, 'rb') as f:
+            assert f.read() == contenu_liste
+        del contenu_liste
+
+        with ouvrir_distances(nom_matrice) as matrice:
+            assert ibornes.trouver_borne_centrale(inventaire, distances=matrice) is \
+                ibornes.trouver_borne_centrale(inventaire)
+            for position in range(0, len(inventaire), 97):
+                ligne = matrice.obtenir_ligne(position)
+                attendues = sorted((voisine for voisine in range(len(ligne)) if voisine != position),
+                                   key=lambda voisine: (ligne[voisine], voisine))[:4]
+                assert matrice.obtenir_voisines(position) == (attendues, False)
+            # les voisines enregistrées ne suffisent pas toujours: la recherche normale prend alors le relais
+            for borne in inventaire[::50]:
+                for autre_rue in (False, True):
+                    assert ibornes.trouver_borne_plus_pres(inventaire, borne['Numero'], autre_rue,
+                                                           distances=matrice) is \
+                        ibornes.trouver_borne_plus_pres(inventaire, borne['Numero'], autre_rue)
+        # une ligne encore utilisée n'empêche pas de fermer le fichier
+        del ligne
+        matrice = ouvrir_distances(nom_matrice)
+        ligne = matrice.obtenir_ligne(0)
+        matrice.fermer()
+        assert ligne[0] == 0.0
+        del ligne, matrice
+
+
+# tests pour construire_graphe_voisins
+        construire_graphe_voisins(inventaire, nom_graphe, k=4)
+        with ouvrir_distances(nom_graphe) as graphe:
+            assert (graphe.forme, len(graphe), graphe.k) == ('voisins', len(inventaire), 4)
+            voisines, complet = graphe.obtenir_voisines(0)
+            attendues = ibornes.trouver_bornes_plus_pres(inventaire, inventaire[0]['Coordonnees'], 5)
+            assert [inventaire[voisine] for voisine in voisines] == attendues[1:] and not complet
+            for borne in inventaire:
+                for autre_rue in (False, True):
+                    assert ibornes.trouver_borne_plus_pres(inventaire, borne['Numero'], autre_rue,
+                                                           distances=graphe) is \
+                        ibornes.trouver_borne_plus_pres(inventaire, borne['Numero'], autre_rue)
+            try:
+                ibornes.trouver_borne_centrale(inventaire, distances=graphe)
+                assert False
+            except ValueError:
+                pass
+
+        # moins de bornes que de voisines demandées
+        construire_graphe_voisins(inventaire_test, nom_graphe, k=8)
+        with ouvrir_distances(nom_graphe) as graphe:
+            voisines, complet = graphe.obtenir_voisines(4)
+            assert complet and len(voisines) == 4 and inventaire_test[voisines[0]]['Numero'] == '3008'
+
+        construire_graphe_voisins([], nom_graphe)
+        with ouvrir_distances(nom_graphe) as graphe:
+            assert len(graphe) == 0
+
+        with open(nom_graphe, 'wb') as f:
+            f.write(b'invalide')
+        try:
+            ouvrir_distances(nom_graphe)
+            assert False
+        except ValueError:
+            pass
+    print('distances_enregistrees: OK')
@@ -0,0 +1,171 @@
+"""
+Module regroupant des algorithmes de géométrie plane utilisés pour analyser l'inventaire des bornes: enveloppe
+convexe et recherche exacte des points les plus éloignés (diamètre) par la méthode des pieds à coulisse tournants.
+
+Les points sont des tuples (x, y) exprimés en kilomètres et les fonctions travaillent sur leurs positions dans la liste.
+La variable nb_distances compte les distances calculées (voir le module instrumentation).
+"""
+
+from math import sqrt
+
+nb_distances = 0
+
+
+def _calculer_produit_vectoriel(origine, point_1, point_2):
+    """
+    Calcule le produit vectoriel (origine -> point_1) x (origine -> point_2). Le résultat est positif si les trois
+    points tournent dans le sens antihoraire.
+
+    Args:
+        origine (tuple): Le point d'origine des deux vecteurs
+        point_1 (tuple): L'extrémité du premier vecteur
+        point_2 (tuple): L'extrémité du deuxième vecteur
+
+    Returns:
+        float: Le produit vectoriel
+    """
+    return ((point_1[0] - origine[0]) * (point_2[1] - origine[1])
+            - (point_1[1] - origine[1]) * (point_2[0] - origine[0]))
+
+
+def calculer_enveloppe_convexe(points):
+    """
+    Calcule l'enveloppe convexe d'une liste de points avec l'algorithme de la chaîne monotone, en O(n log n).
+
+    Les points en double ne sont considérés qu'une fois (à leur première position) et les points alignés sur un côté
+    de l'enveloppe ne font pas partie des sommets.
+
+    Args:
+        points (list): Une liste de tuples (x, y)
+
+    Returns:
+        list: Les positions des sommets de l'enveloppe, dans le sens antihoraire
+    """
+    positions = []
+    for position in sorted(range(len(points)), key=lambda position: (points[position], position)):
+        if not positions or points[positions[-1]] != points[position]:
+            positions.append(position)
+
+    if len(positions) <= 2:
+        return positions
+
+    inferieure = []
+    for position in positions:
+        while len(inferieure) >= 2 and _calculer_produit_vectoriel(
+                points[inferieure[-2]], points[inferieure[-1]], points[position]) <= 0:
+            inferieure.pop()
+        inferieure.append(position)
+
+    superieure = []
+    for position in reversed(positions):
+        while len(superieure) >= 2 and _calculer_produit_vectoriel(
+                points[superieure[-2]], points[superieure[-1]], points[position]) <= 0:
+            superieure.pop()
+        superieure.append(position)
+
+    return inferieure[:-1] + superieure[:-1]
+
+
+def trouver_paires_plus_eloignees(points):
+    """
+    Trouve la plus grande distance entre deux points et toutes les paires de points qui l'atteignent, en O(n log n).
+
+    L'enveloppe convexe est parcourue avec la méthode des pieds à coulisse tournants. Les voisins immédiats de chaque
+    sommet antipodal sont aussi évalués, pour ne manquer aucune paire lorsque des côtés sont parallèles aux erreurs
+    d'arrondi près. La distance est calculée comme sqrt(dx ** 2 + dy ** 2), ce qui donne exactement les mêmes valeurs
+    qu'un calcul séquentiel sur toutes les paires.
+
+    Args:
+        points (list): Une liste de tuples (x, y)
+
+    Returns:
+        tuple: La distance maximale et la liste des paires (position_1, position_2) qui l'atteignent, avec
+            position_1 < position_2. Pour des points en double, seule la première position est utilisée. Si
+            tous les points sont confondus, retourne (0, []).
+    """
+    global nb_distances
+    enveloppe = calculer_enveloppe_convexe(points)
+    nb_sommets = len(enveloppe)
+    if nb_sommets < 2:
+        return 0, []
+
+    def aire(i, i_suivant, j):
+        return abs(_calculer_produit_vectoriel(points[enveloppe[i]], points[enveloppe[i_suivant]],
+                                               points[enveloppe[j]]))
+
+    candidats = set()
+    if nb_sommets == 2:
+        candidats.add((0, 1))
+    else:
+        j = 1
+        for i in range(nb_sommets):
+            i_suivant = (i + 1) % nb_sommets
+            while aire(i, i_suivant, (j + 1) % nb_sommets) > aire(i, i_suivant, j):
+                j = (j + 1) % nb_sommets
+            for voisin in (j - 1, j, j + 1):
+                voisin %= nb_sommets
+                candidats.add((i, voisin))
+                candidats.add((i_suivant, voisin))
+
+    paires_positions = set()
+    for i, j in candidats:
+        if i != j:
+            paires_positions.add((min(enveloppe[i], enveloppe[j]), max(enveloppe[i], enveloppe[j])))
+
+    nb_distances += len(paires_positions)
+    distance_max = 0
+    paires = []
+    for position_1, position_2 in paires_positions:
+        (x1, y1), (x2, y2) = points[position_1], points[position_2]
+        distance = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+        if distance > distance_max:
+            distance_max = distance
+            paires = [(position_1, position_2)]
+        elif distance == distance_max:
+            paires.append((position_1, position_2))
+
+    return distance_max, sorted(paires)
+
+
+if __name__ == '__main__':
+    import random
+
+    print('Exécution des tests...')
+    print('-----------------------')
+
+# tests pour calculer_enveloppe_convexe
+    assert calculer_enveloppe_convexe([]) == []
+    assert calculer_enveloppe_convexe([(1.0, 1.0), (1.0, 1.0)]) == [0]
+    carre = [(0.0, 0.0), (1.0, 0.0), (0.5, 0.5), (1.0, 1.0), (0.0, 1.0), (0.5, 0.0)]
+    assert calculer_enveloppe_convexe(carre) == [0, 1, 3, 4]
+
+
+# tests pour trouver_paires_plus_eloignees
+    assert trouver_paires_plus_eloignees([(2.0, 2.0)]) == (0, [])
+    assert trouver_paires_plus_eloignees([(0.0, 0.0), (3.0, 4.0), (0.0, 0.0)]) == (5.0, [(0, 1)])
+    assert trouver_paires_plus_eloignees(carre)[1] == [(0, 3), (1, 4)]
+
+    def calculer_paires_sequentiel(points):
+        distance_max = 0
+        paires = set()
+        premieres = {}
+        for position, point in enumerate(points):
+            premieres.setdefault(point, position)
+        for position_1, (x1, y1) in enumerate(points):
+            for position_2, (x2, y2) in enumerate(points):
+                distance = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+                paire = tuple(sorted((premieres[(x1, y1)], premieres[(x2, y2)])))
+                if distance > distance_max:
+                    distance_max, paires = distance, {paire}
+                elif distance == distance_max and distance > 0:
+                    paires.add(paire)
+        return distance_max, sorted(paires)
+
+    generateur = random.Random(1)
+    for essai in range(200):
+        if essai % 2:
+            nuage = [(generateur.uniform(-5, 5) * 110.6, generateur.uniform(-5, 5) * 78.85) for _ in range(40)]
+        else:
+            nuage = [(generateur.randint(0, 4) * 110.6, generateur.randint(0, 3) * 78.85) for _ in range(25)]
+        assert trouver_paires_plus_eloignees(nuage) == calculer_paires_sequentiel(nuage)
+    print('geometrie_plane: OK')
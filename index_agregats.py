@@ -0,0 +1,400 @@
+"""
+Module regroupant un index d'agrégats sur des bornes: nombre de bornes, densité et centroïde par rue, par côté et par
+cellule d'une grille. Les agrégats sont maintenus en O(1) (par rue et par côté) ou en O(log² m) (par cellule, pour
+m cellules occupées) à chaque ajout ou retrait de borne, et lus sans parcourir les bornes.
+
+La grille découpe le plan des coordonnées projetées en kilomètres (voir projeter_coordonnees() dans le module
+inventaire_bornes) en cellules carrées de taille configurable. Seules les cellules occupées sont conservées: la
+mémoire ne dépend pas de l'étendue de la grille, et une borne isolée très loin des autres ne coûte qu'une cellule.
+Un arbre de Fenwick creux en deux dimensions conserve les sommes préfixes du nombre de bornes par cellule occupée, ce
+qui permet de compter les bornes d'un rectangle en O(log² m): seules les cellules traversées par le bord du
+rectangle sont parcourues pour que le compte soit exact. L'arbre n'est construit qu'au premier comptage, et
+reconstruit au comptage suivant lorsqu'une borne occupe une nouvelle cellule.
+
+La densité d'un groupe est son nombre de bornes par kilomètre carré de la surface des cellules qu'il occupe.
+"""
+
+from bisect import bisect_left, bisect_right
+from math import floor
+
+from metriques_distance import KM_PAR_DEGRE_LATITUDE, KM_PAR_DEGRE_LONGITUDE
+
+GROUPES = ('rue', 'cote', 'cellule')
+TAILLE_CELLULE = 0.25  # km
+
+
+class ArbreFenwick2D:
+    """
+    Arbre de Fenwick (arbre indexé binaire) en deux dimensions sur les cases d'une grille creuse d'entiers. Les lignes
+    des cases sont compressées en rangs, et chaque nœud de l'arbre des lignes ne conserve que les colonnes des cases
+    de ses lignes, avec son propre arbre de Fenwick sur ces colonnes. Pour k cases, la mémoire est en O(k log k),
+    quelle que soit l'étendue de la grille, et l'ajout d'une valeur à une case ou la somme d'un rectangle de cases se
+    font en O(log² k).
+    """
+
+    def __init__(self, cases):
+        """
+        Args:
+            cases (iterable): Les cases (ligne, colonne) qui pourront recevoir une valeur
+        """
+        self.cases = frozenset(cases)
+        self._lignes = sorted({ligne for ligne, _ in self.cases})
+        nb_lignes = len(self._lignes)
+        rangs = {ligne: rang for rang, ligne in enumerate(self._lignes, 1)}
+        colonnes = [set() for _ in range(nb_lignes + 1)]
+        for ligne, colonne in self.cases:
+            i = rangs[ligne]
+            while i <= nb_lignes:
+                colonnes[i].add(colonne)
+                i += i & -i
+        self._colonnes = [sorted(ensemble) for ensemble in colonnes]
+        self._sommes = [[0] * (len(ensemble) + 1) for ensemble in colonnes]
+
+    def ajouter(self, ligne, colonne, valeur):
+        """
+        Ajoute une valeur à une case.
+
+        Args:
+            ligne (int): La ligne de la case
+            colonne (int): La colonne de la case
+            valeur (int): La valeur ajoutée (négative pour un retrait)
+
+        Raises:
+            ValueError: Si la case ne fait pas partie de l'arbre
+        """
+        if (ligne, colonne) not in self.cases:
+            raise ValueError(f"case absente de l'arbre: {(ligne, colonne)}")
+        i = bisect_left(self._lignes, ligne) + 1
+        while i < len(self._colonnes):
+            colonnes, sommes = self._colonnes[i], self._sommes[i]
+            j = bisect_left(colonnes, colonne) + 1
+            while j <= len(colonnes):
+                sommes[j] += valeur
+                j += j & -j
+            i += i & -i
+
+    def calculer_somme_prefixe(self, ligne, colonne):
+        """
+        Calcule la somme des cases dont la ligne est au plus ligne et la colonne au plus colonne.
+
+        Args:
+            ligne (int): La dernière ligne
+            colonne (int): La dernière colonne
+
+        Returns:
+            int: La somme
+        """
+        somme = 0
+        i = bisect_right(self._lignes, ligne)
+        while i > 0:
+            sommes = self._sommes[i]
+            j = bisect_right(self._colonnes[i], colonne)
+            while j > 0:
+                somme += sommes[j]
+                j -= j & -j
+            i -= i & -i
+        return somme
+
+    def calculer_somme(self, ligne_1, colonne_1, ligne_2, colonne_2):
+        """
+        Calcule la somme des cases d'un rectangle, bornes incluses.
+
+        Args:
+            ligne_1 (int): La première ligne du rectangle
+            colonne_1 (int): La première colonne du rectangle
+            ligne_2 (int): La dernière ligne du rectangle
+            colonne_2 (int): La dernière colonne du rectangle
+
+        Returns:
+            int: La somme, 0 si le rectangle est vide
+        """
+        if ligne_1 > ligne_2 or colonne_1 > colonne_2:
+            return 0
+        return (self.calculer_somme_prefixe(ligne_2, colonne_2) - self.calculer_somme_prefixe(ligne_1 - 1, colonne_2)
+                - self.calculer_somme_prefixe(ligne_2, colonne_1 - 1)
+                + self.calculer_somme_prefixe(ligne_1 - 1, colonne_1 - 1))
+
+
+class IndexAgregats:
+    """
+    Index des agrégats de bornes par rue, par côté et par cellule de grille, mis à jour à chaque ajout ou retrait.
+
+    Les bornes sont identifiées par une clé (par exemple id(borne)) donnée à l'ajout et au retrait. Les centroïdes
+    sont maintenus par des sommes de coordonnées, qui peuvent différer d'un recalcul complet par des erreurs
+    d'arrondi après de nombreux retraits.
+    """
+
+    def __init__(self, taille_cellule=TAILLE_CELLULE):
+        """
+        Args:
+            taille_cellule (float): Le côté des cellules de la grille, en kilomètres
+
+        Raises:
+            ValueError: Si la taille des cellules n'est pas positive
+        """
+        if not taille_cellule > 0:
+            raise ValueError(f'la taille des cellules doit être positive: {taille_cellule}')
+        self.taille_cellule = taille_cellule
+        self._entrees = {}
+        # pour chaque groupe: {valeur: [nombre, somme des latitudes, somme des longitudes, {cellule: nombre}]}
+        self._groupes = {groupe: {} for groupe in GROUPES}
+        self._bornes_par_cellule = {}
+        self._arbre = None  # construit par compter_dans_boite()
+
+    def __len__(self):
+        return len(self._entrees)
+
+    def _obtenir_cellule(self, x, y):
+        """
+        Retourne la cellule qui contient un point projeté.
+
+        Args:
+            x (float): La coordonnée x du point, en kilomètres
+            y (float): La coordonnée y du point, en kilomètres
+
+        Returns:
+            tuple: La cellule (i, j), où i = floor(x / taille_cellule) et j = floor(y / taille_cellule)
+        """
+        return floor(x / self.taille_cellule), floor(y / self.taille_cellule)
+
+    def ajouter(self, cle, x, y, coordonnees, rue, cote):
+        """
+        Ajoute une borne à l'index.
+
+        Args:
+            cle: La clé de la borne
+            x (float): La coordonnée x projetée de la borne, en kilomètres
+            y (float): La coordonnée y projetée de la borne, en kilomètres
+            coordonnees (tuple): Les coordonnées (latitude, longitude) de la borne
+            rue (str): Le nom de la rue de la borne
+            cote (str): Le côté de la rue de la borne
+
+        Raises:
+            ValueError: Si la clé est déjà dans l'index
+        """
+        if cle in self._entrees:
+            raise ValueError(f"borne déjà présente dans l'index: {cle}")
+        latitude, longitude = coordonnees[0], coordonnees[1]
+        cellule = self._obtenir_cellule(x, y)
+        valeurs = (rue, cote, cellule)
+        self._entrees[cle] = (valeurs, latitude, longitude)
+        for groupe, valeur in zip(GROUPES, valeurs):
+            agregat = self._groupes[groupe].get(valeur)
+            if agregat is None:
+                agregat = self._groupes[groupe][valeur] = [0, 0.0, 0.0, {}]
+            agregat[0] += 1
+            agregat[1] += latitude
+            agregat[2] += longitude
+            agregat[3][cellule] = agregat[3].get(cellule, 0) + 1
+
+        self._bornes_par_cellule.setdefault(cellule, {})[cle] = (latitude, longitude)
+        if self._arbre is not None:
+            if cellule in self._arbre.cases:
+                self._arbre.ajouter(*cellule, 1)
+            else:  # nouvelle cellule: l'arbre sera reconstruit au prochain comptage
+                self._arbre = None
+
+    def retirer(self, cle):
+        """
+        Retire une borne de l'index.
+
+        Args:
+            cle: La clé de la borne, telle que donnée à ajouter()
+        """
+        valeurs, latitude, longitude = self._entrees.pop(cle)
+        cellule = valeurs[2]
+        for groupe, valeur in zip(GROUPES, valeurs):
+            agregat = self._groupes[groupe][valeur]
+            agregat[0] -= 1
+            if not agregat[0]:
+                del self._groupes[groupe][valeur]
+                continue
+            agregat[1] -= latitude
+            agregat[2] -= longitude
+            agregat[3][cellule] -= 1
+            if not agregat[3][cellule]:
+                del agregat[3][cellule]
+
+        bornes = self._bornes_par_cellule[cellule]
+        del bornes[cle]
+        if not bornes:
+            del self._bornes_par_cellule[cellule]
+        if self._arbre is not None:
+            self._arbre.ajouter(*cellule, -1)
+
+    def obtenir_agregats(self, groupe):
+        """
+        Retourne les agrégats de chaque valeur d'un groupe.
+
+        Args:
+            groupe (str): 'rue', 'cote' ou 'cellule'
+
+        Returns:
+            dict: Pour chaque valeur du groupe (nom de rue, côté ou cellule (i, j)), un dictionnaire contenant
+                'Nombre' (le nombre de bornes), 'Densite' (le nombre de bornes par km² de cellules occupées) et
+                'Centroide' (la latitude et la longitude moyennes)
+
+        Raises:
+            ValueError: Si le groupe est inconnu
+        """
+        if groupe not in self._groupes:
+            raise ValueError(f'groupe inconnu: {groupe}')
+        aire_cellule = self.taille_cellule ** 2
+        return {valeur: {'Nombre': nombre, 'Densite': nombre / (len(cellules) * aire_cellule),
+                         'Centroide': (somme_latitudes / nombre, somme_longitudes / nombre)}
+                for valeur, (nombre, somme_latitudes, somme_longitudes, cellules) in self._groupes[groupe].items()}
+
+    def compter_dans_boite(self, boite):
+        """
+        Compte les bornes situées dans un rectangle de coordonnées, bornes incluses. Les cellules entièrement
+        comprises dans le rectangle sont comptées avec l'arbre de Fenwick; seules les bornes des cellules de son bord
+        sont comparées au rectangle.
+
+        Args:
+            boite (tuple): Les coordonnées (latitude_min, longitude_min, latitude_max, longitude_max) du rectangle
+
+        Returns:
+            int: Le nombre de bornes dans le rectangle
+        """
+        latitude_min, longitude_min, latitude_max, longitude_max = boite
+        if latitude_min > latitude_max or longitude_min > longitude_max or not self._entrees:
+            return 0
+        # la projection est croissante: une borne d'une cellule plus loin que celle d'un coin est au-delà de ce coin
+        i_min, j_min = self._obtenir_cellule(latitude_min * KM_PAR_DEGRE_LATITUDE,
+                                             longitude_min * KM_PAR_DEGRE_LONGITUDE)
+        i_max, j_max = self._obtenir_cellule(latitude_max * KM_PAR_DEGRE_LATITUDE,
+                                             longitude_max * KM_PAR_DEGRE_LONGITUDE)
+
+        # cellules strictement à l'intérieur: toutes leurs bornes sont dans le rectangle
+        if self._arbre is None:
+            self._arbre = ArbreFenwick2D(self._bornes_par_cellule)
+            for (i, j), bornes in self._bornes_par_cellule.items():
+                self._arbre.ajouter(i, j, len(bornes))
+        nombre = self._arbre.calculer_somme(i_min + 1, j_min + 1, i_max - 1, j_max - 1)
+
+        def compter_cellule(cellule):
+            return sum(latitude_min <= latitude <= latitude_max and longitude_min <= longitude <= longitude_max
+                       for latitude, longitude in self._bornes_par_cellule.get(cellule, {}).values())
+
+        if 2 * (i_max - i_min + j_max - j_min + 2) > len(self._bornes_par_cellule):
+            # bord plus long que le nombre de cellules occupées: parcourir celles-ci plutôt que tout le bord
+            return nombre + sum(compter_cellule(cellule) for cellule in self._bornes_par_cellule
+                                if cellule[0] in (i_min, i_max) and j_min <= cellule[1] <= j_max
+                                or cellule[1] in (j_min, j_max) and i_min < cellule[0] < i_max)
+        bord = {(i, j) for i in (i_min, i_max) for j in range(j_min, j_max + 1)}
+        bord.update((i, j) for j in (j_min, j_max) for i in range(i_min, i_max + 1))
+        return nombre + sum(compter_cellule(cellule) for cellule in bord)
+
+
+if __name__ == '__main__':
+    import random
+
+    print('Exécution des tests...')
+    print('-----------------------')
+
+# tests pour ArbreFenwick2D
+    generateur = random.Random(3)
+    grille_test = [[0] * 7 for _ in range(5)]
+    arbre_test = ArbreFenwick2D((ligne_test, colonne_test) for ligne_test in range(5) for colonne_test in range(7))
+    for _ in range(200):
+        ligne_test, colonne_test = generateur.randrange(5), generateur.randrange(7)
+        valeur_test = generateur.randint(-3, 3)
+        grille_test[ligne_test][colonne_test] += valeur_test
+        arbre_test.ajouter(ligne_test, colonne_test, valeur_test)
+    for ligne_1 in range(5):
+        for ligne_2 in range(ligne_1, 5):
+            for colonne_1 in range(7):
+                for colonne_2 in range(colonne_1, 7):
+                    assert arbre_test.calculer_somme(ligne_1, colonne_1, ligne_2, colonne_2) == \
+                        sum(sum(rangee[colonne_1:colonne_2 + 1]) for rangee in grille_test[ligne_1:ligne_2 + 1])
+    assert arbre_test.calculer_somme(3, 0, 2, 6) == 0 and arbre_test.calculer_somme_prefixe(-1, 6) == 0
+    assert ArbreFenwick2D(()).calculer_somme(0, 0, 3, 3) == 0
+
+    cases_creuses = {(generateur.randint(-10 ** 9, 10 ** 9), generateur.randint(-10 ** 9, 10 ** 9)) for _ in range(300)}
+    arbre_creux = ArbreFenwick2D(cases_creuses)
+    valeurs_creuses = {case: generateur.randint(1, 5) for case in cases_creuses}
+    for case, valeur_test in valeurs_creuses.items():
+        arbre_creux.ajouter(*case, valeur_test)
+    assert sum(len(colonnes) for colonnes in arbre_creux._colonnes) <= len(cases_creuses) * 10
+    for _ in range(100):
+        lignes_test = sorted(generateur.randint(-10 ** 9, 10 ** 9) for _ in range(2))
+        colonnes_test = sorted(generateur.randint(-10 ** 9, 10 ** 9) for _ in range(2))
+        assert arbre_creux.calculer_somme(lignes_test[0], colonnes_test[0], lignes_test[1], colonnes_test[1]) == sum(
+            valeur_test for (ligne_test, colonne_test), valeur_test in valeurs_creuses.items()
+            if lignes_test[0] <= ligne_test <= lignes_test[1] and colonnes_test[0] <= colonne_test <= colonnes_test[1])
+    try:
+        arbre_creux.ajouter(10 ** 10, 0, 1)
+        assert False
+    except ValueError:
+        pass
+
+
+# tests pour IndexAgregats
+    bornes_test = [(generateur.uniform(46.7, 46.9), generateur.uniform(-71.4, -71.1), generateur.choice('ABC'),
+                    generateur.choice('NSEO')) for _ in range(500)]
+    index_test = IndexAgregats(0.5)
+    for cle_test, (latitude_test, longitude_test, rue_test, cote_test) in enumerate(bornes_test):
+        index_test.ajouter(cle_test, latitude_test * KM_PAR_DEGRE_LATITUDE, longitude_test * KM_PAR_DEGRE_LONGITUDE,
+                           (latitude_test, longitude_test), rue_test, cote_test)
+    for cle_test in range(0, 500, 3):
+        index_test.retirer(cle_test)
+    restantes = [borne for cle_test, borne in enumerate(bornes_test) if cle_test % 3]
+    assert len(index_test) == len(restantes)
+
+    agregats_rue = index_test.obtenir_agregats('rue')
+    for rue_test in 'ABC':
+        bornes_rue = [borne for borne in restantes if borne[2] == rue_test]
+        assert agregats_rue[rue_test]['Nombre'] == len(bornes_rue)
+        assert abs(agregats_rue[rue_test]['Centroide'][0] - sum(borne[0] for borne in bornes_rue) / len(bornes_rue)) \
+            < 1e-9
+    assert sum(agregat['Nombre'] for agregat in index_test.obtenir_agregats('cote').values()) == len(restantes)
+    assert index_test._arbre is None  # les agrégats ne construisent pas l'arbre
+    for agregat in index_test.obtenir_agregats('cellule').values():
+        assert agregat['Densite'] == agregat['Nombre'] / 0.25
+
+    for _ in range(200):
+        latitudes = sorted(generateur.uniform(46.65, 46.95) for _ in range(2))
+        longitudes = sorted(generateur.uniform(-71.45, -71.05) for _ in range(2))
+        boite_test = (latitudes[0], longitudes[0], latitudes[1], longitudes[1])
+        assert index_test.compter_dans_boite(boite_test) == sum(
+            latitudes[0] <= borne[0] <= latitudes[1] and longitudes[0] <= borne[1] <= longitudes[1]
+            for borne in restantes)
+    assert index_test.compter_dans_boite((46.0, -72.0, 47.0, -71.0)) == len(restantes)
+    assert index_test.compter_dans_boite((46.9, -71.0, 46.8, -70.0)) == 0
+    # une borne sur le bord du rectangle est comptée
+    assert index_test.compter_dans_boite((restantes[0][0], restantes[0][1]) * 2) >= 1
+    # une nouvelle cellule invalide l'arbre, une cellule déjà connue le met à jour
+    index_test.ajouter('nouvelle', 0.0, 0.0, (0.0, 0.0), 'A', 'N')
+    assert index_test._arbre is None
+    assert index_test.compter_dans_boite((-1.0, -1.0, 1.0, 1.0)) == 1
+    arbre_index = index_test._arbre
+    index_test.retirer('nouvelle')
+    assert index_test._arbre is arbre_index and index_test.compter_dans_boite((-1.0, -1.0, 1.0, 1.0)) == 0
+
+    # bornes très dispersées (dont une coordonnée erronée en (0, 0)): seules les cellules occupées sont conservées
+    bornes_dispersees = [(0.0, 0.0), (46.81, -71.22), (-45.0, 170.0), (89.9, -179.9), (46.82, -71.21)]
+    index_disperse = IndexAgregats()
+    for cle_test, (latitude_test, longitude_test) in enumerate(bornes_dispersees):
+        index_disperse.ajouter(cle_test, latitude_test * KM_PAR_DEGRE_LATITUDE,
+                               longitude_test * KM_PAR_DEGRE_LONGITUDE, (latitude_test, longitude_test), 'A', 'N')
+    assert index_disperse.obtenir_agregats('rue')['A']['Nombre'] == 5
+    assert index_disperse._arbre is None
+    for boite_test in ((-90.0, -180.0, 90.0, 180.0), (46.0, -72.0, 47.0, -71.0), (-1.0, -1.0, 1.0, 1.0),
+                       (-50.0, 160.0, 0.0, 175.0), (10.0, 10.0, 20.0, 20.0)):
+        assert index_disperse.compter_dans_boite(boite_test) == sum(
+            boite_test[0] <= latitude_test <= boite_test[2] and boite_test[1] <= longitude_test <= boite_test[3]
+            for latitude_test, longitude_test in bornes_dispersees)
+    assert len(index_disperse._arbre.cases) == len(bornes_dispersees)
+
+    for valeur_invalide in (0, -1.0):
+        try:
+            IndexAgregats(valeur_invalide)
+            assert False
+        except ValueError:
+            pass
+    try:
+        index_test.obtenir_agregats('quartier')
+        assert False
+    except ValueError:
+        pass
+    print('index_agregats: OK')
@@ -0,0 +1,235 @@
+"""
+Module regroupant les fonctions d'un index spatial (arbre k-d) sur des points du plan. Il permet de répondre aux
+recherches du plus proche voisin, des k plus proches voisins et des points situés dans un rayon donné sans parcourir
+tous les points.
+
+Les points sont des tuples (x, y) exprimés en kilomètres. Les recherches retournent les positions des points dans la
+liste ayant servi à construire l'arbre. En cas d'égalité de distance, la plus petite position est retenue, ce qui
+reproduit le comportement d'un parcours séquentiel de la liste.
+
+La variable nb_distances compte les distances calculées par les recherches (voir le module instrumentation).
+"""
+
+from heapq import heappush, heappushpop
+from math import sqrt
+
+nb_distances = 0
+
+
+def construire_arbre_kd(points):
+    """
+    Construit un arbre k-d équilibré à partir d'une liste de points.
+
+    Args:
+        points (list): Une liste de tuples (x, y) en kilomètres
+
+    Returns:
+        tuple: La racine de l'arbre, ou None si la liste est vide. Chaque noeud est un tuple
+            (position, x, y, axe, gauche, droite).
+    """
+    return _construire_noeud(points, list(range(len(points))), 0)
+
+
+def _construire_noeud(points, positions, axe):
+    """
+    Construit récursivement le sous-arbre contenant les positions données, en séparant selon l'axe donné.
+
+    Args:
+        points (list): La liste complète des points
+        positions (list): Les positions des points à placer dans ce sous-arbre
+        axe (int): 0 pour séparer selon x, 1 pour séparer selon y
+
+    Returns:
+        tuple: Le noeud racine du sous-arbre, ou None si aucune position n'est donnée
+    """
+    if not positions:
+        return None
+
+    positions.sort(key=lambda position: points[position][axe])
+    milieu = len(positions) // 2
+    position = positions[milieu]
+    x, y = points[position]
+    axe_suivant = 1 - axe
+    return (position, x, y, axe,
+            _construire_noeud(points, positions[:milieu], axe_suivant),
+            _construire_noeud(points, positions[milieu + 1:], axe_suivant))
+
+
+def trouver_plus_proche(arbre, x, y, accepter=None):
+    """
+    Trouve le point de l'arbre le plus près du point (x, y).
+
+    Args:
+        arbre (tuple): La racine d'un arbre construit par construire_arbre_kd()
+        x (float): La coordonnée x du point de référence
+        y (float): La coordonnée y du point de référence
+        accepter (function): Fonction recevant une position et retournant False si le point doit être ignoré.
+            Par défaut, tous les points sont considérés.
+
+    Returns:
+        tuple: La position du point le plus proche et sa distance, ou (-1, inf) si aucun point n'est accepté
+    """
+    global nb_distances
+    meilleure_position = -1
+    meilleure_distance = float('inf')
+    nb_calculs = 0
+    pile = [(arbre, 0.0)]
+
+    while pile:
+        noeud, borne_inferieure = pile.pop()
+        if noeud is None or borne_inferieure > meilleure_distance:
+            continue
+
+        position, nx, ny, axe, gauche, droite = noeud
+        distance = sqrt((nx - x) ** 2 + (ny - y) ** 2)
+        nb_calculs += 1
+        if distance < meilleure_distance or (distance == meilleure_distance and position < meilleure_position):
+            if accepter is None or accepter(position):
+                meilleure_position = position
+                meilleure_distance = distance
+
+        ecart = (x if axe == 0 else y) - (nx if axe == 0 else ny)
+        if ecart < 0:
+            pile.append((droite, sqrt(ecart ** 2)))
+            pile.append((gauche, 0.0))
+        else:
+            pile.append((gauche, sqrt(ecart ** 2)))
+            pile.append((droite, 0.0))
+
+    nb_distances += nb_calculs
+    return meilleure_position, meilleure_distance
+
+
+def trouver_k_plus_proches(arbre, x, y, k, accepter=None):
+    """
+    Trouve les k points de l'arbre les plus près du point (x, y).
+
+    Args:
+        arbre (tuple): La racine d'un arbre construit par construire_arbre_kd()
+        x (float): La coordonnée x du point de référence
+        y (float): La coordonnée y du point de référence
+        k (int): Le nombre de points recherchés
+        accepter (function): Fonction recevant une position et retournant False si le point doit être ignoré
+
+    Returns:
+        list: Une liste d'au plus k tuples (distance, position), triée par distance croissante
+    """
+    global nb_distances
+    if k <= 0:
+        return []
+
+    tas = []  # tas maximal de taille k, les clés sont négatives
+    nb_calculs = 0
+    pile = [(arbre, 0.0)]
+
+    while pile:
+        noeud, borne_inferieure = pile.pop()
+        if noeud is None or (len(tas) == k and borne_inferieure > -tas[0][0]):
+            continue
+
+        position, nx, ny, axe, gauche, droite = noeud
+        distance = sqrt((nx - x) ** 2 + (ny - y) ** 2)
+        nb_calculs += 1
+        if accepter is None or accepter(position):
+            if len(tas) < k:
+                heappush(tas, (-distance, -position))
+            elif (distance, position) < (-tas[0][0], -tas[0][1]):
+                heappushpop(tas, (-distance, -position))
+
+        ecart = (x if axe == 0 else y) - (nx if axe == 0 else ny)
+        if ecart < 0:
+            pile.append((droite, sqrt(ecart ** 2)))
+            pile.append((gauche, 0.0))
+        else:
+            pile.append((gauche, sqrt(ecart ** 2)))
+            pile.append((droite, 0.0))
+
+    nb_distances += nb_calculs
+    return sorted((-distance, -position) for distance, position in tas)
+
+
+def trouver_dans_rayon(arbre, x, y, rayon, accepter=None):
+    """
+    Trouve tous les points de l'arbre situés à une distance inférieure ou égale au rayon du point (x, y).
+
+    Args:
+        arbre (tuple): La racine d'un arbre construit par construire_arbre_kd()
+        x (float): La coordonnée x du point de référence
+        y (float): La coordonnée y du point de référence
+        rayon (float): La distance maximale
+        accepter (function): Fonction recevant une position et retournant False si le point doit être ignoré
+
+    Returns:
+        list: Une liste de tuples (distance, position), triée par distance croissante
+    """
+    global nb_distances
+    resultats = []
+    nb_calculs = 0
+    pile = [(arbre, 0.0)]
+
+    while pile:
+        noeud, borne_inferieure = pile.pop()
+        if noeud is None or borne_inferieure > rayon:
+            continue
+
+        position, nx, ny, axe, gauche, droite = noeud
+        distance = sqrt((nx - x) ** 2 + (ny - y) ** 2)
+        nb_calculs += 1
+        if distance <= rayon and (accepter is None or accepter(position)):
+            resultats.append((distance, position))
+
+        ecart = (x if axe == 0 else y) - (nx if axe == 0 else ny)
+        if ecart < 0:
+            pile.append((droite, sqrt(ecart ** 2)))
+            pile.append((gauche, 0.0))
+        else:
+            pile.append((gauche, sqrt(ecart ** 2)))
+            pile.append((droite, 0.0))
+
+    nb_distances += nb_calculs
+    resultats.sort()
+    return resultats
+
+
+if __name__ == '__main__':
+    print('Exécution des tests...')
+    print('-----------------------')
+
+# tests pour construire_arbre_kd
+    assert construire_arbre_kd([]) is None
+    points_test = [(0.0, 0.0), (3.0, 4.0), (1.0, 1.0), (1.0, 1.0), (-2.0, 0.5), (6.0, -1.0)]
+    arbre_test = construire_arbre_kd(points_test)
+    assert arbre_test[0] in range(len(points_test))
+
+
+# tests pour trouver_plus_proche
+    assert trouver_plus_proche(None, 0.0, 0.0) == (-1, float('inf'))
+    assert trouver_plus_proche(arbre_test, 0.9, 1.2)[0] == 2  # égalité avec la position 3: la première gagne
+    assert trouver_plus_proche(arbre_test, 0.9, 1.2, lambda position: position != 2)[0] == 3
+    assert trouver_plus_proche(arbre_test, 5.0, 5.0)[0] == 1
+    assert trouver_plus_proche(arbre_test, 0.0, 0.0, lambda position: False) == (-1, float('inf'))
+    nb_distances_avant = nb_distances
+    trouver_plus_proche(arbre_test, 5.0, 5.0)
+    assert 1 <= nb_distances - nb_distances_avant <= len(points_test)
+
+
+# tests pour trouver_k_plus_proches
+    assert [position for _, position in trouver_k_plus_proches(arbre_test, 0.0, 0.0, 3)] == [0, 2, 3]
+    assert len(trouver_k_plus_proches(arbre_test, 0.0, 0.0, 10)) == 6
+    assert trouver_k_plus_proches(arbre_test, 0.0, 0.0, 0) == []
+
+
+# tests pour trouver_dans_rayon
+    assert [position for _, position in trouver_dans_rayon(arbre_test, 0.0, 0.0, 1.5)] == [0, 2, 3]
+    assert trouver_dans_rayon(arbre_test, 100.0, 100.0, 1.0) == []
+
+    # comparaison avec une recherche séquentielle sur une grille de points avec plusieurs égalités
+    grille = [(float(i % 7), float(i // 7)) for i in range(70)]
+    arbre_grille = construire_arbre_kd(grille)
+    for reference in grille:
+        attendu = min((sqrt((px - reference[0]) ** 2 + (py - reference[1]) ** 2), position)
+                      for position, (px, py) in enumerate(grille) if (px, py) != reference)
+        obtenu = trouver_plus_proche(arbre_grille, reference[0], reference[1],
+                                     lambda position: grille[position] != reference)
+        assert obtenu == (attendu[1], attendu[0])
+    print('index_spatial: OK')
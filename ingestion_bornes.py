@@ -0,0 +1,244 @@
+"""
+Module de lecture de plusieurs fichiers d'inventaire des bornes (plusieurs municipalités, plusieurs exportations
+annuelles) fusionnés en un seul inventaire.
+
+Les fichiers sont lus en parallèle, un par processus, et fusionnés dans l'ordre où ils sont donnés, au fur et à
+mesure que leur lecture se termine. Les doublons sont détectés à l'aide d'un dictionnaire indexé par numéro de
+borne normalisé (voir normaliser_numero()), en O(1) par borne. Deux bornes identiques ne sont gardées qu'une fois;
+pour deux bornes différentes de même numéro, une politique de conflit choisit celle qui est conservée.
+
+Chaque borne de l'inventaire fusionné conserve l'étiquette de sa source dans ses attributs (voir
+obtenir_attributs_borne()).
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import inventaire_bornes as ibornes
+
+POLITIQUES_CONFLIT = ('premiere', 'derniere', 'erreur')
+
+
+def _lire_fichier(nom_fichier, source, compacte):
+    """
+    Lit un fichier d'inventaire, dans un processus de lecture.
+
+    Args:
+        nom_fichier (str): Le fichier texte contenant l'inventaire des bornes
+        source (str): L'étiquette de la source placée dans les attributs des bornes
+        compacte (bool): True pour représenter les bornes avec la classe Borne plutôt qu'avec des dictionnaires
+
+    Returns:
+        tuple: La liste des tuples (borne, attributs) du fichier et la liste de ses lignes invalides, sous forme de
+            tuples (numéro de ligne, message)
+    """
+    erreurs = []
+    bornes = list(ibornes.iterer_fichier_bornes(nom_fichier, erreurs=erreurs, compacte=compacte, avec_attributs=True,
+                                                source=source))
+    return bornes, erreurs
+
+
+def _resoudre_conflit(politique, existante, nouvelle):
+    """
+    Choisit, entre deux bornes différentes de même numéro, celle qui est conservée.
+
+    Args:
+        politique (str): La politique de conflit, l'une de POLITIQUES_CONFLIT, ou une fonction qui reçoit les deux
+            tuples (borne, attributs) et retourne celui à conserver
+        existante (tuple): La borne déjà retenue et ses attributs
+        nouvelle (tuple): La borne lue ensuite et ses attributs
+
+    Returns:
+        tuple: La borne conservée et ses attributs
+
+    Raises:
+        ValueError: Si la politique est 'erreur'
+    """
+    if politique == 'premiere':
+        return existante
+    if politique == 'derniere':
+        return nouvelle
+    if politique == 'erreur':
+        raise ValueError(f"conflit pour la borne {existante[0]['Numero']} entre les sources "
+                         f"{existante[1][-1]} et {nouvelle[1][-1]}")
+    return politique(existante, nouvelle)
+
+
+def fusionner_bornes(lots, politique='premiere', conflits=None):
+    """
+    Fusionne des lots de bornes en un seul inventaire, en éliminant les doublons par numéro de borne.
+
+    Une borne garde la position de la première borne de son numéro, même lorsque la politique retient une borne
+    d'un lot suivant.
+
+    Args:
+        lots (iterable): Les lots à fusionner, par ordre de priorité; chaque lot est une liste de tuples
+            (borne, attributs), tels que produits par iterer_fichier_bornes() avec avec_attributs=True
+        politique (str): La politique appliquée à deux bornes différentes de même numéro: 'premiere' (la première
+            est conservée), 'derniere' (la dernière la remplace) ou 'erreur' (une ValueError est levée). Une fonction
+            qui reçoit les deux tuples (borne, attributs) et retourne celui à conserver peut aussi être donnée.
+        conflits (list): Si donnée, chaque conflit y est ajouté sous forme de tuple (numéro normalisé, source
+            conservée, source écartée)
+
+    Returns:
+        Inventaire: L'inventaire fusionné, avec les attributs de chaque borne
+
+    Raises:
+        ValueError: Si la politique est inconnue, ou si elle est 'erreur' et que deux bornes sont en conflit
+    """
+    if not callable(politique) and politique not in POLITIQUES_CONFLIT:
+        raise ValueError(f'politique de conflit inconnue: {politique}')
+
+    retenues = []
+    positions = {}
+    for lot in lots:
+        for nouvelle in lot:
+            numero = ibornes.normaliser_numero(nouvelle[0]['Numero'])
+            position = positions.get(numero)
+            if position is None:
+                positions[numero] = len(retenues)
+                retenues.append(nouvelle)
+                continue
+
+            existante = retenues[position]
+            if existante[0] == nouvelle[0]:
+                continue  # simple doublon: la première occurrence est gardée
+            conservee = _resoudre_conflit(politique, existante, nouvelle)
+            retenues[position] = conservee
+            if conflits is not None:
+                ecartee = nouvelle if conservee is existante else existante
+                conflits.append((numero, conservee[1][-1], ecartee[1][-1]))
+
+    inventaire = ibornes.Inventaire(borne for borne, _ in retenues)
+    for borne, attributs in retenues:
+        inventaire._attributs[id(borne)] = attributs
+    return inventaire
+
+
+def lire_fichiers_bornes(fichiers, politique='premiere', nb_processus=None, compacte=False, conflits=None,
+                         erreurs=None):
+    """
+    Lit plusieurs fichiers d'inventaire en parallèle et les fusionne en un seul inventaire (voir fusionner_bornes()).
+
+    Args:
+        fichiers (list): Les noms des fichiers, par ordre de priorité, ou un dictionnaire {étiquette: nom du
+            fichier} pour choisir l'étiquette de chaque source. Par défaut, l'étiquette est le nom du fichier.
+        politique (str): La politique de conflit (voir fusionner_bornes())
+        nb_processus (int): Le nombre de processus de lecture. Par défaut, le nombre de processeurs. Avec 1, les
+            fichiers sont lus dans le processus courant.
+        compacte (bool): True pour représenter les bornes avec la classe Borne plutôt qu'avec des dictionnaires
+        conflits (list): Si donnée, les conflits y sont ajoutés (voir fusionner_bornes())
+        erreurs (list): Si donnée, les lignes invalides y sont ajoutées sous forme de tuples (étiquette de la
+            source, numéro de ligne, message) et la lecture continue. Sinon, une ligne invalide lève une ValueError.
+
+    Returns:
+        Inventaire: L'inventaire fusionné
+
+    Raises:
+        OSError: Si un fichier ne peut pas être lu
+        ValueError: Si la politique est inconnue, si elle est 'erreur' et que deux bornes sont en conflit, ou si
+            une ligne est invalide et que la liste erreurs n'est pas donnée
+    """
+    if not callable(politique) and politique not in POLITIQUES_CONFLIT:
+        raise ValueError(f'politique de conflit inconnue: {politique}')
+    sources = list(fichiers.items()) if isinstance(fichiers, dict) else [(str(nom), nom) for nom in fichiers]
+    if nb_processus is None:
+        nb_processus = os.cpu_count() or 1
+    nb_processus = max(1, min(nb_processus, len(sources)))
+
+    def ajouter_erreurs(resultats):
+        for (source, nom_fichier), (bornes, erreurs_fichier) in zip(sources, resultats):
+            if erreurs_fichier:
+                if erreurs is None:
+                    ligne, message = erreurs_fichier[0]
+                    raise ValueError(f"{nom_fichier}, ligne {ligne}: {message}")
+                erreurs.extend((source, ligne, message) for ligne, message in erreurs_fichier)
+            yield bornes
+
+    arguments = ([nom_fichier for _, nom_fichier in sources], [source for source, _ in sources],
+                 [compacte] * len(sources))
+    if nb_processus == 1:
+        return fusionner_bornes(ajouter_erreurs(map(_lire_fichier, *arguments)), politique, conflits)
+    with ProcessPoolExecutor(nb_processus) as executeur:
+        # les lots sont fusionnés dans l'ordre, pendant que les fichiers suivants sont encore en lecture
+        return fusionner_bornes(ajouter_erreurs(executeur.map(_lire_fichier, *arguments)), politique, conflits)
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    print('Exécution des tests...')
+    print('-----------------------')
+
+    with open('vdq-bornestationnement.txt', encoding='utf-8-sig', newline='') as f:
+        lignes = f.readlines()
+    inventaire_complet = ibornes.lire_fichier_bornes('vdq-bornestationnement.txt')
+
+    with tempfile.TemporaryDirectory() as dossier_temporaire:
+        def ecrire_fichier(nom, lignes_fichier):
+            chemin = os.path.join(dossier_temporaire, nom)
+            with open(chemin, 'w', encoding='utf-8', newline='') as f:
+                f.writelines([lignes[0]] + lignes_fichier)
+            return chemin
+
+        # trois exportations qui se chevauchent; la deuxième déplace la borne de la ligne 600
+        champs = lignes[600].split(',')
+        champs[5] = '-71.2'
+        fichiers_test = [ecrire_fichier('ville_a.txt', lignes[1:700]),
+                         ecrire_fichier('ville_b.txt', lignes[500:600] + [','.join(champs)] + lignes[601:1200]),
+                         ecrire_fichier('ville_c.txt', lignes[1100:])]
+        numero_deplace = ibornes.normaliser_numero(champs[1])
+
+# tests pour fusionner_bornes et lire_fichiers_bornes
+        # le fichier complet contient lui-même deux bornes 3153 différentes, aux lignes 1697 et 1698
+        attendu = inventaire_complet[:1696] + inventaire_complet[1697:]
+        conflits_test = []
+        fusion = lire_fichiers_bornes(fichiers_test, nb_processus=1, conflits=conflits_test)
+        assert list(fusion) == attendu
+        assert conflits_test == [(numero_deplace, fichiers_test[0], fichiers_test[1]),
+                                 (3153, fichiers_test[2], fichiers_test[2])]
+        assert [ibornes.obtenir_attributs_borne(fusion, borne)['SOURCE'] for borne in (fusion[0], fusion[-1])] == \
+            [fichiers_test[0], fichiers_test[2]]
+        assert ibornes.selectionner_bornes_par_rue(fusion, 'Charest') == \
+            ibornes.selectionner_bornes_par_rue(attendu, 'Charest')
+
+        # la politique 'derniere' garde la borne déplacée, à la position de la première
+        fusion_derniere = lire_fichiers_bornes(fichiers_test, 'derniere', nb_processus=1)
+        assert fusion_derniere[599]['Coordonnees'][1] == -71.2 and len(fusion_derniere) == len(fusion)
+        assert ibornes.obtenir_attributs_borne(fusion_derniere, fusion_derniere[599])['SOURCE'] == fichiers_test[1]
+
+        # une fonction peut choisir la borne conservée
+        def garder_plus_a_l_ouest(existante, nouvelle):
+            return min(existante, nouvelle, key=lambda element: element[0]['Coordonnees'][1])
+
+        fusion_fonction = lire_fichiers_bornes(fichiers_test, garder_plus_a_l_ouest, nb_processus=1)
+        assert fusion_fonction[599]['Coordonnees'][1] == min(-71.2, inventaire_complet[599]['Coordonnees'][1])
+
+        for politique_invalide in ('erreur', 'inconnue'):
+            try:
+                lire_fichiers_bornes(fichiers_test, politique_invalide, nb_processus=1)
+                assert False
+            except ValueError:
+                pass
+
+        # en parallèle, avec des étiquettes et des bornes compactes
+        etiquettes = {f'source_{position}': nom for position, nom in enumerate(fichiers_test)}
+        fusion_parallele = lire_fichiers_bornes(etiquettes, nb_processus=3, compacte=True)
+        assert isinstance(fusion_parallele[0], ibornes.Borne)
+        assert [(borne['Numero'], borne['Coordonnees']) for borne in fusion_parallele] == \
+            [(int(borne['Numero']), borne['Coordonnees']) for borne in fusion]
+        assert ibornes.obtenir_attributs_borne(fusion_parallele, fusion_parallele[-1]) == \
+            {**ibornes.obtenir_attributs_borne(fusion, fusion[-1]), 'SOURCE': 'source_2'}
+
+        # lignes invalides
+        fichier_invalide = ecrire_fichier('invalide.txt', lignes[1:3] + ['ligne,invalide\r\n'])
+        erreurs_test = []
+        assert len(lire_fichiers_bornes([fichier_invalide], erreurs=erreurs_test)) == 2
+        assert erreurs_test == [(fichier_invalide, 4, '2 colonnes au lieu de 7')]
+        try:
+            lire_fichiers_bornes([fichiers_test[0], fichier_invalide], nb_processus=2)
+            assert False
+        except ValueError:
+            pass
+        assert len(lire_fichiers_bornes([])) == 0
+    print('ingestion_bornes: OK')
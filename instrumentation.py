@@ -0,0 +1,325 @@
+"""
+Module d'instrumentation des fonctions de l'inventaire des bornes. Lorsqu'elle est activée, chaque fonction publique
+du module inventaire_bornes est remplacée par une enveloppe qui mesure, pour chaque appel, sa durée et le nombre de
+distances calculées. Les appels faits entre les fonctions du module passent aussi par ces enveloppes. Les fonctions
+appelées pour chaque borne (FONCTIONS_NON_INSTRUMENTEES) ne sont pas enveloppées: leur coût est compté dans celui des
+fonctions qui les appellent.
+
+L'instrumentation est désactivée par défaut et ne coûte alors rien. Elle s'active avec activer(), ou avec
+activer_si_demande() lorsque la variable d'environnement BORNES_INSTRUMENTATION vaut 1 ou qu'un fichier
+d'exportation est demandé. Si la variable BORNES_INSTRUMENTATION_JSON contient un nom de fichier, les statistiques y
+sont exportées à la fin du programme.
+
+Les durées et les distances sont inclusives: celles d'une fonction comprennent celles des fonctions qu'elle appelle.
+Pour borner la mémoire, les centiles sont calculés sur un échantillon d'au plus TAILLE_ECHANTILLON durées par
+fonction, tiré uniformément parmi tous les appels; la durée totale et le nombre d'appels restent exacts.
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import random
+import time
+
+import geometrie_plane
+import index_spatial
+import inventaire_bornes as ibornes
+
+VARIABLE_ACTIVATION = 'BORNES_INSTRUMENTATION'
+VARIABLE_EXPORT = 'BORNES_INSTRUMENTATION_JSON'
+
+# fonctions appelées pour chaque borne, trop courtes pour que leur mesure ne fausse pas celle de leur appelant
+FONCTIONS_NON_INSTRUMENTEES = frozenset(('normaliser_texte', 'calculer_trigrammes', 'normaliser_numero',
+                                         'obtenir_attributs_borne', 'creer_borne', 'creer_borne_compacte',
+                                         'creer_borne_avec_chaine', 'projeter_coordonnees', 'exclure_meme_rue',
+                                         'exclure_meme_cote'))
+
+# nombre maximal de durées conservées par fonction pour le calcul des centiles
+TAILLE_ECHANTILLON = 1024
+
+# fonctions originales des fonctions instrumentées, par nom
+_originales = {}
+
+# mesures par nom de fonction: {'appels': int, 'duree_totale': float, 'durees': list, 'distances': int}
+_mesures = {}
+
+_generateur = random.Random()
+
+# fichier où exporter les statistiques à la fin du programme, voir activer_si_demande()
+_fichier_export = None
+
+
+def compter_distances():
+    """
+    Retourne le nombre total de distances calculées par les modules de l'inventaire depuis le démarrage.
+
+    Returns:
+        int: Le nombre de distances calculées
+    """
+    return ibornes.nb_distances + index_spatial.nb_distances + geometrie_plane.nb_distances
+
+
+def _envelopper(nom, fonction):
+    """
+    Construit l'enveloppe qui mesure les appels d'une fonction.
+
+    Args:
+        nom (str): Le nom de la fonction
+        fonction (function): La fonction à mesurer
+
+    Returns:
+        function: L'enveloppe, qui s'utilise comme la fonction
+    """
+    mesures = _mesures.setdefault(nom, {'appels': 0, 'duree_totale': 0.0, 'durees': [], 'distances': 0})
+
+    @functools.wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        distances_avant = compter_distances()
+        debut = time.perf_counter()
+        try:
+            return fonction(*args, **kwargs)
+        finally:
+            duree = time.perf_counter() - debut
+            mesures['appels'] += 1
+            mesures['duree_totale'] += duree
+            mesures['distances'] += compter_distances() - distances_avant
+            # échantillonnage par réservoir: chaque appel a la même probabilité d'être conservé
+            durees = mesures['durees']
+            if len(durees) < TAILLE_ECHANTILLON:
+                durees.append(duree)
+            else:
+                rang = _generateur.randrange(mesures['appels'])
+                if rang < TAILLE_ECHANTILLON:
+                    durees[rang] = duree
+
+    return enveloppe
+
+
+def est_active():
+    """
+    Indique si l'instrumentation est activée.
+
+    Returns:
+        bool: True si les fonctions du module inventaire_bornes sont instrumentées
+    """
+    return bool(_originales)
+
+
+def activer():
+    """
+    Active l'instrumentation: remplace chaque fonction publique du module inventaire_bornes, sauf celles de
+    FONCTIONS_NON_INSTRUMENTEES, par une enveloppe qui mesure ses appels. Sans effet si l'instrumentation est déjà
+    activée.
+    """
+    if est_active():
+        return
+    for nom, fonction in list(vars(ibornes).items()):
+        if (inspect.isfunction(fonction) and fonction.__module__ == ibornes.__name__ and not nom.startswith('_')
+                and nom not in FONCTIONS_NON_INSTRUMENTEES):
+            _originales[nom] = fonction
+            setattr(ibornes, nom, _envelopper(nom, fonction))
+
+
+def desactiver():
+    """
+    Désactive l'instrumentation en remettant les fonctions originales. Les mesures sont conservées.
+    """
+    for nom, fonction in _originales.items():
+        setattr(ibornes, nom, fonction)
+    _originales.clear()
+
+
+def activer_si_demande(nom_fichier=None):
+    """
+    Active l'instrumentation si la variable d'environnement BORNES_INSTRUMENTATION vaut 1 ou si un fichier
+    d'exportation est demandé, et programme l'exportation des statistiques dans ce fichier à la fin du programme.
+    Les statistiques ne sont exportées qu'une seule fois, dans le dernier fichier demandé.
+
+    Args:
+        nom_fichier (str): Le fichier JSON où exporter les statistiques. Par défaut, celui de la variable
+            d'environnement BORNES_INSTRUMENTATION_JSON, s'il y en a un.
+
+    Returns:
+        bool: True si l'instrumentation est activée
+    """
+    global _fichier_export
+    nom_fichier = nom_fichier or os.environ.get(VARIABLE_EXPORT)
+    if os.environ.get(VARIABLE_ACTIVATION, '') == '1' or nom_fichier:
+        activer()
+    if nom_fichier:
+        if _fichier_export is None:
+            atexit.register(_exporter_a_la_fin)
+        _fichier_export = nom_fichier
+    return est_active()
+
+
+def _exporter_a_la_fin():
+    """
+    Exporte les statistiques dans le fichier demandé à activer_si_demande(), à la fin du programme.
+    """
+    exporter_statistiques(_fichier_export)
+
+
+def reinitialiser():
+    """
+    Efface les mesures accumulées.
+    """
+    for mesures in _mesures.values():
+        mesures['appels'] = 0
+        mesures['duree_totale'] = 0.0
+        mesures['durees'].clear()
+        mesures['distances'] = 0
+
+
+def _calculer_centile(durees_triees, centile):
+    """
+    Calcule un centile d'une liste triée par la méthode du rang le plus proche.
+
+    Args:
+        durees_triees (list): Les valeurs triées
+        centile (float): Le centile recherché, entre 0 et 100
+
+    Returns:
+        float: La valeur du centile
+    """
+    rang = max(1, -(-len(durees_triees) * centile // 100))
+    return durees_triees[int(rang) - 1]
+
+
+def obtenir_statistiques():
+    """
+    Retourne les statistiques des fonctions appelées au moins une fois.
+
+    Returns:
+        dict: Pour chaque nom de fonction, un dictionnaire contenant le nombre d'appels ('appels'), la durée totale
+            ('duree_totale_s'), les centiles 50, 90 et 99 des durées échantillonnées ('p50_s', 'p90_s', 'p99_s'), le
+            nombre de distances calculées ('distances') et ce nombre par appel ('distances_par_appel')
+    """
+    statistiques = {}
+    for nom, mesures in sorted(_mesures.items()):
+        if not mesures['appels']:
+            continue
+        durees = sorted(mesures['durees'])
+        statistiques[nom] = {
+            'appels': mesures['appels'],
+            'duree_totale_s': mesures['duree_totale'],
+            'p50_s': _calculer_centile(durees, 50),
+            'p90_s': _calculer_centile(durees, 90),
+            'p99_s': _calculer_centile(durees, 99),
+            'distances': mesures['distances'],
+            'distances_par_appel': mesures['distances'] / mesures['appels'],
+        }
+    return statistiques
+
+
+def afficher_statistiques(sortie=None):
+    """
+    Affiche les statistiques des fonctions appelées, de la plus coûteuse à la moins coûteuse.
+
+    Args:
+        sortie (file): Le fichier où afficher les statistiques. Par défaut, la sortie standard.
+    """
+    statistiques = obtenir_statistiques()
+    if not statistiques:
+        print("Aucune statistique d'exécution (l'instrumentation est-elle activée?)", file=sortie)
+        return
+
+    print(f"{'Fonction':36}{'Appels':>9}{'Total (ms)':>13}{'p50 (ms)':>11}{'p90 (ms)':>11}{'p99 (ms)':>11}"
+          f"{'Distances/appel':>17}", file=sortie)
+    for nom, stats in sorted(statistiques.items(), key=lambda element: -element[1]['duree_totale_s']):
+        print(f"{nom:36}{stats['appels']:>9}{stats['duree_totale_s'] * 1000:>13.3f}{stats['p50_s'] * 1000:>11.3f}"
+              f"{stats['p90_s'] * 1000:>11.3f}{stats['p99_s'] * 1000:>11.3f}{stats['distances_par_appel']:>17.1f}",
+              file=sortie)
+
+
+def exporter_statistiques(nom_fichier):
+    """
+    Exporte les statistiques dans un fichier JSON.
+
+    Args:
+        nom_fichier (str): Le fichier JSON à créer
+    """
+    with open(nom_fichier, 'w', encoding='utf-8') as f:
+        json.dump({'distances_totales': compter_distances(), 'fonctions': obtenir_statistiques()}, f, indent=2)
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    print('Exécution des tests...')
+    print('-----------------------')
+
+    inventaire_test = ibornes.lire_fichier_bornes('vdq-bornestationnement-reduit.txt')
+
+# tests pour activer et desactiver
+    fonction_originale = ibornes.trouver_borne_centrale
+    assert not est_active()
+    activer()
+    assert est_active()
+    assert ibornes.trouver_borne_centrale is not fonction_originale
+    assert ibornes.trouver_borne_centrale.__wrapped__ is fonction_originale
+    assert '_compter_distances' not in _originales and 'Inventaire' not in _originales
+    assert 'normaliser_numero' not in _originales and 'creer_borne' not in _originales
+    assert all(nom not in _originales for nom in FONCTIONS_NON_INSTRUMENTEES)
+    activer()
+    assert ibornes.trouver_borne_centrale.__wrapped__ is fonction_originale
+
+
+# tests pour obtenir_statistiques
+    ibornes.trouver_borne_centrale(inventaire_test)
+    ibornes.trouver_borne_centrale(list(inventaire_test))
+    for borne in inventaire_test:
+        ibornes.calculer_distance_bornes(inventaire_test[0], borne)
+    statistiques = obtenir_statistiques()
+    assert statistiques['trouver_borne_centrale']['appels'] == 2
+    assert statistiques['calculer_sommes_distances']['appels'] == 2
+    assert statistiques['trouver_borne_centrale']['distances_par_appel'] == 25  # un seul bloc de 5 x 5
+    assert statistiques['calculer_distance_bornes'] == {**statistiques['calculer_distance_bornes'], 'appels': 5,
+                                                        'distances': 5, 'distances_par_appel': 1.0}
+    stats = statistiques['trouver_borne_centrale']
+    assert 0 <= stats['p50_s'] <= stats['p90_s'] <= stats['p99_s'] <= stats['duree_totale_s']
+    assert _calculer_centile([1, 2, 3, 4], 50) == 2 and _calculer_centile([1, 2, 3, 4], 99) == 4
+
+    for _ in range(TAILLE_ECHANTILLON + 500):
+        ibornes.rechercher_rues(inventaire_test, 'charest')
+    mesures_rues = _mesures['rechercher_rues']
+    assert len(mesures_rues['durees']) == TAILLE_ECHANTILLON
+    assert obtenir_statistiques()['rechercher_rues']['appels'] == TAILLE_ECHANTILLON + 500
+    assert obtenir_statistiques()['rechercher_rues']['duree_totale_s'] >= sum(mesures_rues['durees'])
+
+
+# tests pour exporter_statistiques
+    with tempfile.TemporaryDirectory() as dossier_temporaire:
+        nom_fichier_test = os.path.join(dossier_temporaire, 'statistiques.json')
+        exporter_statistiques(nom_fichier_test)
+        with open(nom_fichier_test, encoding='utf-8') as f:
+            assert json.load(f)['fonctions']['trouver_borne_centrale']['appels'] == 2
+
+
+# tests pour activer_si_demande
+    enregistrements = []
+    enregistrer_original = atexit.register
+    atexit.register = enregistrements.append
+    try:
+        desactiver()
+        os.environ.pop(VARIABLE_ACTIVATION, None)
+        os.environ[VARIABLE_EXPORT] = 'variable.json'
+        assert activer_si_demande('option.json')
+        assert activer_si_demande()
+        assert enregistrements == [_exporter_a_la_fin] and _fichier_export == 'variable.json'
+        del os.environ[VARIABLE_EXPORT]
+        assert activer_si_demande('option.json') and _fichier_export == 'option.json'
+        assert len(enregistrements) == 1
+    finally:
+        atexit.register = enregistrer_original
+
+
+# tests pour reinitialiser
+    reinitialiser()
+    desactiver()
+    assert ibornes.trouver_borne_centrale is fonction_originale
+    ibornes.trouver_borne_centrale(inventaire_test)
+    assert obtenir_statistiques() == {}
+    print('instrumentation: OK')
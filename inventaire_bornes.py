@@ -3,7 +3,556 @@ Module regroupant les fonctions pour gérer et analyser l'inventaire des bornes
 la ville de Québec.
 """
 
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Mapping, Sequence
+import csv
+from heapq import nsmallest
+from itertools import accumulate, chain
 from math import sqrt
+import mmap
+import sys
+import unicodedata
+
+import geometrie_plane
+import index_agregats
+import index_spatial
+import metriques_distance
+
+# nombre de distances calculées par les fonctions du module, consulté par le module instrumentation
+nb_distances = 0
+
+
+def _compter_distances(nombre):
+    """
+    Ajoute un nombre de distances calculées au compteur du module.
+
+    Args:
+        nombre (int): Le nombre de distances calculées
+    """
+    global nb_distances
+    nb_distances += nombre
+
+
+def normaliser_texte(texte):
+    """
+    Normalise un texte pour les recherches: les majuscules et les accents sont ignorés.
+
+    Args:
+        texte (str): Le texte à normaliser
+
+    Returns:
+        str: Le texte sans majuscules ni accents
+    """
+    decompose = unicodedata.normalize('NFKD', texte.casefold())
+    return ''.join(caractere for caractere in decompose if not unicodedata.combining(caractere))
+
+
+def calculer_trigrammes(texte):
+    """
+    Retourne l'ensemble des trigrammes (sous-chaînes de trois caractères) d'un texte.
+
+    Args:
+        texte (str): Le texte, déjà normalisé
+
+    Returns:
+        set: Les trigrammes du texte
+    """
+    return {texte[debut:debut + 3] for debut in range(len(texte) - 2)}
+
+
+def normaliser_numero(numero_borne):
+    """
+    Normalise un numéro de borne pour les comparaisons: '4060', ' 4060' et 4060 désignent la même borne.
+
+    Args:
+        numero_borne (int): Le numéro d'une borne, sous forme d'entier ou de chaîne de caractères
+
+    Returns:
+        int: Le numéro sous forme d'entier, ou la chaîne sans espaces superflus s'il n'est pas numérique
+    """
+    try:
+        return int(numero_borne)
+    except (TypeError, ValueError):
+        return str(numero_borne).strip()
+
+
+class Inventaire(list):
+    """
+    Liste de bornes qui conserve les structures dérivées de son contenu (comme l'index spatial) tant que celui-ci
+    ne change pas. Toute modification de la liste incrémente sa version. Un ajout (append, extend), un retrait
+    (remove, pop) ou un remplacement (remplacer()) met les colonnes à jour sur place et laisse l'index spatial en
+    place: les bornes modifiées depuis sa construction sont examinées une à une lors des recherches, jusqu'à ce
+    qu'elles soient assez nombreuses pour justifier de reconstruire l'index. Les autres modifications de la liste
+    (insert, sort, etc.) invalident ces structures.
+
+    Les colonnes de l'inventaire (numéros, côtés, rues, coordonnées et coordonnées projetées en kilomètres) sont
+    conservées sous forme de listes et de tableaux parallèles, ce qui permet aux fonctions du module de faire leurs
+    calculs sans accéder aux dictionnaires des bornes. Un Inventaire s'utilise partout où une liste de bornes est
+    attendue.
+
+    L'inventaire maintient aussi des index par numéro normalisé, par côté et par rue. Ces index associent chaque
+    valeur à un dictionnaire {id(borne): borne} dans l'ordre de l'inventaire, et sont mis à jour en O(1) à chaque
+    ajout ou retrait de borne. Avec differer_index=True, ces index ne sont construits qu'à leur première
+    utilisation, ce qui rend la création de l'inventaire presque gratuite. Un index de trigrammes sur les noms de
+    rue normalisés (voir normaliser_texte()) permet de trouver les rues contenant une sous-chaîne sans parcourir
+    toutes les rues.
+
+    Enfin, l'inventaire conserve pour chaque borne les attributs du fichier source qui ne font pas partie de la borne
+    elle-même (voir ATTRIBUTS_SOURCE et obtenir_attributs_borne()). Sur demande, il maintient aussi la somme des
+    distances de chaque borne avec toutes les autres, ce qui permet de connaître la borne centrale sans refaire le
+    calcul en O(n²) après chaque ajout ou retrait (voir suivre_borne_centrale()), ainsi qu'un index d'agrégats par
+    rue, par côté et par cellule de grille, mis à jour avec les autres index (voir suivre_agregats()).
+    """
+
+    def __init__(self, bornes=(), differer_index=False):
+        super().__init__(bornes)
+        self.version = 0
+        self._index_spatial = None
+        self._modifications_index = None
+        self._colonnes = None
+        self._attributs = {}
+        self._suivi_centrale = None
+        self._agregats = None
+        if not differer_index:
+            self._reconstruire_index()
+
+    def __getattr__(self, nom):
+        # appelée seulement pour un attribut absent: un index différé est construit à sa première utilisation
+        if nom in _ATTRIBUTS_INDEX:
+            self._reconstruire_index()
+            return getattr(self, nom)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{nom}'")
+
+    def __reduce__(self):
+        return self.__class__, (list(self),), [self._attributs.get(id(borne)) for borne in self]
+
+    def __setstate__(self, attributs):
+        for borne, attributs_borne in zip(self, attributs):
+            if attributs_borne is not None:
+                self._attributs[id(borne)] = attributs_borne
+
+    def _modifier(self):
+        """
+        Incrémente la version de l'inventaire et invalide les structures dérivées.
+        """
+        self.version += 1
+        self._index_spatial = None
+        self._colonnes = None
+
+    def _signaler_ajouts(self, debut):
+        """
+        Incrémente la version de l'inventaire après l'ajout de bornes à la fin de la liste et prolonge les colonnes.
+        Les nouvelles bornes, placées après toutes celles de l'index spatial, restent hors de l'index.
+
+        Args:
+            debut (int): La position de la première borne ajoutée
+        """
+        self.version += 1
+        colonnes = self._colonnes
+        if colonnes is None:
+            return
+        for borne in self[debut:]:
+            _ecrire_colonnes(colonnes, borne)
+
+    def _signaler_retrait(self, position):
+        """
+        Incrémente la version de l'inventaire après le retrait d'une borne, retire la borne des colonnes et la marque
+        comme retirée dans l'index spatial.
+
+        Args:
+            position (int): La position de la borne retirée
+        """
+        self.version += 1
+        if self._colonnes is not None:
+            for colonne in self._colonnes.values():
+                del colonne[position]
+        modifications = self._modifications_index
+        if self._index_spatial is None or position >= modifications['Debut']:
+            return  # aucun index, ou borne ajoutée depuis sa construction
+
+        modifications['Debut'] -= 1
+        position_index = self._trouver_position_index(position)
+        remplacements = modifications['Remplacements']
+        rang = bisect_left(remplacements, position_index)
+        if rang < len(remplacements) and remplacements[rang] == position_index:
+            del remplacements[rang]
+        insort(modifications['Retraits'], position_index)
+
+    def _signaler_remplacement(self, position):
+        """
+        Incrémente la version de l'inventaire après le remplacement d'une borne, met les colonnes à jour et marque la
+        position comme remplacée dans l'index spatial.
+
+        Args:
+            position (int): La position de la borne remplacée
+        """
+        self.version += 1
+        if self._colonnes is not None:
+            _ecrire_colonnes(self._colonnes, self[position], position)
+        modifications = self._modifications_index
+        if self._index_spatial is None or position >= modifications['Debut']:
+            return
+
+        position_index = self._trouver_position_index(position)
+        remplacements = modifications['Remplacements']
+        rang = bisect_left(remplacements, position_index)
+        if rang == len(remplacements) or remplacements[rang] != position_index:
+            remplacements.insert(rang, position_index)
+
+    def _trouver_position_index(self, position):
+        """
+        Retourne la position dans l'index spatial d'une borne qui en fait partie, en tenant compte des bornes retirées
+        depuis la construction de l'index.
+
+        Args:
+            position (int): La position de la borne dans la liste
+
+        Returns:
+            int: La position de la borne dans l'index spatial
+        """
+        # la k-ième borne retirée (rang i) précède la position cherchée si retrait - i <= position
+        retraits = self._modifications_index['Retraits']
+        return position + bisect_right(range(len(retraits)), position, key=lambda rang: retraits[rang] - rang)
+
+    def _trouver_position(self, borne):
+        """
+        Retourne la position de la première occurrence d'une borne dans la liste, en la cherchant par identité.
+
+        Les rangs des bornes (voir _indexer()) croissent dans l'ordre de la liste: la borne est trouvée par recherche
+        binaire sur les rangs en O(log n), sans comparer les bornes entre elles. Un objet présent plusieurs fois dans
+        la liste rompt cet ordre; la liste est alors parcourue en O(n), en comparant seulement les identités.
+
+        Args:
+            borne (dict): La borne cherchée
+
+        Returns:
+            int: La position de la borne, ou -1 si cet objet n'est pas dans la liste
+        """
+        entree = self._entrees.get(id(borne))
+        if entree is None:
+            return -1
+        if entree[0] == 1:
+            position = bisect_left(self, entree[2], key=lambda element: self._entrees[id(element)][2])
+            if position < len(self) and self[position] is borne:
+                return position
+        for position, element in enumerate(self):
+            if element is borne:
+                return position
+        return -1
+
+    def _reconstruire_index(self):
+        """
+        Reconstruit les index par numéro, par côté et par rue à partir du contenu de la liste.
+        """
+        self._par_numero = {}
+        self._par_cote = {}
+        self._par_rue = {}
+        self._entrees = {}
+        self._rues_normalisees = {}
+        self._trigrammes = {}
+        self._compteur = 0
+        if self._agregats is not None:
+            self._agregats = index_agregats.IndexAgregats(self._agregats.taille_cellule)
+        for borne in self:
+            self._indexer(borne)
+        self._attributs = {cle: attributs for cle, attributs in self._attributs.items() if cle in self._entrees}
+
+    def _indexer(self, borne, rang=None):
+        """
+        Ajoute une borne aux index.
+
+        Args:
+            borne (dict): La borne ajoutée à la liste
+            rang (int): Le rang de la borne dans l'ordre de l'inventaire. Par défaut, la borne est placée après
+                toutes les autres.
+        """
+        if '_entrees' not in self.__dict__:
+            return  # index différé: il sera construit à partir du contenu de la liste
+        cle = id(borne)
+        entree = self._entrees.get(cle)
+        if entree is not None:  # le même objet est déjà présent dans la liste
+            entree[0] += 1
+            return
+
+        a_la_fin = rang is None
+        if a_la_fin:
+            rang = self._compteur
+            self._compteur += 1
+        valeurs = (normaliser_numero(borne['Numero']), borne['Cote'], borne['Rue'])
+        self._entrees[cle] = [1, valeurs, rang]
+        if self._agregats is not None:
+            self._agregats.ajouter(cle, *_projeter_borne(borne), borne['Coordonnees'], valeurs[2], valeurs[1])
+        for index, valeur in zip((self._par_numero, self._par_cote, self._par_rue), valeurs):
+            groupe = index.get(valeur)
+            if groupe is None:
+                index[valeur] = {cle: borne}
+            else:
+                groupe[cle] = borne
+                if not a_la_fin:  # les groupes doivent rester dans l'ordre de l'inventaire
+                    index[valeur] = dict(sorted(groupe.items(), key=lambda element: self._entrees[element[0]][2]))
+
+        rue = valeurs[2]
+        if rue not in self._rues_normalisees:
+            rue_normalisee = normaliser_texte(rue)
+            self._rues_normalisees[rue] = (rue_normalisee, rang)
+            for trigramme in calculer_trigrammes(rue_normalisee):
+                self._trigrammes.setdefault(trigramme, set()).add(rue)
+
+    def _desindexer(self, borne):
+        """
+        Retire une borne des index.
+
+        Args:
+            borne (dict): La borne retirée de la liste
+        """
+        if '_entrees' not in self.__dict__:
+            return
+        cle = id(borne)
+        entree = self._entrees[cle]
+        entree[0] -= 1
+        if entree[0]:
+            return
+
+        del self._entrees[cle]
+        self._attributs.pop(cle, None)
+        if self._agregats is not None:
+            self._agregats.retirer(cle)
+        for index, valeur in zip((self._par_numero, self._par_cote, self._par_rue), entree[1]):
+            groupe = index[valeur]
+            del groupe[cle]
+            if not groupe:
+                del index[valeur]
+
+        rue = entree[1][2]
+        if rue not in self._par_rue:
+            for trigramme in calculer_trigrammes(self._rues_normalisees.pop(rue)[0]):
+                rues = self._trigrammes[trigramme]
+                rues.discard(rue)
+                if not rues:
+                    del self._trigrammes[trigramme]
+
+    def _suivre_ajouts(self, debut):
+        """
+        Met à jour le suivi de la borne centrale après l'ajout de bornes à la fin de la liste, en O(n) par borne
+        ajoutée: la distance de chaque nouvelle borne est ajoutée à la somme de chaque borne existante.
+
+        Args:
+            debut (int): La position de la première borne ajoutée
+        """
+        suivi = self._suivi_centrale
+        if suivi is None or suivi['Sommes'] is None:
+            return
+
+        xs, ys, sommes = suivi['X'], suivi['Y'], suivi['Sommes']
+        for borne in self[debut:]:
+            x, y = _projeter_borne(borne)
+            distances = metriques_distance.calculer_distances_equirectangulaires(x, y, xs, ys)
+            sommes = array('d', [somme + distance for somme, distance in zip(sommes, distances)])
+            sommes.append(sum(distances))
+            _compter_distances(len(distances))
+            xs.append(x)
+            ys.append(y)
+        suivi['Sommes'] = sommes
+        self._choisir_borne_centrale()
+
+    def _suivre_retrait(self, position):
+        """
+        Met à jour le suivi de la borne centrale après le retrait d'une borne, en O(n): la distance de la borne
+        retirée est soustraite de la somme de chaque borne restante.
+
+        Args:
+            position (int): La position de la borne retirée
+        """
+        suivi = self._suivi_centrale
+        if suivi is None or suivi['Sommes'] is None:
+            return
+
+        xs, ys, sommes = suivi['X'], suivi['Y'], suivi['Sommes']
+        x, y = xs[position], ys[position]
+        del xs[position], ys[position], sommes[position]
+        _compter_distances(len(xs))
+        suivi['Sommes'] = array('d', [somme - sqrt((x_borne - x) ** 2 + (y_borne - y) ** 2)
+                                      for somme, x_borne, y_borne in zip(sommes, xs, ys)])
+        self._choisir_borne_centrale()
+
+    def _suivre_remplacement(self, position):
+        """
+        Met à jour le suivi de la borne centrale après le remplacement d'une borne, en O(n): la distance de
+        l'ancienne borne est remplacée par celle de la nouvelle dans la somme de chaque borne.
+
+        Args:
+            position (int): La position de la borne remplacée
+        """
+        suivi = self._suivi_centrale
+        if suivi is None or suivi['Sommes'] is None:
+            return
+
+        xs, ys, sommes = suivi['X'], suivi['Y'], suivi['Sommes']
+        x_ancien, y_ancien = xs[position], ys[position]
+        xs[position], ys[position] = x, y = _projeter_borne(self[position])
+        distances = metriques_distance.calculer_distances_equirectangulaires(x, y, xs, ys)
+        sommes = array('d', [somme - sqrt((x_borne - x_ancien) ** 2 + (y_borne - y_ancien) ** 2) + distance
+                             for somme, x_borne, y_borne, distance in zip(sommes, xs, ys, distances)])
+        sommes[position] = sum(distances)
+        _compter_distances(2 * len(xs))
+        suivi['Sommes'] = sommes
+        self._choisir_borne_centrale()
+
+    def _choisir_borne_centrale(self):
+        """
+        Retient la position de la borne centrale à partir des sommes de distances suivies. En cas d'égalité, la
+        première borne de la liste est retenue, comme dans trouver_borne_centrale().
+        """
+        suivi = self._suivi_centrale
+        sommes = suivi['Sommes']
+        nb_bornes = len(sommes)
+        suivi['Position'] = min(range(nb_bornes), key=lambda position: sommes[position] / nb_bornes, default=-1)
+
+    def _trouver_rues(self, requete):
+        """
+        Trouve les rues de l'inventaire dont le nom normalisé contient la requête normalisée.
+
+        Args:
+            requete (str): La sous-chaîne recherchée
+
+        Returns:
+            list: Les noms de rue correspondants, dans l'ordre de leur première apparition dans l'inventaire
+        """
+        requete = normaliser_texte(requete)
+        trigrammes = calculer_trigrammes(requete)
+        if not trigrammes:
+            return [rue for rue, (rue_normalisee, _) in self._rues_normalisees.items() if requete in rue_normalisee]
+
+        ensembles = sorted((self._trigrammes.get(trigramme, set()) for trigramme in trigrammes), key=len)
+        candidates = ensembles[0].intersection(*ensembles[1:])
+        rues = [rue for rue in candidates if requete in self._rues_normalisees[rue][0]]
+        # les candidates n'ont pas d'ordre: le rang de la borne qui a introduit chaque rue rétablit celui de
+        # l'inventaire
+        rues.sort(key=lambda rue: self._rues_normalisees[rue][1])
+        return rues
+
+    def append(self, borne):
+        super().append(borne)
+        self._indexer(borne)
+        self._suivre_ajouts(len(self) - 1)
+        self._signaler_ajouts(len(self) - 1)
+
+    def extend(self, bornes):
+        debut = len(self)
+        super().extend(bornes)
+        for borne in self[debut:]:
+            self._indexer(borne)
+        self._suivre_ajouts(debut)
+        self._signaler_ajouts(debut)
+
+    def __iadd__(self, bornes):
+        self.extend(bornes)
+        return self
+
+    def remove(self, borne):
+        """
+        Retire la borne de la liste, trouvée par identité en O(log n) si les index sont construits (voir
+        _trouver_position()), ou sinon la première borne égale, comme list.remove(). Le retrait lui-même décale les
+        bornes suivantes de la liste et de ses colonnes, en O(n).
+
+        Args:
+            borne (dict): La borne à retirer
+        """
+        position = self._trouver_position(borne) if '_entrees' in self.__dict__ else -1
+        if position == -1:
+            position = self.index(borne)
+        self._desindexer(self[position])
+        super().__delitem__(position)
+        self._suivre_retrait(position)
+        self._signaler_retrait(position)
+
+    def pop(self, position=-1):
+        borne = super().pop(position)
+        self._desindexer(borne)
+        position = position if position >= 0 else position + len(self) + 1
+        self._suivre_retrait(position)
+        self._signaler_retrait(position)
+        return borne
+
+    def remplacer(self, position, borne, attributs=None):
+        """
+        Remplace la borne à une position donnée. Contrairement à self[position] = borne, qui reconstruit tous les
+        index, seuls les groupes touchés par l'ancienne et la nouvelle borne sont mis à jour.
+
+        Args:
+            position (int): La position de la borne à remplacer
+            borne (dict): La nouvelle borne
+            attributs (tuple): Les attributs ATTRIBUTS_SOURCE de la nouvelle borne, s'ils sont connus
+        """
+        position = range(len(self))[position]
+        ancienne = self[position]
+        entree = self._entrees[id(ancienne)]
+        super().__setitem__(position, borne)
+        if entree[0] == 1 and id(borne) not in self._entrees:
+            self._desindexer(ancienne)
+            self._indexer(borne, entree[2])
+        else:  # l'un des deux objets est présent ailleurs dans la liste: son rang dépend de toutes ses positions
+            self._reconstruire_index()
+        if attributs is not None:
+            self._attributs[id(borne)] = attributs
+        self._suivre_remplacement(position)
+        self._signaler_remplacement(position)
+
+
+ATTRIBUTS_SOURCE = ('ID', 'ID_VOIE_PUBLIQUE', 'SOURCE')
+
+
+def obtenir_attributs_borne(inventaire, borne):
+    """
+    Retourne les attributs du fichier source d'une borne de l'inventaire: son identifiant ('ID'), l'identifiant
+    du tronçon de rue où elle se trouve ('ID_VOIE_PUBLIQUE') et l'étiquette de la source dont elle provient
+    ('SOURCE', par défaut le nom du fichier).
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        borne (dict): Une borne de l'inventaire
+
+    Returns:
+        dict: Les attributs de la borne, ou un dictionnaire vide s'ils ne sont pas connus
+    """
+    attributs = inventaire._attributs.get(id(borne)) if isinstance(inventaire, Inventaire) else None
+    return dict(zip(ATTRIBUTS_SOURCE, attributs)) if attributs is not None else {}
+
+
+# attributs créés par Inventaire._reconstruire_index()
+_ATTRIBUTS_INDEX = frozenset(('_par_numero', '_par_cote', '_par_rue', '_entrees', '_rues_normalisees', '_trigrammes',
+                              '_compteur'))
+
+
+def _creer_mutateur(nom):
+    """
+    Construit une méthode qui appelle la méthode de list du même nom, puis reconstruit les index et signale la
+    modification de l'inventaire. Les sommes de distances suivies pour la borne centrale seront recalculées au
+    prochain appel de trouver_borne_centrale().
+
+    Args:
+        nom (str): Le nom de la méthode de list
+
+    Returns:
+        function: La méthode à ajouter à la classe Inventaire
+    """
+    methode_list = getattr(list, nom)
+
+    def mutateur(self, *args, **kwargs):
+        resultat = methode_list(self, *args, **kwargs)
+        self._reconstruire_index()
+        if self._suivi_centrale is not None:
+            self._suivi_centrale['Sommes'] = None
+        self._modifier()
+        return resultat
+
+    mutateur.__name__ = nom
+    return mutateur
+
+
+for _nom_mutateur in ('insert', 'clear', 'sort', 'reverse', '__setitem__', '__delitem__', '__imul__'):
+    setattr(Inventaire, _nom_mutateur, _creer_mutateur(_nom_mutateur))
 
 
 def creer_borne(no_borne, cote_rue, nom_topographique, longitute, latitude):
@@ -24,10 +573,133 @@ def creer_borne(no_borne, cote_rue, nom_topographique, longitute, latitude):
     borne['Numero'] = no_borne
     borne['Cote'] = cote_rue
     borne['Rue'] = nom_topographique
-    borne['Coordonnees'] = (latitude, longitute)
+    borne['Coordonnees'] = Coordonnees(latitude, longitute)
     return borne
 
 
+class Coordonnees(Sequence):
+    """
+    Coordonnées (latitude, longitude) d'une borne, qui s'utilisent comme un tuple mais conservent aussi leur
+    projection en kilomètres (voir projeter_coordonnees()). La projection est calculée une seule fois, à la création
+    de la borne: les calculs de distance n'ont plus à convertir ni à multiplier les coordonnées à chaque appel.
+
+    Des Coordonnees sont égales au tuple (latitude, longitude) correspondant.
+    """
+
+    __slots__ = ('latitude', 'longitude', 'x', 'y')
+
+    def __init__(self, latitude, longitude):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.x = float(latitude) * metriques_distance.KM_PAR_DEGRE_LATITUDE
+        self.y = float(longitude) * metriques_distance.KM_PAR_DEGRE_LONGITUDE
+
+    def __getitem__(self, position):
+        return (self.latitude, self.longitude)[position]
+
+    def __iter__(self):
+        return iter((self.latitude, self.longitude))
+
+    def __len__(self):
+        return 2
+
+    def __eq__(self, autre):
+        if isinstance(autre, (Coordonnees, tuple)):
+            return (self.latitude, self.longitude) == tuple(autre)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.latitude, self.longitude))
+
+    def __repr__(self):
+        return repr((self.latitude, self.longitude))
+
+    def __reduce__(self):
+        return self.__class__, (self.latitude, self.longitude)
+
+
+class Borne(Mapping):
+    """
+    Représentation compacte d'une borne, qui s'utilise comme le dictionnaire retourné par creer_borne(): on accède
+    à ses informations avec les clés 'Numero', 'Cote', 'Rue' et 'Coordonnees'.
+
+    Les attributs sont stockés dans des __slots__ plutôt que dans un dictionnaire, le numéro est conservé sous forme
+    d'entier (voir normaliser_numero()) et les noms de rue et de côté sont internés, pour que toutes les bornes d'une
+    même rue partagent la même chaîne. Comme pour les Coordonnees, la projection en kilomètres est calculée une
+    seule fois. Une Borne est égale à un dictionnaire ayant les mêmes clés et valeurs.
+    """
+
+    __slots__ = ('numero', 'cote', 'rue', 'latitude', 'longitude', 'x', 'y')
+    _ATTRIBUTS = {'Numero': 'numero', 'Cote': 'cote', 'Rue': 'rue'}
+    _CLES = ('Numero', 'Cote', 'Rue', 'Coordonnees')
+
+    def __init__(self, numero, cote, rue, coordonnees):
+        self.numero = normaliser_numero(numero)
+        self.cote = sys.intern(cote)
+        self.rue = sys.intern(rue)
+        self.latitude, self.longitude = coordonnees
+        self.x, self.y = projeter_coordonnees(coordonnees)
+
+    def __getitem__(self, cle):
+        if cle == 'Coordonnees':
+            return self.latitude, self.longitude
+        try:
+            return getattr(self, self._ATTRIBUTS[cle])
+        except (KeyError, TypeError):
+            raise KeyError(cle) from None
+
+    def __setitem__(self, cle, valeur):
+        if cle == 'Coordonnees':
+            self.latitude, self.longitude = valeur
+            self.x, self.y = projeter_coordonnees(valeur)
+        elif cle == 'Numero':
+            self.numero = normaliser_numero(valeur)
+        elif cle in self._ATTRIBUTS:
+            setattr(self, self._ATTRIBUTS[cle], sys.intern(valeur))
+        else:
+            raise KeyError(cle)
+
+    def __iter__(self):
+        return iter(self._CLES)
+
+    def __len__(self):
+        return len(self._CLES)
+
+    def __eq__(self, autre):
+        if isinstance(autre, Borne):
+            return (self.numero == autre.numero and self.cote == autre.cote and self.rue == autre.rue
+                    and self.latitude == autre.latitude and self.longitude == autre.longitude)
+        if isinstance(autre, Mapping):
+            return dict(self) == dict(autre)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __reduce__(self):
+        return self.__class__, (self.numero, self.cote, self.rue, (self.latitude, self.longitude))
+
+
+def creer_borne_compacte(no_borne, cote_rue, nom_topographique, longitute, latitude):
+    """
+    Construit une Borne, la représentation compacte d'une borne. Les arguments sont les mêmes que ceux de
+    creer_borne().
+
+    Args:
+        no_borne (int): Le numéro unique de la borne
+        cote_rue (str): Le côté de la rue où se trouve la borne
+        nom_topographique (str): Le nom de la rue où se trouve la borne
+        longitute (float): La postion géographique de la borne (degré longitudinal)
+        latitude (float): La postion géographique de la borne (degré latitudinal)
+
+    Returns:
+        Borne: Une borne compacte contenant l'information d'une borne
+    """
+    return Borne(no_borne, cote_rue, nom_topographique, (latitude, longitute))
+
+
 def afficher_inventaire(inventaire):
     """
     Affiche l'inventaire des bornes sous la forme d'un tableau dans la console.
@@ -63,32 +735,110 @@ def creer_borne_avec_chaine(chaine):
     return creer_borne(borne_info_list[1],borne_info_list[2],borne_info_list[4],latitude,longitude)
 
 
-def lire_fichier_bornes(nom_fichier):
+def lire_fichier_bornes(nom_fichier, compacte=False):
     """
     Lit un fichier texte contenant l'inventaire des bornes avec une borne par ligne.
 
     Args:
         nom_fichier (str): Fichier .txt contenant l'inventaire des bornes. Les éléments sur chaque ligne sont
         séparées par une virgule
+        compacte (bool): True pour représenter les bornes avec la classe Borne plutôt qu'avec des dictionnaires
 
     Returns:
-        list: Une liste de toutes les bornes contenues dans le fichier
+        Inventaire: Une liste de toutes les bornes contenues dans le fichier
     """
-    bornes_list = []
+    bornes_list = Inventaire()
     try:
-        f = open(nom_fichier, "r", encoding="utf-8-sig")
-        f.readline()# pour enlever la premiere ligne du fichier txt avec les noms de colonnes.
-        line = f.readline()
-        while line != '':
-            bornes_list.append(creer_borne_avec_chaine(line))
-            line = f.readline()
-        f.close()
+        for borne, attributs in iterer_fichier_bornes(nom_fichier, compacte=compacte, avec_attributs=True):
+            bornes_list.append(borne)
+            bornes_list._attributs[id(borne)] = attributs
     except IOError:
         print("Le fichier", nom_fichier, "est introuvable.")
 
     return bornes_list
 
 
+def _iterer_lignes_fichier(nom_fichier, utiliser_mmap):
+    """
+    Parcourt les lignes d'un fichier texte encodé en UTF-8, une à la fois.
+
+    Args:
+        nom_fichier (str): Le nom du fichier
+        utiliser_mmap (bool): True pour lire le fichier à travers une projection en mémoire (mmap), ce qui évite
+            les copies dans les tampons de lecture pour les très gros fichiers
+
+    Returns:
+        generator: Les lignes du fichier, sans le BOM UTF-8 éventuel
+    """
+    if not utiliser_mmap:
+        with open(nom_fichier, "r", encoding="utf-8-sig", newline='') as f:
+            yield from f
+        return
+
+    with open(nom_fichier, "rb") as f:
+        if f.seek(0, 2) == 0:  # un fichier vide ne peut pas être projeté en mémoire
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as projection:
+            premiere_ligne = True
+            for ligne in iter(projection.readline, b''):
+                yield ligne.decode("utf-8-sig" if premiere_ligne else "utf-8")
+                premiere_ligne = False
+
+
+def iterer_fichier_bornes(nom_fichier, rue=None, boite=None, erreurs=None, utiliser_mmap=False, compacte=False,
+                          avec_attributs=False, source=None):
+    """
+    Lit un fichier d'inventaire des bornes de façon paresseuse: les bornes sont produites une à une, sans garder le
+    fichier ni la liste des bornes en mémoire.
+
+    Les filtres sont appliqués pendant la lecture, avant de construire la borne: les lignes écartées ne coûtent
+    aucun dictionnaire.
+
+    Args:
+        nom_fichier (str): Fichier .txt contenant l'inventaire des bornes, au format CSV avec une ligne d'en-tête
+        rue (str): Si donné, seules les bornes dont le nom de rue contient ce texte (sans tenir compte des
+            majuscules) sont produites
+        boite (tuple): Si donnée, les coordonnées (latitude_min, longitude_min, latitude_max, longitude_max) du
+            rectangle dans lequel doivent se trouver les bornes produites
+        erreurs (list): Si donnée, les lignes invalides y sont ajoutées sous forme de tuples (numéro de ligne,
+            message) et la lecture continue. Sinon, une ligne invalide lève une ValueError.
+        utiliser_mmap (bool): True pour lire le fichier à travers une projection en mémoire (mmap)
+        compacte (bool): True pour produire des Borne (voir creer_borne_compacte()) plutôt que des dictionnaires
+        avec_attributs (bool): True pour produire, avec chaque borne, le tuple de ses attributs ATTRIBUTS_SOURCE
+        source (str): L'étiquette de la source placée dans les attributs. Par défaut, le nom du fichier.
+
+    Returns:
+        generator: Les bornes du fichier, telles que retournées par creer_borne() ou creer_borne_compacte(), ou
+            des tuples (borne, attributs) si avec_attributs est vrai
+    """
+    fabrique = creer_borne_compacte if compacte else creer_borne
+    rue = rue.lower() if rue is not None else None
+    source = str(nom_fichier) if source is None else source
+    lecteur = csv.reader(_iterer_lignes_fichier(nom_fichier, utiliser_mmap))
+    next(lecteur, None)  # pour enlever la premiere ligne du fichier avec les noms de colonnes.
+
+    for champs in lecteur:
+        if not champs:
+            continue
+        try:
+            if len(champs) < 7:
+                raise ValueError(f"{len(champs)} colonnes au lieu de 7")
+            if rue is not None and rue not in champs[4].lower():
+                continue
+            longitude = float(champs[5])
+            latitude = float(champs[6])
+        except ValueError as erreur:
+            if erreurs is None:
+                raise ValueError(f"{nom_fichier}, ligne {lecteur.line_num}: {erreur}") from erreur
+            erreurs.append((lecteur.line_num, str(erreur)))
+            continue
+
+        if boite is not None and not (boite[0] <= latitude <= boite[2] and boite[1] <= longitude <= boite[3]):
+            continue
+        borne = fabrique(champs[1], sys.intern(champs[2]), sys.intern(champs[4]), longitude, latitude)
+        yield (borne, (champs[0], champs[3], source)) if avec_attributs else borne
+
+
 def nombre_de_bornes(inventaire):
     """
     Retourne le nombre de bornes contenu dans un « inventaire ».
@@ -113,6 +863,14 @@ def selectionner_bornes_par_rue(inventaire, rue):
     Returns:
         list: Liste des bornes qui sont sur la rue donnée
     """
+    if isinstance(inventaire, Inventaire):
+        rue = rue.lower()
+        groupes = [inventaire._par_rue[rue_borne].values() for rue_borne in inventaire._trouver_rues(rue)
+                   if rue in rue_borne.lower()]
+        if len(groupes) == 1:
+            return list(groupes[0])
+        return sorted(chain(*groupes), key=lambda borne: inventaire._entrees[id(borne)][2])
+
     list_recherche = []
     for borne in inventaire:
         if rue.lower() in borne['Rue'].lower():
@@ -121,6 +879,23 @@ def selectionner_bornes_par_rue(inventaire, rue):
     return list_recherche
 
 
+def rechercher_rues(inventaire, requete):
+    """
+    Recherche les bornes dont le nom de rue contient la requête, sans tenir compte des majuscules ni des accents,
+    et les regroupe par rue.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        requete (str): Une partie du nom de la rue
+
+    Returns:
+        dict: Un dictionnaire associant chaque nom de rue trouvé à la liste de ses bornes
+    """
+    if not isinstance(inventaire, Inventaire):
+        inventaire = Inventaire(inventaire)
+    return {rue: list(inventaire._par_rue[rue].values()) for rue in inventaire._trouver_rues(requete)}
+
+
 def selectionner_bornes_par_cote(inventaire, cote):
     """
     Sélectionne toutes les bornes du côté spécifié en argument parmi l'inventaire.
@@ -132,6 +907,9 @@ def selectionner_bornes_par_cote(inventaire, cote):
     Returns:
         list: Liste des bornes qui sont sur le côté donné
     """
+    if isinstance(inventaire, Inventaire):
+        return list(inventaire._par_cote.get(cote, {}).values())
+
     list_recherche = []
     for borne in inventaire:
         if borne['Cote'] == cote:
@@ -153,6 +931,10 @@ def selectionner_borne_par_numero(inventaire, numero_borne):
             Si le numéro de borne n'existe pas dans l'inventaire, retourner
             le dictionnaire {'Numero': -1}.
     """
+    if isinstance(inventaire, Inventaire):
+        groupe = inventaire._par_numero.get(normaliser_numero(numero_borne))
+        return next(reversed(groupe.values())) if groupe else {'Numero': -1}
+
     borne_par_num = {'Numero': -1}
     for borne in inventaire:
         if int(borne['Numero']) == int(numero_borne):
@@ -161,64 +943,464 @@ def selectionner_borne_par_numero(inventaire, numero_borne):
     return borne_par_num
 
 
-def calculer_distance_bornes(borne_1, borne_2):
+def calculer_distance_bornes(borne_1, borne_2, metrique='equirectangulaire'):
     """
     Calcule la distance en kilomètre entre deux bornes.
 
     Note: Pour calculer la distance approximative à partir des coordonnées géographique de la région de Québec,
     il faut d'abord multiplier la distance entre les degrés de lattitude par 110.6 km/degré et la distance entre
     les degrés de lattitude par 78.85 km/degré (cette dernière quantité varie selon la distance de l'équateur).
+    Ces coordonnées projetées sont calculées à la création des bornes (voir Coordonnees).
 
     Args:
         borne_1 (dict): Une première borne
         borne_2 (dict): Une deuxième borne
+        metrique (str): La métrique de distance (voir le module metriques_distance)
 
     Returns:
         float: La distance entre les deux bornes en kilomètres
     """
-    x1 = float(borne_1['Coordonnees'][0]) * 110.6
-    x2 = float(borne_2['Coordonnees'][0]) * 110.6
-    y1 = float(borne_1['Coordonnees'][1]) * 78.85
-    y2 = float(borne_2['Coordonnees'][1]) * 78.85
-    return sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-    
+    x1, y1 = _projeter_borne(borne_1)
+    x2, y2 = _projeter_borne(borne_2)
+    _compter_distances(1)
+    if metrique == 'equirectangulaire':  # cas le plus fréquent, sans appel au noyau
+        return sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+    return metriques_distance.obtenir_metrique(metrique).distance(x1, y1, x2, y2)
+
+
+def projeter_coordonnees(coordonnees):
+    """
+    Projette des coordonnées géographiques dans un plan exprimé en kilomètres, avec les mêmes facteurs que
+    calculer_distance_bornes(). La projection des Coordonnees, déjà calculée, est retournée directement.
+
+    Args:
+        coordonnees (tuple): Les coordonnées (latitude, longitude) d'une borne
+
+    Returns:
+        tuple: Les coordonnées (x, y) en kilomètres
+    """
+    if type(coordonnees) is Coordonnees:  # isinstance() est lent avec les classes abstraites de collections.abc
+        return coordonnees.x, coordonnees.y
+    return (float(coordonnees[0]) * metriques_distance.KM_PAR_DEGRE_LATITUDE,
+            float(coordonnees[1]) * metriques_distance.KM_PAR_DEGRE_LONGITUDE)
+
+
+def _projeter_borne(borne):
+    """
+    Retourne les coordonnées projetées d'une borne, sans les recalculer si elles l'ont été à sa création.
+
+    Args:
+        borne (dict): La borne
+
+    Returns:
+        tuple: Les coordonnées (x, y) en kilomètres
+    """
+    if type(borne) is Borne:
+        return borne.x, borne.y
+    coordonnees = borne['Coordonnees']
+    if type(coordonnees) is Coordonnees:
+        return coordonnees.x, coordonnees.y
+    return projeter_coordonnees(coordonnees)
+
+
+def obtenir_colonnes(inventaire):
+    """
+    Retourne les colonnes de l'inventaire: une liste ou un tableau par information, dans l'ordre des bornes. Pour un
+    Inventaire, les colonnes sont construites une seule fois puis réutilisées: un ajout, un retrait ou un
+    remplacement de borne les met à jour sur place, les autres modifications de la liste les invalident.
+
+    Pour une simple liste, rien n'est conservé: les colonnes sont reconstruites en O(n) à chaque appel. Une fonction
+    appelée plusieurs fois sur la même liste (calculer_distances_borne(), par exemple) peut recevoir à la place
+    les colonnes déjà obtenues, qui sont alors retournées telles quelles.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire, ou des colonnes déjà obtenues (dict)
+
+    Returns:
+        dict: Un dictionnaire contenant les colonnes 'Numero', 'Cote', 'Rue' (listes), ainsi que
+            'Latitude', 'Longitude', 'X' et 'Y' (tableaux de float, X et Y en kilomètres)
+    """
+    if isinstance(inventaire, Mapping):
+        return inventaire
+    if isinstance(inventaire, Inventaire) and inventaire._colonnes is not None:
+        return inventaire._colonnes
+
+    colonnes = {
+        'Numero': [borne['Numero'] for borne in inventaire],
+        'Cote': [borne['Cote'] for borne in inventaire],
+        'Rue': [borne['Rue'] for borne in inventaire],
+        'Latitude': array('d', [float(borne['Coordonnees'][0]) for borne in inventaire]),
+        'Longitude': array('d', [float(borne['Coordonnees'][1]) for borne in inventaire]),
+    }
+    points = [_projeter_borne(borne) for borne in inventaire]
+    colonnes['X'] = array('d', [x for x, _ in points])
+    colonnes['Y'] = array('d', [y for _, y in points])
+
+    if isinstance(inventaire, Inventaire):
+        inventaire._colonnes = colonnes
+    return colonnes
+
+
+def _ecrire_colonnes(colonnes, borne, position=None):
+    """
+    Ajoute une borne à la fin des colonnes d'un inventaire, ou remplace la borne qui s'y trouve à une position donnée.
+
+    Args:
+        colonnes (dict): Les colonnes retournées par obtenir_colonnes()
+        borne (dict): La borne à écrire
+        position (int): La position de la borne à remplacer. Par défaut, la borne est ajoutée à la fin.
+    """
+    coordonnees = borne['Coordonnees']
+    valeurs = (borne['Numero'], borne['Cote'], borne['Rue'], float(coordonnees[0]), float(coordonnees[1]),
+               *_projeter_borne(borne))
+    for cle, valeur in zip(('Numero', 'Cote', 'Rue', 'Latitude', 'Longitude', 'X', 'Y'), valeurs):
+        if position is None:
+            colonnes[cle].append(valeur)
+        else:
+            colonnes[cle][position] = valeur
+
+
+def calculer_distances_borne(inventaire, borne, metrique='equirectangulaire'):
+    """
+    Calcule la distance en kilomètres entre une borne et chacune des bornes de l'inventaire, avec le même calcul que
+    calculer_distance_bornes().
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire, ou ses colonnes (voir obtenir_colonnes())
+        borne (dict): La borne de référence
+        metrique (str): La métrique de distance (voir le module metriques_distance)
+
+    Returns:
+        list: Les distances en kilomètres, dans l'ordre des bornes de l'inventaire
+    """
+    distances = metriques_distance.obtenir_metrique(metrique).distances
+    x, y = _projeter_borne(borne)
+    colonnes = obtenir_colonnes(inventaire)
+    _compter_distances(len(colonnes['X']))
+    return distances(x, y, colonnes['X'], colonnes['Y'])
+
+
+def calculer_matrice_distances(bornes_1, bornes_2, metrique='equirectangulaire'):
+    """
+    Calcule la distance en kilomètres entre chaque borne d'une première liste et chaque borne d'une deuxième liste.
+
+    Args:
+        bornes_1 (list): Les bornes correspondant aux lignes de la matrice, ou leurs colonnes (voir obtenir_colonnes())
+        bornes_2 (list): Les bornes correspondant aux colonnes de la matrice, ou leurs colonnes
+        metrique (str): La métrique de distance (voir le module metriques_distance)
+
+    Returns:
+        list: Une liste de lignes, où l'élément [i][j] est la distance entre bornes_1[i] et bornes_2[j]
+    """
+    distances = metriques_distance.obtenir_metrique(metrique).distances
+    colonnes_1 = obtenir_colonnes(bornes_1)
+    colonnes_2 = obtenir_colonnes(bornes_2)
+    xs, ys = colonnes_2['X'], colonnes_2['Y']
+    _compter_distances(len(colonnes_1['X']) * len(xs))
+    return [distances(x, y, xs, ys) for x, y in zip(colonnes_1['X'], colonnes_1['Y'])]
+
+
+def obtenir_index_spatial(inventaire):
+    """
+    Retourne l'index spatial (arbre k-d) des bornes de l'inventaire. Pour un Inventaire, l'index est construit une
+    seule fois puis réutilisé tant que l'inventaire n'est pas modifié; il est reconstruit si des bornes ont été
+    ajoutées, retirées ou remplacées depuis (voir _interroger_index_spatial() pour une recherche qui s'en passe).
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+
+    Returns:
+        tuple: La racine de l'arbre k-d, dont les positions correspondent aux positions dans l'inventaire
+    """
+    if isinstance(inventaire, Inventaire) and inventaire._index_spatial is not None:
+        modifications = inventaire._modifications_index
+        if (modifications['Debut'] == len(inventaire) and not modifications['Retraits']
+                and not modifications['Remplacements']):
+            return inventaire._index_spatial
+
+    colonnes = obtenir_colonnes(inventaire)
+    arbre = index_spatial.construire_arbre_kd(list(zip(colonnes['X'], colonnes['Y'])))
+    if isinstance(inventaire, Inventaire):
+        inventaire._index_spatial = arbre
+        inventaire._modifications_index = {'Debut': len(inventaire), 'Retraits': [], 'Remplacements': []}
+    return arbre
+
+
+# nombre minimal de bornes modifiées depuis la construction de l'index spatial avant de le reconstruire
+SEUIL_RECONSTRUCTION_INDEX = 64
+
+
+def _interroger_index_spatial(inventaire, x, y, k=None, rayon=None, accepter=None):
+    """
+    Cherche les k positions les plus près du point (x, y), ou toutes celles situées à moins du rayon, dans l'index
+    spatial de l'inventaire.
+
+    Pour un Inventaire modifié depuis la construction de son index, l'index existant sert encore: les bornes retirées
+    ou remplacées y sont ignorées, et les bornes ajoutées ou remplacées sont examinées une à une à partir des
+    colonnes. L'index n'est reconstruit que lorsque ces bornes sont plus nombreuses que SEUIL_RECONSTRUCTION_INDEX
+    et qu'un seizième de l'inventaire: une recherche coûte alors au plus O(n / 16) en plus de la recherche dans
+    l'arbre, au lieu d'une reconstruction en O(n log n) après chaque modification.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        x (float): La coordonnée x du point de référence, en kilomètres
+        y (float): La coordonnée y du point de référence, en kilomètres
+        k (int): Le nombre de positions recherchées, si rayon n'est pas donné
+        rayon (float): La distance maximale en kilomètres
+        accepter (function): Fonction recevant une position et retournant False si la borne doit être ignorée
+
+    Returns:
+        list: Une liste de tuples (distance, position), triée par distance croissante puis par position
+    """
+    if k is not None and k <= 0:
+        return []
+
+    arbre = inventaire._index_spatial if isinstance(inventaire, Inventaire) else None
+    if arbre is not None:
+        modifications = inventaire._modifications_index
+        retraits, remplacements = modifications['Retraits'], modifications['Remplacements']
+        hors_index = range(modifications['Debut'], len(inventaire))
+        if len(hors_index) + len(retraits) + len(remplacements) > max(SEUIL_RECONSTRUCTION_INDEX,
+                                                                       len(inventaire) // 16):
+            arbre = None
+    if arbre is None:
+        retraits = remplacements = ()
+        hors_index = range(0)
+        arbre = obtenir_index_spatial(inventaire)
+
+    def convertir(position):
+        # position dans l'index -> position dans l'inventaire, ou -1 si la borne a été retirée ou remplacée
+        rang = bisect_left(retraits, position)
+        if rang < len(retraits) and retraits[rang] == position:
+            return -1
+        rang_remplacement = bisect_left(remplacements, position)
+        if rang_remplacement < len(remplacements) and remplacements[rang_remplacement] == position:
+            return -1
+        return position - rang
+
+    accepter_index = accepter
+    if retraits or remplacements:
+        def accepter_index(position):
+            position = convertir(position)
+            return position != -1 and (accepter is None or accepter(position))
+
+    if rayon is None:
+        resultats = index_spatial.trouver_k_plus_proches(arbre, x, y, k, accepter_index)
+    else:
+        resultats = index_spatial.trouver_dans_rayon(arbre, x, y, rayon, accepter_index)
+    if retraits:
+        resultats = [(distance, convertir(position)) for distance, position in resultats]
+    if not (hors_index or remplacements):
+        return resultats
+
+    positions = chain(hors_index, (position - bisect_left(retraits, position) for position in remplacements))
+    colonnes = obtenir_colonnes(inventaire)
+    xs, ys = colonnes['X'], colonnes['Y']
+    nb_calculs = 0
+    for position in positions:
+        distance = sqrt((xs[position] - x) ** 2 + (ys[position] - y) ** 2)
+        nb_calculs += 1
+        if (rayon is None or distance <= rayon) and (accepter is None or accepter(position)):
+            resultats.append((distance, position))
+    _compter_distances(nb_calculs)
+    resultats.sort()
+    return resultats[:k] if rayon is None else resultats
+
+
+def exclure_meme_rue(borne_initiale, borne):
+    """
+    Règle d'exclusion pour trouver_borne_plus_pres(): exclut les bornes qui ont exactement le même nom de rue que la
+    borne de référence.
 
-def trouver_borne_plus_pres(inventaire, numero_borne, autre_rue):
+    Args:
+        borne_initiale (dict): La borne de référence
+        borne (dict): La borne candidate
+
+    Returns:
+        bool: True si la borne candidate doit être exclue
+    """
+    return borne['Rue'] == borne_initiale['Rue']
+
+
+def exclure_meme_cote(borne_initiale, borne):
+    """
+    Règle d'exclusion pour trouver_borne_plus_pres(): exclut les bornes du même côté de rue que la borne de
+    référence.
+
+    Args:
+        borne_initiale (dict): La borne de référence
+        borne (dict): La borne candidate
+
+    Returns:
+        bool: True si la borne candidate doit être exclue
+    """
+    return borne['Cote'] == borne_initiale['Cote']
+
+
+def creer_exclusion_meme_voie(inventaire):
+    """
+    Crée une règle d'exclusion pour trouver_borne_plus_pres() qui exclut les bornes du même tronçon de rue
+    (ID_VOIE_PUBLIQUE) que la borne de référence. Si le tronçon d'une des deux bornes n'est pas connu, les noms de
+    rue sont comparés.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+
+    Returns:
+        function: La règle d'exclusion
+    """
+    def exclure_meme_voie(borne_initiale, borne):
+        voie_initiale = obtenir_attributs_borne(inventaire, borne_initiale).get('ID_VOIE_PUBLIQUE')
+        voie = obtenir_attributs_borne(inventaire, borne).get('ID_VOIE_PUBLIQUE')
+        if voie_initiale and voie:
+            return voie == voie_initiale
+        return exclure_meme_rue(borne_initiale, borne)
+
+    return exclure_meme_voie
+
+
+def creer_exclusion_numeros(numeros):
+    """
+    Crée une règle d'exclusion pour trouver_borne_plus_pres() qui exclut une liste de numéros de borne.
+
+    Args:
+        numeros (list): Les numéros des bornes à exclure
+
+    Returns:
+        function: La règle d'exclusion
+    """
+    numeros_exclus = {normaliser_numero(numero) for numero in numeros}
+
+    def exclure_numeros(borne_initiale, borne):
+        return normaliser_numero(borne['Numero']) in numeros_exclus
+
+    return exclure_numeros
+
+
+def trouver_borne_plus_pres(inventaire, numero_borne, autre_rue, exclure=None, distances=None):
     """
     Trouve la borne dans l'inventaire qui est la plus près.
 
+    Si l'inventaire est un Inventaire, la recherche utilise son index spatial. Sinon, toutes les bornes sont
+    parcourues. Dans les deux cas, les bornes exclues sont simplement ignorées pendant la recherche: l'inventaire
+    n'est ni copié ni modifié. Si des distances enregistrées sont données, les voisines déjà triées de la borne sont
+    parcourues, sans aucun calcul de distance.
+
     Args:
         inventaire (list): La liste des bornes de l'inventaire
         numero_borne (int): Numéro de la borne pour laquelle on cherche la borne la plus proche
-        autre_rue (bool): True si la borne retournée doit se trouver sur une autre rue, False sinon
+        autre_rue (bool): True si la borne retournée doit se trouver sur une autre rue, False sinon. Deux bornes
+            sont sur la même rue si leurs noms de rue sont identiques (voir exclure_meme_rue()).
+        exclure (function): Règle d'exclusion supplémentaire, ou liste de règles. Une règle reçoit la borne de
+            référence et une borne candidate et retourne True si la candidate doit être exclue. Voir par exemple
+            exclure_meme_cote(), creer_exclusion_meme_voie() et creer_exclusion_numeros().
+        distances (DistancesEnregistrees): Les distances enregistrées pour cet inventaire, avec la métrique
+            equirectangulaire ou carree (voir le module distances_enregistrees). Si aucune des voisines enregistrées
+            n'est acceptée et que la liste est incomplète, la recherche normale est faite.
 
     Returns:
         dict: Un dictionnaire contenant l'information de la borne la plus proche
+
+    Raises:
+        ValueError: Si les distances enregistrées ne correspondent pas à l'inventaire
     """
-    inventaire_local = inventaire.copy() # pour ne pas changer la valeur d'inventaire.
     borne_initial = selectionner_borne_par_numero(inventaire, numero_borne)
     if borne_initial == {'Numero': -1}:
         return {'Numero': -1}
 
-    borne_plus_pres = {'Numero': -1}
-    min_distance = float('inf') # pour initialiser min_moyenne avec la plus grosse valeur possible
-
+    if exclure is None:
+        regles = []
+    elif callable(exclure):
+        regles = [exclure]
+    else:
+        regles = list(exclure)
     if autre_rue:
-        inventaire_temp = selectionner_bornes_par_rue(inventaire_local, borne_initial['Rue'])
-        for borne in inventaire_temp:
-            retirer_borne(inventaire_local, borne['Numero'])
+        regles.append(exclure_meme_rue)
 
-    for borne_courante in inventaire_local:
-        if borne_courante != borne_initial:
-            if calculer_distance_bornes(borne_initial, borne_courante) < min_distance:
+    def accepter(borne):
+        if borne == borne_initial:
+            return False
+        for regle in regles:
+            if regle(borne_initial, borne):
+                return False
+        return True
+
+    if distances is not None:
+        if distances.metrique not in ('equirectangulaire', 'carree'):
+            raise ValueError(f'métrique des distances enregistrées non applicable: {distances.metrique}')
+        position = distances.obtenir_position(numero_borne)
+        if len(distances) != len(inventaire) or position == -1 or inventaire[position] is not borne_initial:
+            raise ValueError("les distances enregistrées ne correspondent pas à l'inventaire")
+        voisines, complet = distances.obtenir_voisines(position)
+        for voisine in voisines:
+            if accepter(inventaire[voisine]):
+                return inventaire[voisine]
+        if complet:
+            return {'Numero': -1}
+
+    if isinstance(inventaire, Inventaire):
+        x, y = _projeter_borne(borne_initial)
+        voisins = _interroger_index_spatial(inventaire, x, y, k=1,
+                                            accepter=lambda position: accepter(inventaire[position]))
+        return inventaire[voisins[0][1]] if voisins else {'Numero': -1}
+
+    # les distances ne servent qu'à être comparées: leurs carrés suffisent
+    calculer_distance = metriques_distance.calculer_distance_carree
+    x, y = _projeter_borne(borne_initial)
+    borne_plus_pres = {'Numero': -1}
+    min_distance = float('inf') # pour initialiser min_distance avec la plus grosse valeur possible
+    nb_calculs = 0
+    for borne_courante in inventaire:
+        if accepter(borne_courante):
+            distance = calculer_distance(x, y, *_projeter_borne(borne_courante))
+            nb_calculs += 1
+            if distance < min_distance:
                 borne_plus_pres = borne_courante
-                min_distance = calculer_distance_bornes(borne_initial, borne_courante)
+                min_distance = distance
+    _compter_distances(nb_calculs)
     return borne_plus_pres
 
+
+def trouver_bornes_plus_pres(inventaire, coordonnees, k):
+    """
+    Trouve les k bornes de l'inventaire les plus près d'une position donnée.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        coordonnees (tuple): Les coordonnées (latitude, longitude) de la position de référence
+        k (int): Le nombre de bornes recherchées
+
+    Returns:
+        list: Liste d'au plus k bornes, de la plus proche à la plus éloignée
+    """
+    x, y = projeter_coordonnees(coordonnees)
+    voisins = _interroger_index_spatial(inventaire, x, y, k=k)
+    return [inventaire[position] for _, position in voisins]
+
+
+def selectionner_bornes_dans_rayon(inventaire, coordonnees, rayon):
+    """
+    Sélectionne toutes les bornes situées à moins d'une certaine distance d'une position donnée.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        coordonnees (tuple): Les coordonnées (latitude, longitude) de la position de référence
+        rayon (float): La distance maximale en kilomètres
+
+    Returns:
+        list: Liste des bornes dans le rayon donné, de la plus proche à la plus éloignée
+    """
+    x, y = projeter_coordonnees(coordonnees)
+    voisins = _interroger_index_spatial(inventaire, x, y, rayon=rayon)
+    return [inventaire[position] for _, position in voisins]
+
 def trouver_bornes_plus_eloignees(inventaire):
     """
     Trouve les deux bornes les plus éloignées géographiquement parmi l'inventaire.
 
+    La recherche se fait en O(n log n) sur l'enveloppe convexe des bornes. Comme pour un parcours de toutes les paires,
+    en cas d'égalité, la paire retenue est celle dont la première borne apparaît le plus tôt dans l'inventaire.
+
     Args:
         inventaire (list): La liste des bornes de l'inventaire
 
@@ -227,46 +1409,309 @@ def trouver_bornes_plus_eloignees(inventaire):
     """
     borne_1 = inventaire[0]
     borne_2 = inventaire[1]
-    distance_max = 0
 
-    for borne_courante_1 in inventaire:
-        for borne_courante_2 in inventaire:
-            if calculer_distance_bornes(borne_courante_1, borne_courante_2) > distance_max:
-                borne_1 = borne_courante_1
-                borne_2 = borne_courante_2
-                distance_max = calculer_distance_bornes(borne_courante_1, borne_courante_2)
+    colonnes = obtenir_colonnes(inventaire)
+    _, paires = geometrie_plane.trouver_paires_plus_eloignees(list(zip(colonnes['X'], colonnes['Y'])))
+    if paires:
+        position_1, position_2 = paires[0]
+        borne_1 = inventaire[position_1]
+        borne_2 = inventaire[position_2]
 
     return borne_1, borne_2
 
 
-def trouver_borne_centrale(inventaire):
+def calculer_sommes_distances(inventaire, taille_bloc=256, metrique='equirectangulaire'):
+    """
+    Calcule, pour chaque borne, la somme de ses distances avec toutes les bornes de l'inventaire.
+
+    Les distances sont calculées par blocs de taille_bloc x taille_bloc bornes. Chaque paire de bornes n'est
+    calculée qu'une fois, puisque la distance est symétrique, et la mémoire utilisée ne dépend que de la taille
+    des blocs.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        taille_bloc (int): Le nombre de bornes par bloc
+        metrique (str): La métrique de distance (voir le module metriques_distance)
+
+    Returns:
+        list: La somme des distances en kilomètres, dans l'ordre des bornes de l'inventaire
+    """
+    distances = metriques_distance.obtenir_metrique(metrique).distances
+    colonnes = obtenir_colonnes(inventaire)
+    xs, ys = colonnes['X'], colonnes['Y']
+    nb_bornes = len(xs)
+    sommes = [0.0] * nb_bornes
+
+    for debut_1 in range(0, nb_bornes, taille_bloc):
+        xs_1 = xs[debut_1:debut_1 + taille_bloc]
+        ys_1 = ys[debut_1:debut_1 + taille_bloc]
+        for debut_2 in range(debut_1, nb_bornes, taille_bloc):
+            xs_2 = xs[debut_2:debut_2 + taille_bloc]
+            ys_2 = ys[debut_2:debut_2 + taille_bloc]
+            bloc = [distances(x_1, y_1, xs_2, ys_2) for x_1, y_1 in zip(xs_1, ys_1)]
+            _compter_distances(len(xs_1) * len(xs_2))
+            for decalage, somme in enumerate(map(sum, bloc)):
+                sommes[debut_1 + decalage] += somme
+            if debut_2 != debut_1:
+                for decalage, somme in enumerate(map(sum, zip(*bloc))):
+                    sommes[debut_2 + decalage] += somme
+
+    return sommes
+
+
+def trouver_borne_centrale(inventaire, metrique='equirectangulaire', distances=None):
     """ Trouve la borne «centrale», c-a-d celle dont la moyenne des distances avec toutes les autres bornes de
     l'inventaire est minimale.
 
+    Le calcul est exact et se fait en O(n²) avec calculer_sommes_distances(). Si le suivi de la borne centrale est
+    activé pour l'inventaire (voir suivre_borne_centrale()), la borne est retournée en O(1). Si une matrice de
+    distances enregistrée est donnée, la borne est trouvée en O(n) à partir de ses sommes. Pour les très grands
+    inventaires, voir trouver_borne_centrale_approximative().
+
     Args:
         inventaire (list): La liste des bornes de l'inventaire
+        metrique (str): La métrique de distance (voir le module metriques_distance). Le suivi de la borne centrale
+            n'est utilisé qu'avec la métrique equirectangulaire.
+        distances (DistancesEnregistrees): La matrice des distances enregistrée pour cet inventaire avec la même
+            métrique (voir le module distances_enregistrees)
 
     Returns:
         dict: Dictionnaire contenant l'information de la borne centrale
+
+    Raises:
+        ValueError: Si les distances enregistrées ne sont pas une matrice de cette métrique pour cet inventaire
     """
+    metrique = metriques_distance.obtenir_metrique(metrique)
+    if distances is not None:
+        if distances.metrique != metrique.nom or not distances.correspond(inventaire):
+            raise ValueError("les distances enregistrées ne correspondent pas à l'inventaire ou à la métrique")
+        position = distances.trouver_position_centrale()
+        return inventaire[position] if position != -1 else {'Numero': -1}
+    if (isinstance(inventaire, Inventaire) and inventaire._suivi_centrale is not None
+            and metrique is metriques_distance.METRIQUES['equirectangulaire']):
+        if inventaire._suivi_centrale['Sommes'] is None:
+            suivre_borne_centrale(inventaire)
+        position = inventaire._suivi_centrale['Position']
+        return inventaire[position] if position != -1 else {'Numero': -1}
+
     min_moyenne = float('inf') # pour initialiser min_moyenne avec la plus grosse valeur possible
     borne_centrale = {'Numero': -1}
 
-    for borne_courante_1 in inventaire:
-        somme_distance = 0
-        for borne_courante_2 in inventaire:
-            somme_distance += calculer_distance_bornes(borne_courante_1, borne_courante_2)
-
-        moyenne = somme_distance / nombre_de_bornes(inventaire)
+    nb_bornes = nombre_de_bornes(inventaire)
+    for borne_courante_1, somme_distance in zip(inventaire, calculer_sommes_distances(inventaire, metrique=metrique)):
+        moyenne = somme_distance / nb_bornes
         if moyenne < min_moyenne:
             borne_centrale = borne_courante_1
             min_moyenne = moyenne
     return borne_centrale
 
 
+def suivre_borne_centrale(inventaire, actif=True):
+    """
+    Active ou désactive le suivi de la borne centrale d'un Inventaire. Une fois le suivi activé, l'inventaire
+    maintient la somme des distances de chaque borne avec toutes les autres: un ajout (append, extend ou
+    ajouter_borne()) ou un retrait (remove, pop ou retirer_borne()) met ces sommes à jour en O(n), et
+    trouver_borne_centrale() retourne la borne centrale en O(1). Les autres modifications de la liste (insert, sort,
+    etc.) entraînent un recalcul complet au prochain appel de trouver_borne_centrale().
+
+    Les sommes mises à jour peuvent différer d'un recalcul complet par des erreurs d'arrondi, de l'ordre de 1e-12 km
+    par opération.
+
+    Args:
+        inventaire (Inventaire): L'inventaire des bornes
+        actif (bool): True pour activer le suivi (les sommes sont alors calculées en O(n²)), False pour le désactiver
+    """
+    if not actif:
+        inventaire._suivi_centrale = None
+        return
+
+    colonnes = obtenir_colonnes(inventaire)
+    inventaire._suivi_centrale = {'X': array('d', colonnes['X']), 'Y': array('d', colonnes['Y']),
+                                  'Sommes': array('d', calculer_sommes_distances(inventaire))}
+    inventaire._choisir_borne_centrale()
+
+
+def _calculer_mediane_geometrique(xs, ys, nb_iterations=100, tolerance=1e-9):
+    """
+    Calcule une approximation de la médiane géométrique (le point qui minimise la somme des distances) d'un nuage de
+    points avec l'algorithme de Weiszfeld.
+
+    Args:
+        xs (array): Les coordonnées x des points
+        ys (array): Les coordonnées y des points
+        nb_iterations (int): Le nombre maximal d'itérations
+        tolerance (float): Le déplacement en kilomètres sous lequel on arrête d'itérer
+
+    Returns:
+        tuple: Les coordonnées (x, y) de la médiane
+    """
+    x = sum(xs) / len(xs)
+    y = sum(ys) / len(ys)
+    for _ in range(nb_iterations):
+        somme_poids = somme_x = somme_y = 0.0
+        for x_point, y_point in zip(xs, ys):
+            distance = sqrt((x_point - x) ** 2 + (y_point - y) ** 2)
+            if distance > 0:
+                somme_poids += 1 / distance
+                somme_x += x_point / distance
+                somme_y += y_point / distance
+        _compter_distances(len(xs))
+        if somme_poids == 0:
+            break
+        x_suivant, y_suivant = somme_x / somme_poids, somme_y / somme_poids
+        deplacement = sqrt((x_suivant - x) ** 2 + (y_suivant - y) ** 2)
+        x, y = x_suivant, y_suivant
+        if deplacement < tolerance:
+            break
+    return x, y
+
+
+def trouver_borne_centrale_approximative(inventaire, nb_candidats=64):
+    """
+    Trouve rapidement une borne proche de la borne centrale, en O(n * nb_candidats) plutôt qu'en O(n²).
+
+    Les bornes sont classées selon leur distance à la médiane géométrique m de l'inventaire et seules les
+    nb_candidats plus proches sont évaluées exactement. Pour l'erreur maximale, une borne non évaluée, située à une
+    distance r >= r_k de m, a une somme de distances d'au moins:
+        - la somme des |r - d|, où d est la distance de chaque borne à m (inégalité du triangle);
+        - S(m) - |g| * r, où S(m) est la somme des distances à m et g son gradient en m (convexité).
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        nb_candidats (int): Le nombre de bornes évaluées exactement
+
+    Returns:
+        tuple: La borne retenue et l'écart maximal en kilomètres entre sa moyenne des distances et celle de la
+            borne centrale exacte. Un écart de 0 signifie que la borne retenue est la borne centrale.
+
+    Raises:
+        ValueError: Si nb_candidats est inférieur à 1
+    """
+    if nb_candidats < 1:
+        raise ValueError(f'le nombre de candidats doit être au moins 1: {nb_candidats}')
+    nb_bornes = nombre_de_bornes(inventaire)
+    if nb_bornes == 0:
+        return {'Numero': -1}, 0.0
+
+    colonnes = obtenir_colonnes(inventaire)
+    xs, ys = colonnes['X'], colonnes['Y']
+    x_mediane, y_mediane = _calculer_mediane_geometrique(xs, ys)
+    distances_mediane = [sqrt((x - x_mediane) ** 2 + (y - y_mediane) ** 2) for x, y in zip(xs, ys)]
+    _compter_distances(nb_bornes)
+    candidats = nsmallest(nb_candidats, range(nb_bornes), key=lambda position: distances_mediane[position])
+
+    somme_min = float('inf')
+    position_centrale = -1
+    for position in sorted(candidats):
+        somme = sum(calculer_distances_borne(inventaire, inventaire[position]))
+        if somme < somme_min:
+            somme_min = somme
+            position_centrale = position
+
+    if len(candidats) == nb_bornes:
+        return inventaire[position_centrale], 0.0
+
+    gradient_x = gradient_y = 0.0
+    for x, y, distance in zip(xs, ys, distances_mediane):
+        if distance > 0:
+            gradient_x += (x_mediane - x) / distance
+            gradient_y += (y_mediane - y) / distance
+    norme_gradient = sqrt(gradient_x ** 2 + gradient_y ** 2)
+
+    distances_triees = sorted(distances_mediane)
+    cumul = [0.0] + list(accumulate(distances_triees))
+    somme_mediane = cumul[-1]
+
+    def calculer_borne_inferieure(rayon):
+        nb_sous = bisect_right(distances_triees, rayon)
+        somme_ecarts = (rayon * nb_sous - cumul[nb_sous]
+                        + somme_mediane - cumul[nb_sous] - rayon * (nb_bornes - nb_sous))
+        return max(somme_ecarts, somme_mediane - norme_gradient * rayon)
+
+    # la borne inférieure est convexe en r: on cherche son minimum pour r entre r_k et la plus grande distance
+    rayon_min, rayon_max = distances_mediane[candidats[-1]], distances_triees[-1]
+    for _ in range(100):
+        tiers = (rayon_max - rayon_min) / 3
+        if calculer_borne_inferieure(rayon_min + tiers) <= calculer_borne_inferieure(rayon_max - tiers):
+            rayon_max -= tiers
+        else:
+            rayon_min += tiers
+    borne_inferieure = calculer_borne_inferieure(rayon_min)
+    return inventaire[position_centrale], max(0.0, somme_min - borne_inferieure) / nb_bornes
+
+
+def suivre_agregats(inventaire, taille_cellule=index_agregats.TAILLE_CELLULE, actif=True):
+    """
+    Active ou désactive l'index d'agrégats d'un Inventaire (voir le module index_agregats). Une fois activé, l'index
+    est mis à jour avec les autres index de l'inventaire à chaque ajout, retrait ou remplacement de borne, et
+    obtenir_agregats() et compter_bornes_dans_boite() le consultent sans parcourir les bornes.
+
+    Args:
+        inventaire (Inventaire): L'inventaire des bornes
+        taille_cellule (float): Le côté des cellules de la grille, en kilomètres
+        actif (bool): True pour activer l'index (il est alors construit en O(n)), False pour le désactiver
+    """
+    if not actif:
+        inventaire._agregats = None
+        return
+
+    inventaire._agregats = index_agregats.IndexAgregats(taille_cellule)
+    inventaire._reconstruire_index()
+
+
+def obtenir_agregats(inventaire, groupe, taille_cellule=None):
+    """
+    Calcule le nombre de bornes, la densité et le centroïde de chaque rue, de chaque côté ou de chaque cellule de
+    grille. Si l'index d'agrégats de l'inventaire est activé (voir suivre_agregats()) avec la même taille de cellule,
+    les agrégats sont lus dans l'index; sinon, un index temporaire est construit en O(n).
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        groupe (str): 'rue', 'cote' ou 'cellule'
+        taille_cellule (float): Le côté des cellules de la grille, en kilomètres. Par défaut, celui de l'index de
+            l'inventaire, ou index_agregats.TAILLE_CELLULE.
+
+    Returns:
+        dict: Pour chaque nom de rue, côté ou cellule (i, j), un dictionnaire contenant 'Nombre', 'Densite' (bornes
+            par km² de cellules occupées) et 'Centroide' (latitude et longitude moyennes)
+
+    Raises:
+        ValueError: Si le groupe est inconnu
+    """
+    agregats = inventaire._agregats if isinstance(inventaire, Inventaire) else None
+    if agregats is None or taille_cellule not in (None, agregats.taille_cellule):
+        agregats = index_agregats.IndexAgregats(taille_cellule or index_agregats.TAILLE_CELLULE)
+        for borne in inventaire:
+            if id(borne) not in agregats._entrees:  # comme les index de l'Inventaire, un même objet compte une fois
+                agregats.ajouter(id(borne), *_projeter_borne(borne), borne['Coordonnees'], borne['Rue'], borne['Cote'])
+    return agregats.obtenir_agregats(groupe)
+
+
+def compter_bornes_dans_boite(inventaire, boite):
+    """
+    Compte les bornes situées dans un rectangle de coordonnées, bornes incluses. Si l'index d'agrégats de
+    l'inventaire est activé (voir suivre_agregats()), le compte se fait avec les sommes préfixes de sa grille, sans
+    parcourir toutes les bornes.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        boite (tuple): Les coordonnées (latitude_min, longitude_min, latitude_max, longitude_max) du rectangle
+
+    Returns:
+        int: Le nombre de bornes dans le rectangle
+    """
+    if isinstance(inventaire, Inventaire) and inventaire._agregats is not None:
+        return inventaire._agregats.compter_dans_boite(boite)
+
+    latitude_min, longitude_min, latitude_max, longitude_max = boite
+    return sum(latitude_min <= borne['Coordonnees'][0] <= latitude_max
+               and longitude_min <= borne['Coordonnees'][1] <= longitude_max for borne in inventaire)
+
+
 def ajouter_borne(inventaire, borne):
     """
-    Ajoute une borne à l'inventaire.
+    Ajoute une borne à l'inventaire. Les numéros sont comparés une fois normalisés (voir normaliser_numero()), pour
+    un Inventaire comme pour une liste simple.
 
     Args:
         inventaire (list): La liste des bornes de l'inventaire
@@ -275,8 +1720,15 @@ def ajouter_borne(inventaire, borne):
     Returns:
         bool: True si la borne a été ajoutée à l'inventaire, False si le numéro de borne existait déjà.
     """
+    if isinstance(inventaire, Inventaire):
+        if normaliser_numero(borne['Numero']) in inventaire._par_numero:
+            return False
+        inventaire.append(borne)
+        return True
+
+    numero = normaliser_numero(borne['Numero'])
     for borne_courante in inventaire:
-        if borne['Numero'] == borne_courante['Numero']:
+        if numero == normaliser_numero(borne_courante['Numero']):
             return False
 
     inventaire.append(borne)
@@ -285,7 +1737,12 @@ def ajouter_borne(inventaire, borne):
 
 def retirer_borne(inventaire, numero_borne):
     """
-    Retire une borne de l'inventaire.
+    Retire une borne de l'inventaire. Les numéros sont comparés une fois normalisés (voir normaliser_numero()), pour
+    un Inventaire comme pour une liste simple.
+
+    Pour un Inventaire, la borne est trouvée par l'index des numéros en O(1), puis sa position par Inventaire.remove()
+    en O(log n); le retrait décale ensuite les bornes suivantes de la liste, en O(n) mais sans comparer de bornes.
+    Pour une liste simple, la borne est cherchée en parcourant la liste.
 
     Args:
         inventaire (list): La liste des bornes de l'inventaire
@@ -294,15 +1751,25 @@ def retirer_borne(inventaire, numero_borne):
     Returns:
         bool: True si la borne a été retirée de l'inventaire, False si le numéro de borne n'existait pas.
     """
-    for borne_courante in inventaire:
-        if numero_borne == borne_courante['Numero']:
-            inventaire.remove(borne_courante)
+    if isinstance(inventaire, Inventaire):
+        groupe = inventaire._par_numero.get(normaliser_numero(numero_borne))
+        if not groupe:
+            return False
+        inventaire.remove(next(iter(groupe.values())))
+        return True
+
+    numero_borne = normaliser_numero(numero_borne)
+    for position, borne_courante in enumerate(inventaire):
+        if numero_borne == normaliser_numero(borne_courante['Numero']):
+            del inventaire[position]
             return True
 
     return False
 
 
 if __name__ == '__main__':
+    import pickle
+
     print('Exécution des tests...')
     print('-----------------------')
     inventaire = lire_fichier_bornes('vdq-bornestationnement.txt')
@@ -312,6 +1779,24 @@ if __name__ == '__main__':
     print('creer_borne: OK')
 
 
+# tests pour creer_borne_compacte
+    borne_compacte = creer_borne_compacte('4', 'N', 'Ruelle Rouge', -71.23, 46.82)
+    assert borne_compacte == {'Numero': 4, 'Cote': 'N', 'Rue': 'Ruelle Rouge', 'Coordonnees': (46.82, -71.23)}
+    assert borne_compacte == creer_borne_compacte(4, 'N', 'Ruelle Rouge', -71.23, 46.82)
+    assert borne_compacte != creer_borne_compacte(4, 'S', 'Ruelle Rouge', -71.23, 46.82)
+    assert borne_compacte != {'Numero': -1}
+    assert dict(borne_compacte) == borne
+    assert borne_compacte['Rue'] is creer_borne_compacte(5, 'N', 'Ruelle ' + 'Rouge', 0, 0)['Rue']
+    borne_compacte['Numero'] = '7'
+    assert borne_compacte['Numero'] == 7
+    assert not hasattr(borne_compacte, '__dict__')
+    try:
+        borne_compacte['Inconnue']
+        assert False
+    except KeyError:
+        pass
+
+
 # tests pour creer_borne_avec_chaine
     chaine = "100020,4060,N,102085,Rue De L'Espinay,-71.23586776648797,46.82775479224512"
     resultat1 = creer_borne_avec_chaine(chaine)
@@ -346,6 +1831,55 @@ if __name__ == '__main__':
     assert inventaire_test[4]["Coordonnees"] == (46.81163827847973, -71.2275177088525)
 
 
+# tests pour iterer_fichier_bornes
+    for utiliser_mmap in (False, True):
+        assert list(iterer_fichier_bornes("vdq-bornestationnement-reduit.txt", utiliser_mmap=utiliser_mmap)) == \
+            inventaire_test
+    resultat4 = list(iterer_fichier_bornes("vdq-bornestationnement.txt", rue="charest", utiliser_mmap=True))
+    assert resultat4 == selectionner_bornes_par_rue(inventaire, "charest")
+    resultat4 = iterer_fichier_bornes("vdq-bornestationnement-reduit.txt", boite=(46.81, -71.23, 46.815, -71.22))
+    assert [borne['Numero'] for borne in resultat4] == ['3008', '3060', '3170']
+
+    import os
+    import tempfile
+    with tempfile.TemporaryDirectory() as dossier_temporaire:
+        nom_fichier_test = os.path.join(dossier_temporaire, "bornes.txt")
+        with open(nom_fichier_test, "w", encoding="utf-8") as fichier_test:
+            fichier_test.write("ID,NO_BORNE,COTE_RUE,ID_VOIE_PUBLIQUE,NOM_TOPOGRAPHIQUE,LONGITUDE,LATITUDE\n"
+                               "1,10,N,5,Rue A,-71.2,46.8\n"
+                               "2,11,N,5,Rue A,abc,46.8\n"
+                               "\n"
+                               "3,12,S,5\n"
+                               "4,13,S,6,\"Rue B, Québec\",-71.3,46.9\n")
+        erreurs_lecture = []
+        resultat4 = list(iterer_fichier_bornes(nom_fichier_test, erreurs=erreurs_lecture))
+        assert [borne['Rue'] for borne in resultat4] == ['Rue A', 'Rue B, Québec']
+        assert [numero_ligne for numero_ligne, _ in erreurs_lecture] == [3, 5]
+        try:
+            list(iterer_fichier_bornes(nom_fichier_test))
+            assert False
+        except ValueError:
+            pass
+
+        nom_fichier_vide = os.path.join(dossier_temporaire, "vide.txt")
+        open(nom_fichier_vide, "w").close()
+        assert list(iterer_fichier_bornes(nom_fichier_vide, utiliser_mmap=True)) == []
+    assert lire_fichier_bornes("fichier-inexistant.txt") == []
+
+    inventaire_compact = lire_fichier_bornes("vdq-bornestationnement.txt", compacte=True)
+    assert all(isinstance(borne, Borne) for borne in inventaire_compact)
+    assert inventaire_compact[0]['Numero'] == 4005
+    assert selectionner_borne_par_numero(inventaire_compact, '4005')['Rue'] == '1re Avenue'
+    for numero in (3170, 4005, 2060):
+        assert trouver_borne_plus_pres(inventaire_compact, numero, True)['Numero'] == \
+            int(trouver_borne_plus_pres(inventaire, numero, True)['Numero'])
+    assert trouver_bornes_plus_eloignees(inventaire_compact) == (
+        creer_borne_compacte('4140', 'N', 'Boulevard Sainte-Anne', -71.21370767822152, 46.84520539397195),
+        creer_borne_compacte('6111', 'O', 'Avenue Maguire', -71.25043521119333, 46.779296353862875))
+    assert retirer_borne(inventaire_compact, '4005') is True
+    assert ajouter_borne(inventaire_compact, inventaire_test[0]) is False
+
+
 # tests pour nombre_de_bornes
     assert nombre_de_bornes(inventaire_test) == 5
     assert nombre_de_bornes([]) == 0
@@ -363,6 +1897,28 @@ if __name__ == '__main__':
     assert resultat5 == [{'Numero': '3170', 'Cote': 'E', 'Rue': 'Rue Caron', 'Coordonnees': (46.81163827847973, -71.2275177088525)}]
 
 
+    resultat5 = selectionner_bornes_par_rue(inventaire_test, "CHAREST")
+    assert [borne['Numero'] for borne in resultat5] == ['3008', '3060']
+
+    for requete in ("Rue", "boulevard", "e", "", "Charest", "Sainte-", "ea", "Rue invalide"):
+        assert selectionner_bornes_par_rue(inventaire, requete) == selectionner_bornes_par_rue(list(inventaire), requete)
+
+
+# tests pour rechercher_rues
+    resultat5 = rechercher_rues(inventaire_test, "charest")
+    assert list(resultat5) == ['Boulevard Charest Est']
+    assert [borne['Numero'] for borne in resultat5['Boulevard Charest Est']] == ['3008', '3060']
+    assert list(rechercher_rues(inventaire_test, "rue caron")) == ['Rue Caron']
+    assert list(rechercher_rues(inventaire_test, "CARDINAL-VILLENEUVÉ")) == ['Boulevard Cardinal-Villeneuve']
+    assert rechercher_rues(inventaire_test, "invalide") == {}
+    assert len(rechercher_rues(list(inventaire_test), "")) == 4
+    for requete in ("rue", "boulevard", "ste", "avenue de"):
+        rues_attendues = list(dict.fromkeys(borne['Rue'] for borne in inventaire
+                                            if normaliser_texte(requete) in normaliser_texte(borne['Rue'])))
+        assert list(rechercher_rues(inventaire, requete)) == rues_attendues
+    assert normaliser_texte("Rue De L'Église") == "rue de l'eglise"
+
+
 # tests pour selectionner_bornes_par_cote
     resultat5 = selectionner_bornes_par_cote(inventaire_test, "S")
     assert len(resultat5) == 2
@@ -397,11 +1953,156 @@ if __name__ == '__main__':
     distance3 = calculer_distance_bornes(borne1, borne3)
     assert abs(distance3 - 0.453) < 0.001
 
+    # les bornes lues du fichier ont des coordonnées déjà projetées et donnent les mêmes distances
+    assert inventaire_test[3] == borne1 and isinstance(inventaire_test[3]['Coordonnees'], Coordonnees)
+    assert calculer_distance_bornes(inventaire_test[3], inventaire_test[0]) == distance2
+    assert abs(calculer_distance_bornes(borne1, borne2, 'carree') - distance2 ** 2) < 1e-12
+    assert abs(calculer_distance_bornes(borne1, borne2, 'haversine') - 1.906) < 0.001
+    try:
+        calculer_distance_bornes(borne1, borne2, 'manhattan')
+        assert False
+    except ValueError:
+        pass
+
+
+# tests pour Coordonnees
+    coordonnees_test = Coordonnees(46.82, -71.23)
+    assert coordonnees_test == (46.82, -71.23) and (46.82, -71.23) == coordonnees_test
+    assert coordonnees_test != (46.82, -71.24) and coordonnees_test != [46.82, -71.23]
+    assert tuple(coordonnees_test) == (46.82, -71.23) and coordonnees_test[1] == -71.23 and len(coordonnees_test) == 2
+    assert hash(coordonnees_test) == hash((46.82, -71.23)) and repr(coordonnees_test) == '(46.82, -71.23)'
+    assert projeter_coordonnees(coordonnees_test) == projeter_coordonnees((46.82, -71.23)) == \
+        (coordonnees_test.x, coordonnees_test.y)
+    assert pickle.loads(pickle.dumps(coordonnees_test)).x == coordonnees_test.x
+    assert projeter_coordonnees(Coordonnees('46.82', '-71.23')) == projeter_coordonnees(coordonnees_test)
+    borne_compacte_test = creer_borne_compacte(4, 'N', 'Ruelle Rouge', -71.23, 46.82)
+    assert _projeter_borne(borne_compacte_test) == projeter_coordonnees(coordonnees_test)
+    borne_compacte_test['Coordonnees'] = (46.81, -71.22)
+    assert _projeter_borne(borne_compacte_test) == projeter_coordonnees((46.81, -71.22))
+
+
+# tests pour calculer_distances_borne
+    distances_test = calculer_distances_borne(inventaire_test, borne1)
+    assert len(distances_test) == 5
+    assert distances_test[3] == 0.0
+    assert distances_test[0] == calculer_distance_bornes(borne1, borne2)
+    assert calculer_distances_borne([], borne1) == []
+    nb_distances_avant = nb_distances
+    calculer_distances_borne(inventaire_test, borne1)
+    assert nb_distances - nb_distances_avant == 5
+
+
+# tests pour calculer_matrice_distances
+    matrice_test = calculer_matrice_distances([borne1, borne3], inventaire_test)
+    assert len(matrice_test) == 2 and len(matrice_test[0]) == 5
+    assert matrice_test[1][4] == 0.0
+    assert matrice_test[0][0] == calculer_distance_bornes(borne1, borne2)
+    assert obtenir_colonnes(inventaire_test) is obtenir_colonnes(inventaire_test)
+    colonnes_liste = obtenir_colonnes(list(inventaire_test))
+    assert colonnes_liste is not obtenir_colonnes(list(inventaire_test))
+    assert obtenir_colonnes(colonnes_liste) is colonnes_liste
+    assert calculer_distances_borne(colonnes_liste, borne1) == distances_test
+    assert calculer_matrice_distances([borne1, borne3], colonnes_liste) == matrice_test
+    assert selectionner_bornes_par_cote(list(inventaire_test), "S") == selectionner_bornes_par_cote(inventaire_test, "S")
+
 
 # tests pour trouver_borne_plus_pres
     assert trouver_borne_plus_pres(inventaire_test, 3170, False)['Numero'] == '3008'
     assert trouver_borne_plus_pres(inventaire_test, 5555, False) == {'Numero': -1}
     assert trouver_borne_plus_pres(inventaire_test, 3170, True)['Numero'] == '3008'
+    assert trouver_borne_plus_pres(list(inventaire_test), 3170, False)['Numero'] == '3008'
+    assert trouver_borne_plus_pres([borne1], 3060, False) == {'Numero': -1}
+    for borne_courante in inventaire[::50]:
+        for autre_rue in (False, True):
+            assert trouver_borne_plus_pres(inventaire, borne_courante['Numero'], autre_rue) == \
+                trouver_borne_plus_pres(list(inventaire), borne_courante['Numero'], autre_rue)
+
+
+    borne_charest = selectionner_borne_par_numero(inventaire_test, 3060)
+    assert trouver_borne_plus_pres(inventaire_test, 3060, False)['Numero'] == '3008'
+    assert trouver_borne_plus_pres(inventaire_test, 3060, True)['Numero'] == '3170'
+    assert trouver_borne_plus_pres(inventaire_test, 3060, False, exclure_meme_cote)['Numero'] == '3008'
+    assert trouver_borne_plus_pres(inventaire_test, 3060, False, creer_exclusion_numeros(['3008', 3170]))['Numero'] \
+        == '4083'
+    assert trouver_borne_plus_pres(inventaire_test, 3008, False,
+                                   [exclure_meme_cote, creer_exclusion_numeros([3060])])['Numero'] == '3170'
+    assert trouver_borne_plus_pres(list(inventaire_test), 3008, False,
+                                   (exclure_meme_cote, creer_exclusion_numeros([3060])))['Numero'] == '3170'
+    assert trouver_borne_plus_pres(inventaire_test, 3060, False, lambda borne_1, borne_2: True) == {'Numero': -1}
+    # 3008 et 3060 sont sur deux tronçons différents du boulevard Charest Est
+    assert trouver_borne_plus_pres(inventaire_test, 3060, False,
+                                   creer_exclusion_meme_voie(inventaire_test))['Numero'] == '3008'
+    assert obtenir_attributs_borne(inventaire_test, borne_charest) == \
+        {'ID': '100096', 'ID_VOIE_PUBLIQUE': '101365', 'SOURCE': 'vdq-bornestationnement-reduit.txt'}
+    assert obtenir_attributs_borne(list(inventaire_test), borne_charest) == {}
+    assert len(inventaire_test) == 5
+
+    inventaire_copie = pickle.loads(pickle.dumps(inventaire_test))
+    assert inventaire_copie == inventaire_test
+    assert obtenir_attributs_borne(inventaire_copie, inventaire_copie[3])['ID_VOIE_PUBLIQUE'] == '101365'
+    inventaire_copie.sort(key=lambda borne: borne['Numero'])
+    assert obtenir_attributs_borne(inventaire_copie, inventaire_copie[1])['ID'] == '100096'
+    inventaire_copie.remove(inventaire_copie[1])
+    assert len(inventaire_copie._attributs) == 4
+
+
+# tests pour trouver_bornes_plus_pres
+    resultat_voisins = trouver_bornes_plus_pres(inventaire_test, borne3['Coordonnees'], 2)
+    assert [borne['Numero'] for borne in resultat_voisins] == ['3170', '3008']
+    assert len(trouver_bornes_plus_pres(inventaire_test, borne3['Coordonnees'], 10)) == 5
+
+
+# tests pour selectionner_bornes_dans_rayon
+    resultat_rayon = selectionner_bornes_dans_rayon(inventaire_test, borne1['Coordonnees'], 0.5)
+    assert [borne['Numero'] for borne in resultat_rayon] == ['3060', '3008', '3170']
+    assert selectionner_bornes_dans_rayon(inventaire_test, borne1['Coordonnees'], 0.0) == [borne1]
+    assert selectionner_bornes_dans_rayon([], borne1['Coordonnees'], 1.0) == []
+
+    inventaire_modifie = Inventaire(inventaire_test)
+    arbre_modifie = obtenir_index_spatial(inventaire_modifie)
+    inventaire_modifie.remove(inventaire_modifie[2])
+    assert inventaire_modifie._index_spatial is arbre_modifie
+    assert inventaire_modifie._modifications_index['Retraits'] == [2]
+    assert trouver_borne_plus_pres(inventaire_modifie, 3170, False)['Numero'] == '3060'
+    assert obtenir_colonnes(inventaire_modifie) == obtenir_colonnes(list(inventaire_modifie))
+    assert obtenir_index_spatial(inventaire_modifie) is not arbre_modifie
+    assert inventaire_modifie._modifications_index['Retraits'] == []
+
+    import random
+
+    generateur_index = random.Random(5)
+    inventaire_modifie = Inventaire(inventaire[:1400])
+    obtenir_colonnes(inventaire_modifie)
+    arbre_modifie = obtenir_index_spatial(inventaire_modifie)
+    reserve_index = inventaire[1400:]
+    for _ in range(SEUIL_RECONSTRUCTION_INDEX - 4):
+        choix = generateur_index.random()
+        if choix < 0.3:
+            inventaire_modifie.pop(generateur_index.randrange(len(inventaire_modifie)))
+        elif choix < 0.45:
+            inventaire_modifie.remove(generateur_index.choice(inventaire_modifie))
+        elif choix < 0.7:
+            inventaire_modifie.remplacer(generateur_index.randrange(len(inventaire_modifie)),
+                                         generateur_index.choice(reserve_index))
+        else:
+            inventaire_modifie.append(generateur_index.choice(reserve_index))
+        copie_modifiee = list(inventaire_modifie)
+        assert obtenir_colonnes(inventaire_modifie) == obtenir_colonnes(copie_modifiee)
+        borne_reference = generateur_index.choice(copie_modifiee)
+        assert (trouver_borne_plus_pres(inventaire_modifie, borne_reference['Numero'], True)
+                is trouver_borne_plus_pres(copie_modifiee, borne_reference['Numero'], True))
+        assert (trouver_bornes_plus_pres(inventaire_modifie, borne_reference['Coordonnees'], 5)
+                == trouver_bornes_plus_pres(copie_modifiee, borne_reference['Coordonnees'], 5))
+        assert (selectionner_bornes_dans_rayon(inventaire_modifie, borne_reference['Coordonnees'], 0.3)
+                == selectionner_bornes_dans_rayon(copie_modifiee, borne_reference['Coordonnees'], 0.3))
+    assert inventaire_modifie._index_spatial is arbre_modifie
+    for _ in range(SEUIL_RECONSTRUCTION_INDEX + 1):
+        inventaire_modifie.append(generateur_index.choice(reserve_index))
+    trouver_bornes_plus_pres(inventaire_modifie, borne_reference['Coordonnees'], 1)
+    assert inventaire_modifie._index_spatial is not arbre_modifie
+    assert inventaire_modifie._modifications_index['Debut'] == len(inventaire_modifie)
+    inventaire_modifie.sort(key=lambda borne: borne['Rue'])
+    assert inventaire_modifie._index_spatial is None and inventaire_modifie._colonnes is None
 
 
 # tests pour trouver_bornes_plus_eloignees
@@ -411,6 +2112,8 @@ if __name__ == '__main__':
     borne4 = {'Numero': '4140', 'Cote': 'N', 'Rue': 'Boulevard Sainte-Anne', 'Coordonnees': (46.84520539397195, -71.21370767822152)}
     borne5 = {'Numero': '6111', 'Cote': 'O', 'Rue': 'Avenue Maguire', 'Coordonnees': (46.779296353862875, -71.25043521119333)}
     assert trouver_bornes_plus_eloignees(inventaire) == (borne4, borne5)
+    assert trouver_bornes_plus_eloignees([borne1, borne1, borne1]) == (borne1, borne1)
+    assert trouver_bornes_plus_eloignees([borne1, borne3, borne2, borne3]) == (borne3, borne2)
 
 
 # tests pour trouver_borne_centrale
@@ -427,6 +2130,62 @@ if __name__ == '__main__':
     inventaire_une_entree = [{'Numero': '7777', 'Cote': 'S', 'Rue': 'Boulevard Gascon', "Coordonnees": (12.345, 67.890)}]
     resultat7 = trouver_borne_centrale(inventaire_une_entree)
     assert resultat7["Numero"] == "7777"
+    assert trouver_borne_centrale([]) == {'Numero': -1}
+
+    sommes_test = calculer_sommes_distances(inventaire_test, taille_bloc=2)
+    for borne_courante, somme in zip(inventaire_test, sommes_test):
+        assert abs(somme - sum(calculer_distance_bornes(borne_courante, borne) for borne in inventaire_test)) < 1e-9
+
+
+# tests pour suivre_borne_centrale
+    inventaire_suivi = lire_fichier_bornes('vdq-bornestationnement-reduit.txt')
+    suivre_borne_centrale(inventaire_suivi)
+    assert trouver_borne_centrale(inventaire_suivi) == trouver_borne_centrale(list(inventaire_suivi))
+    generateur = random.Random(12)
+    reserve = list(inventaire[:300])
+    for _ in range(200):
+        if inventaire_suivi and generateur.random() < 0.4:
+            if generateur.random() < 0.5:
+                inventaire_suivi.pop(generateur.randrange(-len(inventaire_suivi), len(inventaire_suivi)))
+            else:
+                retirer_borne(inventaire_suivi, generateur.choice(inventaire_suivi)['Numero'])
+        elif generateur.random() < 0.8:
+            ajouter_borne(inventaire_suivi, generateur.choice(reserve))
+        else:
+            inventaire_suivi.extend(generateur.sample(reserve, 3))
+        sommes_suivies = inventaire_suivi._suivi_centrale['Sommes']
+        sommes_exactes = calculer_sommes_distances(inventaire_suivi)
+        assert all(abs(suivie - exacte) < 1e-9 for suivie, exacte in zip(sommes_suivies, sommes_exactes))
+        assert len(sommes_suivies) == len(sommes_exactes)
+        assert trouver_borne_centrale(inventaire_suivi) == trouver_borne_centrale(list(inventaire_suivi))
+
+    inventaire_suivi.sort(key=lambda borne: borne['Rue'])
+    assert inventaire_suivi._suivi_centrale['Sommes'] is None
+    assert trouver_borne_centrale(inventaire_suivi) == trouver_borne_centrale(list(inventaire_suivi))
+    inventaire_suivi.clear()
+    assert trouver_borne_centrale(inventaire_suivi) == {'Numero': -1}
+    inventaire_suivi.append(inventaire[0])
+    assert trouver_borne_centrale(inventaire_suivi) is inventaire[0]
+    suivre_borne_centrale(inventaire_suivi, False)
+    assert inventaire_suivi._suivi_centrale is None
+
+
+# tests pour trouver_borne_centrale_approximative
+    assert trouver_borne_centrale_approximative(inventaire_test) == (trouver_borne_centrale(inventaire_test), 0.0)
+    assert trouver_borne_centrale_approximative([]) == ({'Numero': -1}, 0.0)
+    assert trouver_borne_centrale_approximative(inventaire_test, nb_candidats=1)[0] in inventaire_test
+    for nb_candidats_invalide in (0, -3):
+        try:
+            trouver_borne_centrale_approximative(inventaire_test, nb_candidats=nb_candidats_invalide)
+            assert False
+        except ValueError:
+            pass
+    borne_approx, erreur_approx = trouver_borne_centrale_approximative(inventaire, nb_candidats=16)
+    borne_exacte = trouver_borne_centrale(inventaire)
+    nb_total = nombre_de_bornes(inventaire)
+    moyenne_approx = sum(calculer_distances_borne(inventaire, borne_approx)) / nb_total
+    moyenne_exacte = sum(calculer_distances_borne(inventaire, borne_exacte)) / nb_total
+    assert 0 <= moyenne_approx - moyenne_exacte <= erreur_approx + 1e-9
 
 
 # tests pour ajouter_borne
@@ -455,4 +2214,127 @@ if __name__ == '__main__':
     assert len(inventaire_1) == 3
 
 
-
+# tests pour les index de la classe Inventaire
+    inventaire_2 = Inventaire(inventaire_1)
+    assert ajouter_borne(inventaire_2, borne_existante) is True
+    assert ajouter_borne(inventaire_2, {'Numero': 1244, 'Cote': 'N', 'Rue': 'Rue A', 'Coordonnees': (1, 2)}) is False
+    assert selectionner_borne_par_numero(inventaire_2, '1244') is borne_existante
+    assert selectionner_bornes_par_cote(inventaire_2, 'S') == [borne_existante]
+    assert retirer_borne(inventaire_2, 1244) is True
+    assert retirer_borne(inventaire_2, 1244) is False
+    assert selectionner_borne_par_numero(inventaire_2, 1244) == {'Numero': -1}
+    assert selectionner_bornes_par_cote(inventaire_2, 'S') == []
+    assert inventaire_2._par_numero.keys() == {5124, 6578, 8888}
+
+    inventaire_2.insert(0, borne_existante)
+    assert selectionner_bornes_par_cote(inventaire_2, 'S') == [borne_existante]
+    assert inventaire_2.pop(0) is borne_existante
+    assert selectionner_bornes_par_cote(inventaire_2, 'S') == []
+
+    # les numéros sont normalisés pour une liste simple comme pour un Inventaire
+    borne_zeros = {'Numero': '0012', 'Cote': 'N', 'Rue': 'Rue A', 'Coordonnees': (1, 2)}
+    for contenant in (list, Inventaire):
+        bornes_zeros = contenant([borne_zeros])
+        assert ajouter_borne(bornes_zeros, {**borne_zeros, 'Numero': 12}) is False
+        assert retirer_borne(bornes_zeros, ' 12') is True and len(bornes_zeros) == 0
+
+    # Inventaire.remove() trouve la borne par identité, même si une borne égale la précède
+    borne_copie = dict(inventaire_2[0])
+    inventaire_2.append(borne_copie)
+    assert inventaire_2._trouver_position(borne_copie) == len(inventaire_2) - 1
+    inventaire_2.remove(borne_copie)
+    assert all(borne is not borne_copie for borne in inventaire_2) and inventaire_2[0] == borne_copie
+    assert inventaire_2._trouver_position(borne_copie) == -1
+    borne_doublon = inventaire_2[1]
+    inventaire_2.append(borne_doublon)  # un objet présent deux fois: parcours par identité
+    assert inventaire_2._trouver_position(borne_doublon) == 1
+    inventaire_2.remove(borne_doublon)
+    assert inventaire_2[-1] is borne_doublon and inventaire_2._trouver_position(borne_doublon) == len(inventaire_2) - 1
+    assert inventaire_2.pop() is borne_doublon
+
+    inventaire_6 = lire_fichier_bornes('vdq-bornestationnement.txt')
+    copie_6 = list(inventaire_6)
+    for borne_courante in reversed(copie_6[::3]):
+        assert retirer_borne(inventaire_6, borne_courante['Numero']) is True
+        assert retirer_borne(copie_6, borne_courante['Numero']) is True
+    assert list(inventaire_6) == copie_6 and Inventaire(copie_6)._par_numero.keys() == inventaire_6._par_numero.keys()
+
+    inventaire_3 = lire_fichier_bornes('vdq-bornestationnement.txt')
+    for numero in ('2060', 4005, 5001, '9999'):
+        assert selectionner_borne_par_numero(inventaire_3, numero) == \
+            selectionner_borne_par_numero(list(inventaire_3), numero)
+    for cote in ('N', 'S', 'E', 'O', ''):
+        assert selectionner_bornes_par_cote(inventaire_3, cote) == selectionner_bornes_par_cote(list(inventaire_3), cote)
+
+
+    # remplacer garde les index dans l'ordre de l'inventaire, comme une reconstruction complète
+    inventaire_4 = lire_fichier_bornes('vdq-bornestationnement.txt')
+    suivre_borne_centrale(inventaire_4)
+    remplacement = creer_borne('99999', 'N', 'Avenue Cartier', -71.22, 46.81)
+    inventaire_4.remplacer(10, remplacement, ('999999', ''))
+    inventaire_4.remplacer(-1, creer_borne(inventaire_4[-1]['Numero'], 'S', 'Rue Nouvelle', -71.2, 46.8))
+    inventaire_reconstruit = Inventaire(inventaire_4)
+    assert inventaire_4[10] is remplacement
+    assert obtenir_attributs_borne(inventaire_4, remplacement) == {'ID': '999999', 'ID_VOIE_PUBLIQUE': ''}
+    for cote in ('N', 'S', 'E', 'O', ''):
+        assert selectionner_bornes_par_cote(inventaire_4, cote) == \
+            selectionner_bornes_par_cote(inventaire_reconstruit, cote)
+    for rue in ('Cartier', 'Nouvelle', 'Avenue', ''):
+        assert selectionner_bornes_par_rue(inventaire_4, rue) == \
+            selectionner_bornes_par_rue(inventaire_reconstruit, rue)
+    assert selectionner_borne_par_numero(inventaire_4, 99999) is remplacement
+    sommes_exactes = calculer_sommes_distances(inventaire_4)
+    assert all(abs(suivie - exacte) < 1e-9
+               for suivie, exacte in zip(inventaire_4._suivi_centrale['Sommes'], sommes_exactes))
+    assert trouver_borne_centrale(inventaire_4) == trouver_borne_centrale(inventaire_reconstruit[:])
+    inventaire_4.remplacer(0, inventaire_4[1])
+    assert inventaire_4[0] is inventaire_4[1]
+    assert selectionner_bornes_par_cote(inventaire_4, inventaire_4[0]['Cote'])[0] is inventaire_4[0]
+
+
+# tests pour suivre_agregats, obtenir_agregats et compter_bornes_dans_boite
+    inventaire_5 = lire_fichier_bornes('vdq-bornestationnement.txt')
+    suivre_agregats(inventaire_5, 0.5)
+    agregats_rue = obtenir_agregats(inventaire_5, 'rue')
+    assert agregats_rue['Avenue Cartier']['Nombre'] == len(selectionner_bornes_par_rue(inventaire_5, 'Avenue Cartier'))
+    assert agregats_rue == obtenir_agregats(list(inventaire_5), 'rue', 0.5)
+    agregats_cote = obtenir_agregats(inventaire_5, 'cote')
+    for cote in ('N', 'S', 'E', 'O'):
+        bornes_cote = selectionner_bornes_par_cote(inventaire_5, cote)
+        assert agregats_cote[cote]['Nombre'] == len(bornes_cote)
+        assert abs(agregats_cote[cote]['Centroide'][1] - sum(borne['Coordonnees'][1] for borne in bornes_cote)
+                   / len(bornes_cote)) < 1e-9
+    agregats_cellule = obtenir_agregats(inventaire_5, 'cellule')
+    assert sum(agregat['Nombre'] for agregat in agregats_cellule.values()) == len(inventaire_5)
+    assert all(agregat['Densite'] == agregat['Nombre'] * 4 for agregat in agregats_cellule.values())
+    assert obtenir_agregats(inventaire_5, 'cellule', 1.0).keys() != agregats_cellule.keys()
+
+    boites = [(46.81, -71.23, 46.815, -71.22), (46.0, -72.0, 47.0, -71.0), (46.8, -71.3, 46.85, -71.2),
+              (46.815, -71.22, 46.81, -71.23), tuple(inventaire_5[0]['Coordonnees']) * 2]
+    for boite in boites:
+        assert compter_bornes_dans_boite(inventaire_5, boite) == compter_bornes_dans_boite(list(inventaire_5), boite)
+    assert compter_bornes_dans_boite(inventaire_5, boites[0]) == \
+        len(list(iterer_fichier_bornes('vdq-bornestationnement.txt', boite=boites[0])))
+
+    # mises à jour incrémentales: ajout, retrait, remplacement et reconstruction des index
+    borne_eloignee = creer_borne('99998', 'N', 'Rue Lointaine', -70.5, 47.5)
+    assert ajouter_borne(inventaire_5, borne_eloignee)
+    assert retirer_borne(inventaire_5, 3008)
+    inventaire_5.remplacer(3, creer_borne('99997', 'S', 'Avenue Cartier', -71.22, 46.81))
+    inventaire_5.pop(0)
+    for groupe in ('rue', 'cote', 'cellule'):
+        agregats_suivis = obtenir_agregats(inventaire_5, groupe)
+        agregats_recalcules = obtenir_agregats(list(inventaire_5), groupe, 0.5)
+        assert agregats_suivis.keys() == agregats_recalcules.keys()
+        for valeur, agregat in agregats_suivis.items():
+            assert agregat['Nombre'] == agregats_recalcules[valeur]['Nombre']
+            assert all(abs(suivie - recalculee) < 1e-9
+                       for suivie, recalculee in zip(agregat['Centroide'], agregats_recalcules[valeur]['Centroide']))
+    assert obtenir_agregats(inventaire_5, 'rue')['Rue Lointaine']['Nombre'] == 1
+    for boite in boites + [(47.0, -71.0, 48.0, -70.0)]:
+        assert compter_bornes_dans_boite(inventaire_5, boite) == compter_bornes_dans_boite(list(inventaire_5), boite)
+    inventaire_5.sort(key=lambda borne: borne['Rue'])
+    assert obtenir_agregats(inventaire_5, 'rue')['Rue Lointaine']['Nombre'] == 1
+    assert compter_bornes_dans_boite(inventaire_5, boites[1]) == len(inventaire_5) - 1
+    suivre_agregats(inventaire_5, actif=False)
+    assert inventaire_5._agregats is None
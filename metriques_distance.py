@@ -0,0 +1,227 @@
+"""
+Module regroupant les métriques de distance entre bornes. Toutes les métriques travaillent sur les coordonnées
+projetées des bornes en kilomètres (x = latitude * 110.6, y = longitude * 78.85, voir projeter_coordonnees() dans le
+module inventaire_bornes), qui sont calculées une seule fois à la création de chaque borne:
+    - equirectangulaire: la distance euclidienne dans le plan projeté, l'approximation utilisée partout dans
+      l'inventaire;
+    - carree: le carré de cette distance, sans racine carrée, qui suffit pour comparer des distances (borne la plus
+      proche, la plus éloignée);
+    - haversine: la distance sur la sphère terrestre, plus exacte lorsque les bornes couvrent une grande région.
+
+Chaque métrique offre un noyau pour une paire de points et un noyau pour un point et des colonnes de points (voir
+obtenir_colonnes() dans le module inventaire_bornes), qui fait tout le calcul dans une seule compréhension. Ce second
+noyau reste une boucle Python, sans calcul vectoriel: il évite seulement, pour chaque paire, l'accès aux
+dictionnaires des bornes et l'appel du noyau pour une paire.
+"""
+
+from math import asin, cos, pi, sin, sqrt
+
+KM_PAR_DEGRE_LATITUDE = 110.6
+KM_PAR_DEGRE_LONGITUDE = 78.85
+RAYON_TERRE_KM = 6371.0088
+
+# facteurs pour retrouver la latitude et la longitude en radians à partir des coordonnées projetées
+_RADIANS_PAR_KM_X = pi / 180 / KM_PAR_DEGRE_LATITUDE
+_RADIANS_PAR_KM_Y = pi / 180 / KM_PAR_DEGRE_LONGITUDE
+
+
+def calculer_distance_equirectangulaire(x1, y1, x2, y2):
+    """
+    Calcule la distance euclidienne entre deux points projetés.
+
+    Args:
+        x1 (float): La coordonnée x du premier point, en kilomètres
+        y1 (float): La coordonnée y du premier point, en kilomètres
+        x2 (float): La coordonnée x du deuxième point, en kilomètres
+        y2 (float): La coordonnée y du deuxième point, en kilomètres
+
+    Returns:
+        float: La distance en kilomètres
+    """
+    return sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+
+
+def calculer_distances_equirectangulaires(x, y, xs, ys):
+    """
+    Calcule la distance euclidienne entre un point projeté et chacun des points de deux colonnes.
+
+    Args:
+        x (float): La coordonnée x du point, en kilomètres
+        y (float): La coordonnée y du point, en kilomètres
+        xs (array): Les coordonnées x des autres points
+        ys (array): Les coordonnées y des autres points
+
+    Returns:
+        list: Les distances en kilomètres, dans l'ordre des colonnes
+    """
+    return [sqrt((x_point - x) ** 2 + (y_point - y) ** 2) for x_point, y_point in zip(xs, ys)]
+
+
+def calculer_distance_carree(x1, y1, x2, y2):
+    """
+    Calcule le carré de la distance euclidienne entre deux points projetés.
+
+    Args:
+        x1 (float): La coordonnée x du premier point, en kilomètres
+        y1 (float): La coordonnée y du premier point, en kilomètres
+        x2 (float): La coordonnée x du deuxième point, en kilomètres
+        y2 (float): La coordonnée y du deuxième point, en kilomètres
+
+    Returns:
+        float: Le carré de la distance, en kilomètres carrés
+    """
+    return (x2 - x1) ** 2 + (y2 - y1) ** 2
+
+
+def calculer_distances_carrees(x, y, xs, ys):
+    """
+    Calcule le carré de la distance euclidienne entre un point projeté et chacun des points de deux colonnes.
+
+    Args:
+        x (float): La coordonnée x du point, en kilomètres
+        y (float): La coordonnée y du point, en kilomètres
+        xs (array): Les coordonnées x des autres points
+        ys (array): Les coordonnées y des autres points
+
+    Returns:
+        list: Les carrés des distances, dans l'ordre des colonnes
+    """
+    return [(x_point - x) ** 2 + (y_point - y) ** 2 for x_point, y_point in zip(xs, ys)]
+
+
+def calculer_distance_haversine(x1, y1, x2, y2):
+    """
+    Calcule la distance sur la sphère terrestre (formule de haversine) entre deux points projetés.
+
+    Args:
+        x1 (float): La coordonnée x du premier point, en kilomètres
+        y1 (float): La coordonnée y du premier point, en kilomètres
+        x2 (float): La coordonnée x du deuxième point, en kilomètres
+        y2 (float): La coordonnée y du deuxième point, en kilomètres
+
+    Returns:
+        float: La distance en kilomètres
+    """
+    latitude_1 = x1 * _RADIANS_PAR_KM_X
+    latitude_2 = x2 * _RADIANS_PAR_KM_X
+    a = (sin((latitude_2 - latitude_1) / 2) ** 2
+         + cos(latitude_1) * cos(latitude_2) * sin((y2 - y1) * _RADIANS_PAR_KM_Y / 2) ** 2)
+    return 2 * RAYON_TERRE_KM * asin(min(1.0, sqrt(a)))
+
+
+def calculer_distances_haversine(x, y, xs, ys):
+    """
+    Calcule la distance sur la sphère terrestre (formule de haversine) entre un point projeté et chacun des points
+    de deux colonnes.
+
+    Args:
+        x (float): La coordonnée x du point, en kilomètres
+        y (float): La coordonnée y du point, en kilomètres
+        xs (array): Les coordonnées x des autres points
+        ys (array): Les coordonnées y des autres points
+
+    Returns:
+        list: Les distances en kilomètres, dans l'ordre des colonnes
+    """
+    latitude = x * _RADIANS_PAR_KM_X
+    cos_latitude = cos(latitude)
+    return [2 * RAYON_TERRE_KM * asin(min(1.0, sqrt(
+                sin((x_point * _RADIANS_PAR_KM_X - latitude) / 2) ** 2
+                + cos_latitude * cos(x_point * _RADIANS_PAR_KM_X) * sin((y_point - y) * _RADIANS_PAR_KM_Y / 2) ** 2)))
+            for x_point, y_point in zip(xs, ys)]
+
+
+class Metrique:
+    """
+    Métrique de distance entre points projetés, formée d'un noyau pour une paire de points (distance) et d'un noyau
+    pour un point et des colonnes de points (distances).
+    """
+
+    def __init__(self, nom, distance, distances, comparaison_seulement=False):
+        """
+        Args:
+            nom (str): Le nom de la métrique
+            distance (function): Le noyau pour une paire de points, qui reçoit x1, y1, x2 et y2
+            distances (function): Le noyau pour un point et des colonnes, qui reçoit x, y, xs et ys
+            comparaison_seulement (bool): True si les valeurs ne sont pas des distances en kilomètres et ne servent
+                qu'à comparer des distances entre elles
+        """
+        self.nom = nom
+        self.distance = distance
+        self.distances = distances
+        self.comparaison_seulement = comparaison_seulement
+
+    def __repr__(self):
+        return f'Metrique({self.nom!r})'
+
+
+METRIQUES = {
+    'equirectangulaire': Metrique('equirectangulaire', calculer_distance_equirectangulaire,
+                                  calculer_distances_equirectangulaires),
+    'carree': Metrique('carree', calculer_distance_carree, calculer_distances_carrees, comparaison_seulement=True),
+    'haversine': Metrique('haversine', calculer_distance_haversine, calculer_distances_haversine),
+}
+
+
+def obtenir_metrique(metrique):
+    """
+    Retourne une métrique à partir de son nom.
+
+    Args:
+        metrique (str): Le nom de la métrique ('equirectangulaire', 'carree' ou 'haversine'), ou une Metrique
+
+    Returns:
+        Metrique: La métrique
+
+    Raises:
+        ValueError: Si la métrique est inconnue
+    """
+    if isinstance(metrique, Metrique):
+        return metrique
+    try:
+        return METRIQUES[metrique]
+    except (KeyError, TypeError):
+        raise ValueError(f"métrique inconnue: {metrique}") from None
+
+
+if __name__ == '__main__':
+    from array import array
+
+    print('Exécution des tests...')
+    print('-----------------------')
+
+    points_test = [(46.8141394906634 * KM_PAR_DEGRE_LATITUDE, -71.22296230536146 * KM_PAR_DEGRE_LONGITUDE),
+                   (46.828893322195135 * KM_PAR_DEGRE_LATITUDE, -71.23571580398136 * KM_PAR_DEGRE_LONGITUDE),
+                   (46.81163827847973 * KM_PAR_DEGRE_LATITUDE, -71.2275177088525 * KM_PAR_DEGRE_LONGITUDE)]
+    xs_test = array('d', [x for x, _ in points_test])
+    ys_test = array('d', [y for _, y in points_test])
+
+# tests pour les noyaux
+    for metrique_test in METRIQUES.values():
+        for x_test, y_test in points_test:
+            assert metrique_test.distances(x_test, y_test, xs_test, ys_test) == \
+                [metrique_test.distance(x_test, y_test, x_point, y_point) for x_point, y_point in points_test]
+        assert metrique_test.distance(*points_test[0], *points_test[0]) == 0.0
+
+    distance_test = calculer_distance_equirectangulaire(*points_test[0], *points_test[1])
+    assert abs(distance_test - 1.9168) < 1e-4
+    assert calculer_distance_carree(*points_test[0], *points_test[1]) == \
+        (points_test[1][0] - points_test[0][0]) ** 2 + (points_test[1][1] - points_test[0][1]) ** 2
+    # la projection surestime un peu les distances est-ouest à la latitude de Québec
+    assert 0.95 < calculer_distance_haversine(*points_test[0], *points_test[1]) / distance_test < 1.0
+    # un degré de latitude: 111,19 km sur la sphère
+    assert abs(calculer_distance_haversine(0.0, 0.0, KM_PAR_DEGRE_LATITUDE, 0.0) - 111.195) < 1e-3
+    assert abs(calculer_distance_haversine(0.0, 0.0, 0.0, 180 * KM_PAR_DEGRE_LONGITUDE) - pi * RAYON_TERRE_KM) < 1e-6
+
+
+# tests pour obtenir_metrique
+    assert obtenir_metrique('haversine') is METRIQUES['haversine']
+    assert obtenir_metrique(METRIQUES['carree']) is METRIQUES['carree']
+    assert METRIQUES['carree'].comparaison_seulement and not METRIQUES['equirectangulaire'].comparaison_seulement
+    for nom_invalide in ('manhattan', None, ['haversine']):
+        try:
+            obtenir_metrique(nom_invalide)
+            assert False
+        except ValueError:
+            pass
+    print('metriques_distance: OK')
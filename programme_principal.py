@@ -3,7 +3,15 @@ Module contenant l'exécution du programme pour gérer et analyser l'inventaire
 la ville de Québec.
 """
 
+import argparse
+import os
+import sys
+
+import cache_inventaire
+from cache_requetes import CacheRequetes
+import instrumentation
 import inventaire_bornes as ibornes
+import requetes_bornes
 
 
 def demander_une_borne(inventaire, message):
@@ -30,36 +38,44 @@ def demander_une_borne(inventaire, message):
     return borne
 
 
-print("Execution du programme d'analyse des bornes")
-print("-------------------------------------------")
+def choisir_fichier():
+    """ Demande à l'utilisateur le fichier d'inventaire à utiliser
 
-print("""
+    Returns:
+        str: Le nom du fichier d'inventaire
+    """
+    print("""
 Sélectionner le fichier d'inventaire:
 1) Inventaire complet ('vdq-bornestationnement.txt')
 2) Inventaire réduit ('vdq-bornestationnement-reduit.txt')
 3) Autre fichier
 """)
 
-choix = ''
-while choix not in ('1', '2', '3'):
-    choix = input('Choix:')
+    choix = ''
+    while choix not in ('1', '2', '3'):
+        choix = input('Choix:')
+
+    if choix == '1':
+        nom_fichier = 'vdq-bornestationnement.txt'
+    elif choix == '2':
+        nom_fichier = 'vdq-bornestationnement-reduit.txt'
+    else:
+        nom_fichier = input('Entrez le nom de fichier contenant l\'inventaire:')
+    return nom_fichier
 
-if choix == '1':
-    nom_fichier = 'vdq-bornestationnement.txt'
-elif choix == '2':
-    nom_fichier = 'vdq-bornestationnement-reduit.txt'
-else:
-    nom_fichier = input('Entrez le nom de fichier contenant l\'inventaire:')
 
-print('Lecture du fichier...')
-inventaire = ibornes.lire_fichier_bornes(nom_fichier)
-nb_bornes = ibornes.nombre_de_bornes(inventaire)
-print(f'{nb_bornes} bornes répertoriées')
+def executer_menu(inventaire, cache):
+    """ Affiche le menu des actions possibles et exécute les actions choisies par l'utilisateur jusqu'à ce qu'il
+    quitte
 
-choix = ""
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        cache (CacheRequetes): La cache des résultats des recherches, réutilisés tant que l'inventaire ne change pas
+    """
+    choix = ""
 
-while choix != 'q':
-    print("""Actions possibles:
+    while choix != 'q':
+        print("""Actions possibles:
     1) Afficher l'inventaire
     2) Rechercher les bornes par nom de rue
     3) Rechercher les bornes par côté de rue
@@ -67,43 +83,134 @@ while choix != 'q':
     5) Trouver la borne la plus près d'une autre
     6) Trouver les bornes les plus éloignées
     7) Trouver la borne centrale
+    8) Afficher les statistiques d'exécution
     """)
 
-    choix = input('Choix ("q" pour quitter): ')
-
-    if choix == '1':
-        ibornes.afficher_inventaire(inventaire)
-    elif choix == '2':
-        rue = input("Entrez le nom de la rue: ")
-        selection = ibornes.selectionner_bornes_par_rue(inventaire, rue)
-        print("\nRésultat de la recherche:")
-        ibornes.afficher_inventaire(selection)
-    elif choix == '3':
-        cote = input("Entrez un côté de la rue: ")
-        selection = ibornes.selectionner_bornes_par_cote(inventaire, cote)
-        print("\nRésultat de la recherche:")
-        ibornes.afficher_inventaire(selection)
-    elif choix == '4':
-        borne_1 = demander_une_borne(inventaire, "Numéro de la première borne: ")
-        borne_2 = demander_une_borne(inventaire, "Numéro de la deuxième borne: ")
-        distance = ibornes.calculer_distance_bornes(borne_1, borne_2)
-        print(f"\nDistance : {distance:.3} km\n")
-    elif choix == '5':
-        borne_1 = demander_une_borne(inventaire, "Numéro de la borne de référence: ")
-        borne_2 = ibornes.trouver_borne_plus_pres(inventaire, borne_1['Numero'], False)
-        print("\nRésultat de la recherche:")
-        ibornes.afficher_inventaire([borne_2])
-        if borne_1['Rue'] == borne_2['Rue']:
-            borne_2 = ibornes.trouver_borne_plus_pres(inventaire, borne_1['Numero'], True)
-            print("\nRésultat de la recherche (sur une autre rue):")
+        choix = input('Choix ("q" pour quitter): ')
+
+        if choix == '1':
+            ibornes.afficher_inventaire(inventaire)
+        elif choix == '2':
+            rue = input("Entrez le nom de la rue: ")
+            selection = cache.executer(ibornes.selectionner_bornes_par_rue, inventaire, rue)
+            print("\nRésultat de la recherche:")
+            ibornes.afficher_inventaire(selection)
+        elif choix == '3':
+            cote = input("Entrez un côté de la rue: ")
+            selection = cache.executer(ibornes.selectionner_bornes_par_cote, inventaire, cote)
+            print("\nRésultat de la recherche:")
+            ibornes.afficher_inventaire(selection)
+        elif choix == '4':
+            borne_1 = demander_une_borne(inventaire, "Numéro de la première borne: ")
+            borne_2 = demander_une_borne(inventaire, "Numéro de la deuxième borne: ")
+            distance = ibornes.calculer_distance_bornes(borne_1, borne_2)
+            print(f"\nDistance : {distance:.3} km\n")
+        elif choix == '5':
+            borne_1 = demander_une_borne(inventaire, "Numéro de la borne de référence: ")
+            borne_2 = cache.executer(ibornes.trouver_borne_plus_pres, inventaire, borne_1['Numero'], False)
+            print("\nRésultat de la recherche:")
             ibornes.afficher_inventaire([borne_2])
-    elif choix == '6':
-        borne_1, borne_2 = ibornes.trouver_bornes_plus_eloignees(inventaire)
-        print("\nRésultat de la recherche:")
-        ibornes.afficher_inventaire([borne_1, borne_2])
-    elif choix == '7':
-        borne = ibornes.trouver_borne_centrale(inventaire)
-        print("\nRésultat de la recherche:")
-        ibornes.afficher_inventaire([borne])
-
-print("Fin du programme.")
+            if borne_1['Rue'] == borne_2['Rue']:
+                borne_2 = cache.executer(ibornes.trouver_borne_plus_pres, inventaire, borne_1['Numero'], True)
+                print("\nRésultat de la recherche (sur une autre rue):")
+                ibornes.afficher_inventaire([borne_2])
+        elif choix == '6':
+            borne_1, borne_2 = cache.executer(ibornes.trouver_bornes_plus_eloignees, inventaire)
+            print("\nRésultat de la recherche:")
+            ibornes.afficher_inventaire([borne_1, borne_2])
+        elif choix == '7':
+            borne = cache.executer(ibornes.trouver_borne_centrale, inventaire)
+            print("\nRésultat de la recherche:")
+            ibornes.afficher_inventaire([borne])
+        elif choix == '8':
+            instrumentation.afficher_statistiques()
+
+
+def executer_mode_lot(inventaire, options, cache):
+    """ Exécute les requêtes d'un fichier ou de l'entrée standard sans passer par le menu, et écrit leurs résultats
+    au fur et à mesure (voir le module requetes_bornes)
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        options (Namespace): Les options de la ligne de commande (lot, format et sortie)
+        cache (CacheRequetes): La cache des résultats des requêtes
+
+    Returns:
+        int: 0 si toutes les requêtes ont réussi, 1 sinon
+    """
+    requetes = sys.stdin if options.lot == '-' else open(options.lot, encoding='utf-8')
+    sortie = sys.stdout if options.sortie is None else open(options.sortie, 'w', encoding='utf-8', newline='')
+    try:
+        nb_requetes, nb_erreurs = requetes_bornes.executer_lot(inventaire, requetes, sortie, options.format, cache)
+    finally:
+        if requetes is not sys.stdin:
+            requetes.close()
+        if sortie is not sys.stdout:
+            sortie.close()
+    print(f'{nb_requetes} requêtes exécutées, {nb_erreurs} en erreur', file=sys.stderr)
+    return 1 if nb_erreurs else 0
+
+
+def main(arguments=None):
+    """ Exécute le programme d'analyse des bornes
+
+    Args:
+        arguments (list): Les arguments de la ligne de commande. Par défaut, ceux de sys.argv.
+
+    Returns:
+        int: Le code de sortie du programme
+    """
+    analyseur = argparse.ArgumentParser(description="Programme d'analyse des bornes de stationnement")
+    analyseur.add_argument('--inventaire', help="fichier d'inventaire (demandé à l'utilisateur par défaut, sauf en "
+                                                "mode lot où 'vdq-bornestationnement.txt' est utilisé)")
+    analyseur.add_argument('--lot', metavar='FICHIER',
+                           help="exécuter sans menu les requêtes du fichier ('-' pour l'entrée standard)")
+    analyseur.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl',
+                           help="format des résultats en mode lot")
+    analyseur.add_argument('--sortie', help="fichier des résultats en mode lot (sortie standard par défaut)")
+    analyseur.add_argument('--instrumentation', action='store_true',
+                           help="mesurer les appels des fonctions de l'inventaire (aussi activée par "
+                                f"{instrumentation.VARIABLE_ACTIVATION}=1)")
+    analyseur.add_argument('--statistiques-json',
+                           help="fichier JSON où exporter les statistiques à la fin (active l'instrumentation, "
+                                f"remplace {instrumentation.VARIABLE_EXPORT})")
+    analyseur.add_argument('--taille-cache', type=int, default=128,
+                           help="nombre de résultats de recherche conservés (0 pour désactiver la cache)")
+    options = analyseur.parse_args(arguments)
+
+    if options.instrumentation:
+        instrumentation.activer()
+    instrumentation.activer_si_demande(options.statistiques_json)
+    cache = CacheRequetes(options.taille_cache)
+
+    if options.lot is not None:
+        nom_fichier = options.inventaire or 'vdq-bornestationnement.txt'
+        if not os.path.exists(nom_fichier):
+            analyseur.error(f"le fichier {nom_fichier} est introuvable")
+        code_sortie = executer_mode_lot(cache_inventaire.charger_inventaire(nom_fichier), options, cache)
+        sortie_messages = sys.stderr
+    else:
+        print("Execution du programme d'analyse des bornes")
+        print("-------------------------------------------")
+
+        nom_fichier = options.inventaire or choisir_fichier()
+
+        print('Lecture du fichier...')
+        inventaire = cache_inventaire.charger_inventaire(nom_fichier)
+        nb_bornes = ibornes.nombre_de_bornes(inventaire)
+        print(f'{nb_bornes} bornes répertoriées')
+
+        executer_menu(inventaire, cache)
+        code_sortie = 0
+        sortie_messages = sys.stdout
+
+    if instrumentation.est_active():
+        print("\nStatistiques d'exécution:", file=sortie_messages)
+        instrumentation.afficher_statistiques(sortie_messages)
+    if options.lot is None:
+        print("Fin du programme.")
+    return code_sortie
+
+
+if __name__ == '__main__':
+    sys.exit(main())
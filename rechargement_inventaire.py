@@ -0,0 +1,312 @@
+"""
+Module permettant de rafraîchir un inventaire des bornes déjà chargé lorsque la ville publie une nouvelle version du
+fichier, sans tout relire dans un nouvel inventaire ni reconstruire ses structures dérivées.
+
+Le nouveau fichier est comparé à l'inventaire à l'aide de l'identifiant de chaque borne dans le fichier source (la
+colonne ID, voir obtenir_attributs_borne()) ou, à défaut, de son numéro (la colonne NO_BORNE), par exemple pour
+une liste simple de bornes. Les bornes ajoutées, retirées et modifiées sont ensuite appliquées à l'inventaire une
+à une. Avec un Inventaire, les index par numéro, par côté et par rue, les colonnes ainsi que le suivi de la borne
+centrale sont mis à jour seulement pour les bornes touchées, et l'index spatial reste utilisable (voir Inventaire).
+
+La lecture du nouveau fichier reste proportionnelle à sa taille, mais tout le reste du rafraîchissement est
+proportionnel au nombre de bornes changées.
+"""
+
+import os
+import time
+
+import inventaire_bornes as ibornes
+
+# positions des attributs comparés: l'étiquette SOURCE dépend seulement du chemin utilisé pour lire le fichier
+_ATTRIBUTS_COMPARES = tuple(position for position, nom in enumerate(ibornes.ATTRIBUTS_SOURCE) if nom != 'SOURCE')
+
+
+def _calculer_cles(bornes_et_attributs, par_identifiant=True):
+    """
+    Calcule la clé de comparaison de chaque borne: son identifiant ID, ou son numéro normalisé si l'identifiant
+    n'est pas connu, accompagné du nombre d'occurrences précédentes de cet identifiant pour distinguer les doublons.
+
+    Args:
+        bornes_et_attributs (iterable): Les tuples (borne, attributs), où attributs est le tuple des attributs
+            ATTRIBUTS_SOURCE de la borne ou None
+        par_identifiant (bool): False pour utiliser le numéro de toutes les bornes, même celles dont l'identifiant
+            est connu
+
+    Returns:
+        dict: Les tuples (borne, attributs) par clé, dans l'ordre donné
+    """
+    cles = {}
+    occurrences = {}
+    for borne, attributs in bornes_et_attributs:
+        if par_identifiant and attributs is not None and attributs[0]:
+            identifiant = ('ID', attributs[0])
+        else:
+            identifiant = ('NO_BORNE', ibornes.normaliser_numero(borne['Numero']))
+        occurrence = occurrences.get(identifiant, 0)
+        occurrences[identifiant] = occurrence + 1
+        cles[identifiant, occurrence] = (borne, attributs)
+    return cles
+
+
+def comparer_inventaire(inventaire, nom_fichier, compacte=None):
+    """
+    Compare un inventaire à une nouvelle version de son fichier. L'attribut SOURCE n'est pas comparé: relire le même
+    fichier par un autre chemin ne modifie aucune borne.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        nom_fichier (str): Le fichier texte contenant la nouvelle version de l'inventaire
+        compacte (bool): True pour lire les bornes du fichier avec la classe Borne. Par défaut, la même
+            représentation que celle des bornes de l'inventaire.
+
+    Returns:
+        dict: Les bornes ajoutées ('ajoutees', liste de tuples (borne, attributs)), retirées ('retirees', liste de
+            bornes de l'inventaire) et modifiées ('modifiees', liste de tuples (ancienne borne, nouvelle borne,
+            attributs)), dans l'ordre du fichier ou de l'inventaire
+    """
+    if compacte is None:
+        compacte = bool(inventaire) and isinstance(inventaire[0], ibornes.Borne)
+
+    # les bornes d'une liste simple n'ont pas d'identifiant: celles du fichier sont alors associées par numéro
+    par_identifiant = not inventaire or isinstance(inventaire, ibornes.Inventaire) and bool(inventaire._attributs)
+    attributs_connus = inventaire._attributs if isinstance(inventaire, ibornes.Inventaire) else {}
+    anciennes = _calculer_cles(((borne, attributs_connus.get(id(borne))) for borne in inventaire), par_identifiant)
+    nouvelles = _calculer_cles(ibornes.iterer_fichier_bornes(nom_fichier, compacte=compacte, avec_attributs=True),
+                               par_identifiant)
+
+    differences = {'ajoutees': [], 'retirees': [], 'modifiees': []}
+    for cle, (nouvelle, attributs) in nouvelles.items():
+        ancien = anciennes.pop(cle, None)
+        if ancien is None:
+            differences['ajoutees'].append((nouvelle, attributs))
+        elif ancien[0] != nouvelle or (ancien[1] is not None and any(ancien[1][position] != attributs[position]
+                                                                     for position in _ATTRIBUTS_COMPARES)):
+            differences['modifiees'].append((ancien[0], nouvelle, attributs))
+    differences['retirees'] = [borne for borne, _ in anciennes.values()]
+    return differences
+
+
+def appliquer_differences(inventaire, differences):
+    """
+    Applique à un inventaire les différences retournées par comparer_inventaire(). Les bornes modifiées sont
+    remplacées à leur position, les bornes retirées sont enlevées et les bornes ajoutées sont placées à la fin.
+
+    Avec un Inventaire, la position de chaque borne touchée est trouvée par ses index en O(log n) (voir
+    Inventaire.remove()): seul le décalage des bornes qui suivent un retrait reste proportionnel à l'inventaire. Une
+    liste simple est parcourue une fois pour connaître les positions.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire, modifiée en place
+        differences (dict): Les différences retournées par comparer_inventaire()
+    """
+    if isinstance(inventaire, ibornes.Inventaire):
+        for ancienne, nouvelle, attributs in differences['modifiees']:
+            position = inventaire._trouver_position(ancienne)
+            if position == -1:
+                raise ValueError(f"borne modifiée absente de l'inventaire: {ancienne['Numero']}")
+            inventaire.remplacer(position, nouvelle, attributs)
+        for borne in differences['retirees']:
+            inventaire.remove(borne)
+    elif differences['modifiees'] or differences['retirees']:
+        positions = {id(borne): position for position, borne in enumerate(inventaire)}
+        for ancienne, nouvelle, _ in differences['modifiees']:
+            inventaire[positions[id(ancienne)]] = nouvelle
+        for position in sorted((positions[id(borne)] for borne in differences['retirees']), reverse=True):
+            inventaire.pop(position)
+
+    if differences['ajoutees']:
+        inventaire.extend(borne for borne, _ in differences['ajoutees'])
+        if isinstance(inventaire, ibornes.Inventaire):
+            for borne, attributs in differences['ajoutees']:
+                inventaire._attributs[id(borne)] = attributs
+
+
+def recharger_inventaire(inventaire, nom_fichier):
+    """
+    Met à jour un inventaire à partir d'une nouvelle version de son fichier.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire, modifiée en place
+        nom_fichier (str): Le fichier texte contenant la nouvelle version de l'inventaire
+
+    Returns:
+        dict: Les différences appliquées, telles que retournées par comparer_inventaire()
+    """
+    differences = comparer_inventaire(inventaire, nom_fichier)
+    appliquer_differences(inventaire, differences)
+    return differences
+
+
+def _obtenir_signature(nom_fichier):
+    """
+    Retourne la taille et la date de modification d'un fichier, ou None s'il n'existe pas.
+
+    Args:
+        nom_fichier (str): Le nom du fichier
+
+    Returns:
+        tuple: La taille et la date de modification en nanosecondes
+    """
+    try:
+        etat = os.stat(nom_fichier)
+    except OSError:
+        return None
+    return etat.st_size, etat.st_mtime_ns
+
+
+def surveiller_fichier(inventaire, nom_fichier, intervalle=1.0, rappel=None, arret=None, verrou=None):
+    """
+    Surveille le fichier d'un inventaire et recharge l'inventaire chaque fois que la taille ou la date de
+    modification du fichier change. Un fichier illisible ou incomplet (en cours d'écriture, par exemple) est relu
+    à l'intervalle suivant. Cette fonction ne retourne qu'à l'arrêt de la surveillance; on l'appelle généralement
+    dans un fil d'exécution dédié.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire, modifiée en place
+        nom_fichier (str): Le fichier texte contenant l'inventaire des bornes
+        intervalle (float): Le délai entre deux vérifications du fichier, en secondes
+        rappel (function): Si donnée, fonction appelée avec les différences de chaque rechargement
+        arret (threading.Event): Si donné, la surveillance s'arrête lorsque cet événement est déclenché
+        verrou (threading.Lock): Si donné, verrou pris pendant la mise à jour de l'inventaire, pour la synchroniser
+            avec les requêtes faites dans d'autres fils d'exécution
+    """
+    signature = _obtenir_signature(nom_fichier)
+    while not (arret.wait(intervalle) if arret is not None else time.sleep(intervalle)):
+        nouvelle_signature = _obtenir_signature(nom_fichier)
+        if nouvelle_signature is None or nouvelle_signature == signature:
+            continue
+        try:
+            differences = comparer_inventaire(inventaire, nom_fichier)
+        except (OSError, ValueError):
+            continue  # le fichier sera relu à l'intervalle suivant
+        signature = nouvelle_signature
+        if verrou is not None:
+            with verrou:
+                appliquer_differences(inventaire, differences)
+        else:
+            appliquer_differences(inventaire, differences)
+        if rappel is not None:
+            rappel(differences)
+
+
+if __name__ == '__main__':
+    import shutil
+    import tempfile
+    import threading
+
+    print('Exécution des tests...')
+    print('-----------------------')
+
+    def ecrire_fichier(nom_fichier, lignes):
+        with open(nom_fichier, 'w', encoding='utf-8', newline='') as f:
+            f.writelines(lignes)
+
+    def verifier_inventaire(inventaire, nom_fichier):
+        reference = ibornes.lire_fichier_bornes(nom_fichier)
+        cles = _calculer_cles((borne, inventaire._attributs.get(id(borne))) for borne in inventaire)
+        cles_reference = _calculer_cles((borne, reference._attributs.get(id(borne))) for borne in reference)
+        assert cles == cles_reference
+        reconstruit = ibornes.Inventaire(inventaire)
+        for cote in ('N', 'S', 'E', 'O', ''):
+            assert ibornes.selectionner_bornes_par_cote(inventaire, cote) == \
+                ibornes.selectionner_bornes_par_cote(reconstruit, cote)
+        for borne in reference:
+            assert ibornes.selectionner_borne_par_numero(inventaire, borne['Numero']) == \
+                ibornes.selectionner_borne_par_numero(reconstruit, borne['Numero'])
+
+    with tempfile.TemporaryDirectory() as dossier_temporaire:
+        nom_fichier_test = os.path.join(dossier_temporaire, 'bornes.txt')
+        shutil.copy('vdq-bornestationnement-reduit.txt', nom_fichier_test)
+        with open(nom_fichier_test, encoding='utf-8', newline='') as f:
+            lignes = f.readlines()
+
+# tests pour comparer_inventaire
+        inventaire_test = ibornes.lire_fichier_bornes(nom_fichier_test)
+        assert comparer_inventaire(inventaire_test, nom_fichier_test) == \
+            {'ajoutees': [], 'retirees': [], 'modifiees': []}
+        for autre_chemin in (os.path.relpath(nom_fichier_test),
+                             os.path.join(dossier_temporaire, '.', os.path.basename(nom_fichier_test))):
+            assert comparer_inventaire(inventaire_test, autre_chemin) == \
+                {'ajoutees': [], 'retirees': [], 'modifiees': []}
+
+        # ligne 1 modifiée (côté), ligne 2 retirée, une ligne ajoutée
+        champs = lignes[1].split(',')
+        champs[2] = 'O'
+        ajout = '999999,99999,N,100328,1re Avenue,-71.2362,46.8289\r\n'
+        ecrire_fichier(nom_fichier_test, [lignes[0], ','.join(champs)] + lignes[3:] + [ajout])
+        differences = comparer_inventaire(inventaire_test, nom_fichier_test)
+        assert [borne for borne, _, _ in differences['modifiees']] == [inventaire_test[0]]
+        assert differences['modifiees'][0][1]['Cote'] == 'O'
+        assert differences['retirees'] == [inventaire_test[1]]
+        assert [(borne['Numero'], attributs) for borne, attributs in differences['ajoutees']] == \
+            [('99999', ('999999', '100328', nom_fichier_test))]
+        assert len(comparer_inventaire(list(inventaire_test), nom_fichier_test)['modifiees']) == 1
+        compacte = comparer_inventaire(ibornes.lire_fichier_bornes('vdq-bornestationnement-reduit.txt', True),
+                                       nom_fichier_test)
+        assert isinstance(compacte['modifiees'][0][1], ibornes.Borne)
+
+
+# tests pour appliquer_differences et recharger_inventaire
+        ibornes.suivre_borne_centrale(inventaire_test)
+        version = inventaire_test.version
+        assert recharger_inventaire(inventaire_test, nom_fichier_test) == differences
+        assert inventaire_test.version > version
+        verifier_inventaire(inventaire_test, nom_fichier_test)
+        assert ibornes.trouver_borne_centrale(inventaire_test) == ibornes.trouver_borne_centrale(inventaire_test[:])
+        assert ibornes.obtenir_attributs_borne(inventaire_test, inventaire_test[-1])['ID'] == '999999'
+
+        # une liste simple est aussi mise à jour
+        liste_test = list(ibornes.lire_fichier_bornes('vdq-bornestationnement-reduit.txt'))
+        recharger_inventaire(liste_test, nom_fichier_test)
+        assert liste_test == list(inventaire_test)
+
+        # un numéro en double sans identifiant
+        ecrire_fichier(nom_fichier_test, [lignes[0]] + [',' + lignes[1].split(',', 1)[1]] * 2 + lignes[3:])
+        recharger_inventaire(inventaire_test, nom_fichier_test)
+        verifier_inventaire(inventaire_test, nom_fichier_test)
+        assert comparer_inventaire(inventaire_test, nom_fichier_test) == \
+            {'ajoutees': [], 'retirees': [], 'modifiees': []}
+
+        # un changement dans un gros inventaire ne touche que la borne concernée
+        nom_fichier_complet = os.path.join(dossier_temporaire, 'bornes_complet.txt')
+        shutil.copy('vdq-bornestationnement.txt', nom_fichier_complet)
+        with open(nom_fichier_complet, encoding='utf-8', newline='') as f:
+            lignes_complet = f.readlines()
+        inventaire_complet = ibornes.lire_fichier_bornes(nom_fichier_complet)
+        ecrire_fichier(nom_fichier_complet, lignes_complet[:100] + lignes_complet[101:])
+        differences = recharger_inventaire(inventaire_complet, nom_fichier_complet)
+        assert len(differences['retirees']) == 1 and not differences['ajoutees'] and not differences['modifiees']
+        verifier_inventaire(inventaire_complet, nom_fichier_complet)
+        arbre_complet = ibornes.obtenir_index_spatial(inventaire_complet)
+        champs_modifies = lignes_complet[200].split(',')
+        champs_modifies[4] = 'Rue Renommée'
+        ecrire_fichier(nom_fichier_complet, lignes_complet[:100] + lignes_complet[101:200] + [','.join(champs_modifies)]
+                       + lignes_complet[201:])
+        differences = recharger_inventaire(inventaire_complet, nom_fichier_complet)
+        assert len(differences['modifiees']) == 1 and not differences['ajoutees'] and not differences['retirees']
+        assert inventaire_complet[198]['Rue'] == 'Rue Renommée'
+        assert inventaire_complet._index_spatial is arbre_complet
+        verifier_inventaire(inventaire_complet, nom_fichier_complet)
+
+
+# tests pour surveiller_fichier
+        ecrire_fichier(nom_fichier_test, lignes)
+        inventaire_test = ibornes.lire_fichier_bornes(nom_fichier_test)
+        rechargements = []
+        arret_test = threading.Event()
+        surveillance = threading.Thread(target=surveiller_fichier, args=(inventaire_test, nom_fichier_test, 0.01),
+                                        kwargs={'rappel': rechargements.append, 'arret': arret_test,
+                                                'verrou': threading.Lock()})
+        surveillance.start()
+        ecrire_fichier(nom_fichier_test, [lignes[0], 'ligne incomplete\r\n'])
+        time.sleep(0.1)
+        ecrire_fichier(nom_fichier_test, lignes + [ajout])
+        for _ in range(500):
+            if rechargements:
+                break
+            time.sleep(0.01)
+        arret_test.set()
+        surveillance.join()
+        assert len(rechargements) == 1 and len(rechargements[0]['ajoutees']) == 1
+        verifier_inventaire(inventaire_test, nom_fichier_test)
+    print('rechargement_inventaire: OK')
@@ -0,0 +1,363 @@
+"""
+Module d'exécution de requêtes en lot sur l'inventaire des bornes. Les requêtes sont lues une à une (dans un fichier
+ou sur l'entrée standard) et leurs résultats sont écrits au fur et à mesure en lignes JSON ou en CSV, ce qui permet
+de traiter un grand nombre de requêtes avec un seul chargement de l'inventaire.
+
+Une requête s'écrit sur une ligne, sous forme de texte ou d'objet JSON:
+    rue <nom de la rue>                  {"requete": "rue", "rue": "Charest"}
+    cote <côté>                          {"requete": "cote", "cote": "N"}
+    numero <numéro>                      {"requete": "numero", "numero": 3008}
+    distance <n° 1> <n° 2> [métrique]    {"requete": "distance", "numero_1": 3008, "numero_2": 3170}
+    plus_pres <numéro> [autre_rue]       {"requete": "plus_pres", "numero": 3008, "autre_rue": true}
+    eloignees                            {"requete": "eloignees"}
+    centrale                             {"requete": "centrale"}
+La métrique de la requête distance est optionnelle (equirectangulaire par défaut, ou haversine; voir le module
+metriques_distance). Les lignes vides et celles qui commencent par # sont ignorées.
+"""
+
+import csv
+import json
+
+import inventaire_bornes as ibornes
+import metriques_distance
+
+# paramètres de chaque requête, dans l'ordre où ils sont donnés sous forme de texte
+PARAMETRES = {
+    'rue': ('rue',),
+    'cote': ('cote',),
+    'numero': ('numero',),
+    'distance': ('numero_1', 'numero_2', 'metrique'),
+    'plus_pres': ('numero', 'autre_rue'),
+    'eloignees': (),
+    'centrale': (),
+}
+
+PARAMETRES_OPTIONNELS = ('autre_rue', 'metrique')
+
+PARAMETRES_NUMERO = ('numero', 'numero_1', 'numero_2')
+
+# exceptions levées par une requête invalide, à rapporter comme une erreur de la requête
+ERREURS_REQUETE = (ValueError, TypeError, KeyError)
+
+COLONNES_CSV = ('ligne', 'requete', 'rang', 'Numero', 'Cote', 'Rue', 'Latitude', 'Longitude', 'distance', 'erreur')
+
+
+def analyser_requete(ligne):
+    """
+    Analyse une ligne de requête, sous forme de texte ou d'objet JSON.
+
+    Args:
+        ligne (str): La ligne contenant la requête
+
+    Returns:
+        tuple: Le nom de la requête et le dictionnaire de ses paramètres, ou None si la ligne est vide ou est un
+            commentaire
+
+    Raises:
+        ValueError: Si la requête est inconnue ou si ses paramètres sont invalides
+    """
+    ligne = ligne.strip()
+    if not ligne or ligne.startswith('#'):
+        return None
+
+    if ligne.startswith('{'):
+        try:
+            parametres = json.loads(ligne)
+        except json.JSONDecodeError as erreur:
+            raise ValueError(f'JSON invalide: {erreur}') from erreur
+        if not isinstance(parametres, dict):
+            raise ValueError('la requête doit être un objet JSON')
+        nom = parametres.pop('requete', None)
+        if not isinstance(nom, str):
+            raise ValueError(f'nom de requête invalide: {nom}')
+    else:
+        nom, _, reste = ligne.partition(' ')
+        reste = reste.strip()
+        if nom == 'rue':
+            valeurs = [reste] if reste else []
+        else:
+            valeurs = reste.split()
+        if nom in PARAMETRES and len(valeurs) > len(PARAMETRES[nom]):
+            raise ValueError(f'trop de paramètres pour la requête {nom}')
+        parametres = dict(zip(PARAMETRES.get(nom, ()), valeurs))
+        if nom == 'plus_pres' and 'autre_rue' in parametres:
+            if parametres['autre_rue'] != 'autre_rue':
+                raise ValueError(f"paramètre inconnu: {parametres['autre_rue']}")
+            parametres['autre_rue'] = True
+
+    if nom not in PARAMETRES:
+        raise ValueError(f'requête inconnue: {nom}')
+    obligatoires = [parametre for parametre in PARAMETRES[nom] if parametre not in PARAMETRES_OPTIONNELS]
+    manquants = [parametre for parametre in obligatoires if parametre not in parametres]
+    if manquants:
+        raise ValueError(f"paramètre manquant pour la requête {nom}: {', '.join(manquants)}")
+    inconnus = set(parametres) - set(PARAMETRES[nom])
+    if inconnus:
+        raise ValueError(f"paramètre inconnu: {', '.join(sorted(inconnus))}")
+    _valider_parametres(parametres)
+    return nom, parametres
+
+
+def _valider_parametres(parametres):
+    """
+    Vérifie le type des paramètres d'une requête. Un numéro de borne est un entier ou une chaîne (un nombre à
+    virgule n'est accepté que s'il est entier, et il est alors converti), autre_rue est un booléen et les autres
+    paramètres sont des chaînes.
+
+    Args:
+        parametres (dict): Les paramètres de la requête, modifiés sur place
+
+    Raises:
+        ValueError: Si un paramètre est d'un type invalide
+    """
+    for parametre, valeur in parametres.items():
+        if parametre in PARAMETRES_NUMERO:
+            if isinstance(valeur, float) and valeur.is_integer():
+                parametres[parametre] = int(valeur)
+            elif isinstance(valeur, bool) or not isinstance(valeur, (int, str)):
+                raise ValueError(f'numéro de borne invalide: {valeur}')
+        elif parametre == 'autre_rue':
+            if not isinstance(valeur, bool):
+                raise ValueError(f'autre_rue doit être true ou false: {valeur}')
+        elif not isinstance(valeur, str):
+            raise ValueError(f'le paramètre {parametre} doit être une chaîne: {valeur}')
+
+
+def _obtenir_borne(inventaire, numero, cache):
+    """
+    Retourne la borne d'un numéro donné.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        numero (int): Le numéro de la borne
+        cache (CacheRequetes): La cache des résultats, ou None
+
+    Returns:
+        dict: La borne
+
+    Raises:
+        ValueError: Si le numéro de borne est introuvable
+    """
+    borne = _appeler(cache, ibornes.selectionner_borne_par_numero, inventaire, numero)
+    if borne['Numero'] == -1:
+        raise ValueError(f'numéro de borne introuvable: {numero}')
+    return borne
+
+
+def _appeler(cache, fonction, inventaire, *args):
+    """
+    Appelle une fonction de requête, en passant par la cache si elle est donnée.
+
+    Args:
+        cache (CacheRequetes): La cache des résultats, ou None
+        fonction (function): La fonction de requête, qui reçoit l'inventaire en premier paramètre
+        inventaire (list): La liste des bornes de l'inventaire
+        args: Les autres paramètres de la fonction
+
+    Returns:
+        Le résultat de la fonction
+    """
+    if cache is None:
+        return fonction(inventaire, *args)
+    return cache.executer(fonction, inventaire, *args)
+
+
+def executer_requete(inventaire, nom, parametres, cache=None):
+    """
+    Exécute une requête sur l'inventaire.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        nom (str): Le nom de la requête, tel que retourné par analyser_requete()
+        parametres (dict): Les paramètres de la requête, tels que retournés par analyser_requete()
+        cache (CacheRequetes): La cache des résultats, pour ne pas refaire les requêtes répétées
+
+    Returns:
+        La liste des bornes trouvées, ou la distance en kilomètres pour la requête distance
+
+    Raises:
+        ValueError: Si un numéro de borne ou la métrique est introuvable, ou si la métrique ne donne pas une
+            distance en kilomètres
+    """
+    if nom == 'rue':
+        return _appeler(cache, ibornes.selectionner_bornes_par_rue, inventaire, str(parametres['rue']))
+    if nom == 'cote':
+        return _appeler(cache, ibornes.selectionner_bornes_par_cote, inventaire, str(parametres['cote']))
+    if nom == 'numero':
+        return [_obtenir_borne(inventaire, parametres['numero'], cache)]
+    if nom == 'distance':
+        metrique = metriques_distance.obtenir_metrique(parametres.get('metrique', 'equirectangulaire'))
+        if metrique.comparaison_seulement:
+            raise ValueError(f"la métrique {metrique.nom} ne donne pas une distance en kilomètres")
+        return ibornes.calculer_distance_bornes(_obtenir_borne(inventaire, parametres['numero_1'], cache),
+                                                _obtenir_borne(inventaire, parametres['numero_2'], cache),
+                                                metrique.nom)
+    if nom == 'plus_pres':
+        numero = _obtenir_borne(inventaire, parametres['numero'], cache)['Numero']
+        borne = _appeler(cache, ibornes.trouver_borne_plus_pres, inventaire, numero,
+                         parametres.get('autre_rue', False) is True)
+        return [borne] if borne['Numero'] != -1 else []
+    if nom == 'eloignees':
+        return list(_appeler(cache, ibornes.trouver_bornes_plus_eloignees, inventaire)) if len(inventaire) >= 2 else []
+    borne = _appeler(cache, ibornes.trouver_borne_centrale, inventaire)
+    return [borne] if borne['Numero'] != -1 else []
+
+
+def convertir_borne(borne):
+    """
+    Convertit une borne en dictionnaire sérialisable en JSON ou en CSV.
+
+    Args:
+        borne (dict): La borne
+
+    Returns:
+        dict: Les clés 'Numero', 'Cote', 'Rue', 'Latitude' et 'Longitude'
+    """
+    return {'Numero': borne['Numero'], 'Cote': borne['Cote'], 'Rue': borne['Rue'],
+            'Latitude': float(borne['Coordonnees'][0]), 'Longitude': float(borne['Coordonnees'][1])}
+
+
+def convertir_resultat(resultat):
+    """
+    Convertit le résultat d'une requête en valeur sérialisable en JSON.
+
+    Args:
+        resultat: Le résultat retourné par executer_requete()
+
+    Returns:
+        La liste des bornes converties avec convertir_borne(), ou la distance
+    """
+    if isinstance(resultat, list):
+        return [convertir_borne(borne) for borne in resultat]
+    return resultat
+
+
+def executer_lot(inventaire, lignes, sortie, format_sortie='jsonl', cache=None):
+    """
+    Exécute une suite de requêtes et écrit leurs résultats au fur et à mesure. Une requête invalide ne fait pas
+    échouer le lot: son erreur est écrite à la place de son résultat.
+
+    En JSON, chaque requête produit une ligne {"ligne", "requete", "resultat"} ou {"ligne", "requete", "erreur"},
+    où le résultat est une liste de bornes ou une distance. En CSV, chaque borne trouvée produit une ligne (voir
+    COLONNES_CSV), et une distance, une erreur ou une recherche sans résultat en produit une.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        lignes (iterable): Les lignes de requêtes, par exemple un fichier ouvert
+        sortie (file): Le fichier où écrire les résultats
+        format_sortie (str): 'jsonl' ou 'csv'
+        cache (CacheRequetes): La cache des résultats, pour ne pas refaire les requêtes répétées
+
+    Returns:
+        tuple: Le nombre de requêtes exécutées et le nombre de requêtes en erreur
+    """
+    if format_sortie not in ('jsonl', 'csv'):
+        raise ValueError(f'format de sortie inconnu: {format_sortie}')
+    if format_sortie == 'csv':
+        ecrivain = csv.DictWriter(sortie, COLONNES_CSV, lineterminator='\n')
+        ecrivain.writeheader()
+
+    nb_requetes = nb_erreurs = 0
+    for numero_ligne, ligne in enumerate(lignes, 1):
+        try:
+            requete = analyser_requete(ligne)
+            if requete is None:
+                continue
+            resultat = executer_requete(inventaire, *requete, cache)
+            erreur = None
+        except ERREURS_REQUETE as exception:
+            resultat, erreur = None, str(exception)
+            nb_erreurs += 1
+        nb_requetes += 1
+        texte = ligne.strip()
+
+        if format_sortie == 'jsonl':
+            element = {'ligne': numero_ligne, 'requete': texte}
+            if erreur is not None:
+                element['erreur'] = erreur
+            else:
+                element['resultat'] = convertir_resultat(resultat)
+            sortie.write(json.dumps(element, ensure_ascii=False) + '\n')
+        elif erreur is not None or not isinstance(resultat, list) or not resultat:
+            ecrivain.writerow({'ligne': numero_ligne, 'requete': texte, 'erreur': erreur,
+                               'distance': resultat if isinstance(resultat, float) else None})
+        else:
+            for rang, borne in enumerate(resultat, 1):
+                ecrivain.writerow({'ligne': numero_ligne, 'requete': texte, 'rang': rang, **convertir_borne(borne)})
+
+    return nb_requetes, nb_erreurs
+
+
+if __name__ == '__main__':
+    import io
+
+    from cache_requetes import CacheRequetes
+
+    print('Exécution des tests...')
+    print('-----------------------')
+
+    inventaire_test = ibornes.lire_fichier_bornes('vdq-bornestationnement-reduit.txt')
+
+# tests pour analyser_requete
+    assert analyser_requete('  ') is None
+    assert analyser_requete('# commentaire') is None
+    assert analyser_requete('rue Boulevard Charest Est') == ('rue', {'rue': 'Boulevard Charest Est'})
+    assert analyser_requete('distance 3008 3170') == ('distance', {'numero_1': '3008', 'numero_2': '3170'})
+    assert analyser_requete('plus_pres 3008 autre_rue') == ('plus_pres', {'numero': '3008', 'autre_rue': True})
+    assert analyser_requete('{"requete": "cote", "cote": "N"}') == ('cote', {'cote': 'N'})
+    assert analyser_requete('centrale') == ('centrale', {})
+    assert analyser_requete('{"requete": "numero", "numero": 3008.0}') == ('numero', {'numero': 3008})
+    assert analyser_requete('{"requete": "plus_pres", "numero": "3008", "autre_rue": false}')[1]['autre_rue'] is False
+    for requete_invalide in ('inconnue', 'distance 3008', 'centrale 1', 'plus_pres 1 2', '{"requete": "rue"}',
+                             '{"requete": "cote", "cote": "N", "x": 1}', '{invalide', 'rue', '{"requete": ["rue"]}',
+                             '{"requete": null}', '[1, 2]',
+                             '{"requete": "plus_pres", "numero": 3008, "autre_rue": "false"}',
+                             '{"requete": "numero", "numero": 3008.9}', '{"requete": "numero", "numero": true}',
+                             '{"requete": "numero", "numero": [3008]}', '{"requete": "rue", "rue": {"a": 1}}'):
+        try:
+            analyser_requete(requete_invalide)
+            assert False, requete_invalide
+        except ValueError:
+            pass
+
+
+# tests pour executer_requete
+    assert executer_requete(inventaire_test, 'numero', {'numero': 3008})[0]['Numero'] == '3008'
+    assert executer_requete(inventaire_test, 'distance', {'numero_1': '3008', 'numero_2': '3008'}) == 0.0
+    assert executer_requete(inventaire_test, *analyser_requete('distance 3008 3170 haversine')) == \
+        ibornes.calculer_distance_bornes(inventaire_test[2], inventaire_test[4], 'haversine')
+    assert executer_requete(inventaire_test, 'centrale', {}) == [ibornes.trouver_borne_centrale(inventaire_test)]
+    assert executer_requete(inventaire_test, 'plus_pres', {'numero': '3170'})[0]['Numero'] == '3008'
+    assert executer_requete([], 'eloignees', {}) == executer_requete([], 'centrale', {}) == []
+    for nom_test, parametres_test in (('numero', {'numero': 5555}),
+                                      ('distance', {'numero_1': 3008, 'numero_2': 3170, 'metrique': 'inconnue'}),
+                                      ('distance', {'numero_1': 3008, 'numero_2': 3170, 'metrique': 'carree'})):
+        try:
+            executer_requete(inventaire_test, nom_test, parametres_test)
+            assert False
+        except ValueError:
+            pass
+
+
+# tests pour executer_lot
+    requetes = ['rue Charest', '', 'numero 5555', 'distance 3008 3170', 'centrale', 'centrale']
+    sortie_test = io.StringIO()
+    cache_test = CacheRequetes()
+    assert executer_lot(inventaire_test, requetes, sortie_test, cache=cache_test) == (5, 1)
+    # une requête mal formée produit une ligne d'erreur sans interrompre le lot
+    sortie_invalide = io.StringIO()
+    assert executer_lot(inventaire_test, ['{"requete": ["rue"]}', 'centrale'], sortie_invalide) == (2, 1)
+    assert 'erreur' in json.loads(sortie_invalide.getvalue().splitlines()[0])
+    elements = [json.loads(ligne) for ligne in sortie_test.getvalue().splitlines()]
+    assert [element['ligne'] for element in elements] == [1, 3, 4, 5, 6]
+    assert len(elements[0]['resultat']) == 2 and elements[0]['resultat'][0]['Rue'] == 'Boulevard Charest Est'
+    assert 'erreur' in elements[1]
+    assert elements[2]['resultat'] == ibornes.calculer_distance_bornes(inventaire_test[2], inventaire_test[4])
+    assert elements[3] == {**elements[4], 'ligne': 5} and cache_test.nb_succes >= 1
+
+    sortie_test = io.StringIO()
+    executer_lot(inventaire_test, requetes, sortie_test, 'csv')
+    rangees = list(csv.DictReader(io.StringIO(sortie_test.getvalue())))
+    assert [rangee['ligne'] for rangee in rangees] == ['1', '1', '3', '4', '5', '6']
+    assert rangees[1]['rang'] == '2' and rangees[2]['erreur'] and rangees[3]['distance']
+    print('requetes_bornes: OK')
@@ -0,0 +1,318 @@
+"""
+Module du serveur local de requêtes sur l'inventaire des bornes. L'inventaire est chargé une seule fois au démarrage
+et reste en mémoire; les clients s'y connectent par TCP ou par socket Unix.
+
+Le protocole est ligne par ligne: le client envoie une requête par ligne, dans le format du module requetes_bornes
+(texte ou objet JSON), et le serveur répond, dans le même ordre, par une ligne JSON {"resultat": ...} ou
+{"erreur": "..."}. Une ligne invalide ou trop longue reçoit une erreur sans fermer la connexion. Plusieurs clients
+sont servis en même temps.
+
+Les requêtes rapides (rue, côté, numéro, distance, borne la plus proche) sont exécutées directement dans la boucle
+d'événements. Les requêtes coûteuses (borne centrale, bornes les plus éloignées) sont confiées à des processus de
+calcul, qui chargent chacun l'inventaire, pour ne pas bloquer la boucle. Comme l'inventaire ne change pas pendant
+que le serveur tourne, leur résultat est conservé et partagé par les requêtes identiques, même simultanées.
+
+Utilisation:
+    python serveur_bornes.py --port 8765
+    python serveur_bornes.py --unix /tmp/bornes.sock
+    python serveur_bornes.py --tests
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+import signal
+import sys
+
+import cache_inventaire
+from cache_requetes import CacheRequetes
+import requetes_bornes
+
+REQUETES_LOURDES = ('centrale', 'eloignees')
+
+TAILLE_MAX_LIGNE = 2 ** 16  # octets
+
+# inventaire de chaque processus de calcul, chargé par _initialiser_processus()
+_inventaire_processus = None
+
+
+def _initialiser_processus(nom_fichier):
+    """
+    Initialise un processus de calcul en chargeant l'inventaire.
+
+    Args:
+        nom_fichier (str): Le fichier texte contenant l'inventaire des bornes
+    """
+    global _inventaire_processus
+    _inventaire_processus = cache_inventaire.charger_inventaire(nom_fichier)
+
+
+def _executer_dans_processus(nom, parametres):
+    """
+    Exécute une requête dans un processus de calcul.
+
+    Args:
+        nom (str): Le nom de la requête
+        parametres (dict): Les paramètres de la requête
+
+    Returns:
+        Le résultat converti par requetes_bornes.convertir_resultat()
+    """
+    return requetes_bornes.convertir_resultat(requetes_bornes.executer_requete(_inventaire_processus, nom, parametres))
+
+
+class ServeurBornes:
+    """
+    Serveur de requêtes sur un inventaire des bornes gardé en mémoire.
+    """
+
+    def __init__(self, nom_fichier, nb_processus=None, taille_cache=1024, taille_max_ligne=TAILLE_MAX_LIGNE):
+        """
+        Args:
+            nom_fichier (str): Le fichier texte contenant l'inventaire des bornes
+            nb_processus (int): Le nombre de processus de calcul pour les requêtes coûteuses. Par défaut, le nombre
+                de processeurs.
+            taille_cache (int): Le nombre de résultats de requêtes rapides conservés
+            taille_max_ligne (int): La longueur maximale d'une ligne de requête, en octets
+        """
+        self.nom_fichier = nom_fichier
+        self.taille_max_ligne = taille_max_ligne
+        self.inventaire = cache_inventaire.charger_inventaire(nom_fichier)
+        self.cache = CacheRequetes(taille_cache)
+        # les processus sont créés à la demande, pendant que des clients sont connectés: lancés par fork, ils
+        # hériteraient des sockets ouverts et empêcheraient leur fermeture
+        self.executeur = ProcessPoolExecutor(nb_processus or os.cpu_count() or 1,
+                                             mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_initialiser_processus, initargs=(nom_fichier,))
+        self._resultats_lourds = {}
+
+    async def repondre(self, ligne):
+        """
+        Calcule la réponse à une ligne de requête.
+
+        Args:
+            ligne (str): La ligne de requête
+
+        Returns:
+            dict: La réponse, {'resultat': ...} ou {'erreur': '...'}
+        """
+        try:
+            requete = requetes_bornes.analyser_requete(ligne)
+            if requete is None:
+                return {'erreur': 'requête vide'}
+            nom, parametres = requete
+            if nom not in REQUETES_LOURDES:
+                resultat = requetes_bornes.executer_requete(self.inventaire, nom, parametres, self.cache)
+                return {'resultat': requetes_bornes.convertir_resultat(resultat)}
+        except requetes_bornes.ERREURS_REQUETE as erreur:
+            return {'erreur': str(erreur)}
+
+        futur = self._resultats_lourds.get(nom)
+        if futur is None:
+            futur = asyncio.get_running_loop().run_in_executor(self.executeur, _executer_dans_processus, nom,
+                                                               parametres)
+            self._resultats_lourds[nom] = futur
+        try:
+            return {'resultat': await asyncio.shield(futur)}
+        except Exception as erreur:  # le calcul a échoué: il sera refait à la prochaine requête
+            self._resultats_lourds.pop(nom, None)
+            return {'erreur': f'erreur de calcul: {erreur}'}
+
+    async def traiter_connexion(self, lecteur, ecrivain):
+        """
+        Sert un client: lit ses requêtes ligne par ligne et lui écrit les réponses dans le même ordre.
+
+        Args:
+            lecteur (StreamReader): Le flux des requêtes du client
+            ecrivain (StreamWriter): Le flux des réponses au client
+        """
+        try:
+            while True:
+                try:
+                    ligne = await lecteur.readuntil(b'\n')
+                except asyncio.IncompleteReadError as erreur:  # fin de la connexion
+                    if not erreur.partial:
+                        break
+                    ligne = erreur.partial
+                except asyncio.LimitOverrunError:
+                    await _sauter_ligne(lecteur)
+                    ligne = None
+                if ligne is None:
+                    reponse = {'erreur': f'ligne de plus de {self.taille_max_ligne} octets'}
+                else:
+                    try:
+                        reponse = await self.repondre(ligne.decode('utf-8', errors='replace'))
+                    except Exception as erreur:  # une requête qui échoue ne doit pas couper la connexion
+                        reponse = {'erreur': f'erreur interne: {erreur}'}
+                ecrivain.write(json.dumps(reponse, ensure_ascii=False).encode('utf-8') + b'\n')
+                await ecrivain.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # client déconnecté, y compris au milieu d'une ligne trop longue
+        finally:
+            ecrivain.close()
+
+    async def demarrer(self, hote='127.0.0.1', port=8765, chemin_unix=None):
+        """
+        Démarre l'écoute des connexions.
+
+        Args:
+            hote (str): L'adresse TCP d'écoute
+            port (int): Le port TCP d'écoute (0 pour un port libre choisi par le système)
+            chemin_unix (str): Le chemin d'un socket Unix, utilisé à la place de TCP s'il est donné
+
+        Returns:
+            asyncio.Server: Le serveur démarré
+        """
+        if chemin_unix is not None:
+            return await asyncio.start_unix_server(self.traiter_connexion, chemin_unix, limit=self.taille_max_ligne)
+        return await asyncio.start_server(self.traiter_connexion, hote, port, limit=self.taille_max_ligne)
+
+    def fermer(self):
+        """
+        Arrête les processus de calcul.
+        """
+        self.executeur.shutdown(cancel_futures=True)
+
+
+async def _sauter_ligne(lecteur):
+    """
+    Ignore le reste d'une ligne trop longue, jusqu'au prochain saut de ligne inclus, sans la garder en mémoire.
+
+    Args:
+        lecteur (StreamReader): Le flux des requêtes du client
+
+    Raises:
+        asyncio.IncompleteReadError: Si la connexion se termine avant la fin de la ligne
+    """
+    while True:
+        try:
+            await lecteur.readuntil(b'\n')
+            return
+        except asyncio.LimitOverrunError as erreur:
+            await lecteur.readexactly(erreur.consumed)
+
+
+async def _servir(options):
+    """
+    Démarre le serveur et le fait tourner jusqu'à ce qu'il reçoive SIGINT ou SIGTERM.
+
+    Args:
+        options (Namespace): Les options de la ligne de commande
+    """
+    arret = asyncio.Event()
+    boucle = asyncio.get_running_loop()
+    for signal_arret in (signal.SIGINT, signal.SIGTERM):
+        try:
+            boucle.add_signal_handler(signal_arret, arret.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: KeyboardInterrupt interrompt asyncio.run()
+
+    serveur_bornes = ServeurBornes(options.inventaire, options.nb_processus, options.taille_cache,
+                                   options.taille_max_ligne)
+    try:
+        serveur = await serveur_bornes.demarrer(options.hote, options.port, options.unix)
+        adresses = ', '.join(str(socket.getsockname()) for socket in serveur.sockets)
+        print(f'{len(serveur_bornes.inventaire)} bornes chargées, en écoute sur {adresses}', flush=True)
+        async with serveur:
+            await arret.wait()
+    finally:
+        serveur_bornes.fermer()
+        if options.unix is not None and os.path.exists(options.unix):
+            os.remove(options.unix)
+    print('Arrêt du serveur.')
+
+
+def main(arguments=None):
+    """
+    Exécute le serveur à partir des arguments de la ligne de commande.
+
+    Args:
+        arguments (list): Les arguments de la ligne de commande. Par défaut, ceux de sys.argv.
+    """
+    analyseur = argparse.ArgumentParser(description="Serveur de requêtes sur l'inventaire des bornes")
+    analyseur.add_argument('--inventaire', default='vdq-bornestationnement.txt', help="fichier d'inventaire")
+    analyseur.add_argument('--hote', default='127.0.0.1', help="adresse TCP d'écoute")
+    analyseur.add_argument('--port', type=int, default=8765, help="port TCP d'écoute")
+    analyseur.add_argument('--unix', help="chemin d'un socket Unix, à utiliser à la place de TCP")
+    analyseur.add_argument('--nb-processus', type=int, help="nombre de processus pour les requêtes coûteuses")
+    analyseur.add_argument('--taille-cache', type=int, default=1024, help="nombre de résultats conservés")
+    analyseur.add_argument('--taille-max-ligne', type=int, default=TAILLE_MAX_LIGNE,
+                           help="longueur maximale d'une ligne de requête, en octets")
+    options = analyseur.parse_args(arguments)
+    if not os.path.exists(options.inventaire):
+        analyseur.error(f'le fichier {options.inventaire} est introuvable')
+
+    try:
+        asyncio.run(_servir(options))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__' and sys.argv[1:] != ['--tests']:
+    main()
+elif __name__ == '__main__':
+    print('Exécution des tests...')
+    print('-----------------------')
+
+# tests pour ServeurBornes
+    async def envoyer_lignes(port, lignes):
+        lecteur, ecrivain = await asyncio.open_connection('127.0.0.1', port, limit=2 ** 24)
+        reponses = []
+        try:
+            for ligne in lignes:
+                ecrivain.write(ligne + b'\n')
+                await ecrivain.drain()
+                reponses.append(json.loads(await lecteur.readline()))
+            ecrivain.write_eof()
+            assert await lecteur.read() == b''  # le serveur ferme la connexion après la dernière requête
+        finally:
+            ecrivain.close()
+        return reponses
+
+    def executer_en_panne(*args):
+        raise RuntimeError('panne simulée')
+
+    async def tester_serveur():
+        serveur_test = ServeurBornes('vdq-bornestationnement.txt', nb_processus=1, taille_max_ligne=1024)
+        try:
+            serveur = await serveur_test.demarrer(port=0)
+            port_test = serveur.sockets[0].getsockname()[1]
+            async with serveur:
+                reponses = await envoyer_lignes(port_test, [
+                    b'numero 3008',
+                    b'{"requete": ["rue"]}',
+                    b'{"requete": "numero", "numero": 3008.5}',
+                    b'',
+                    b'rue ' + b'x' * 5000,
+                    b'numero 3008',
+                    b'centrale',
+                ])
+                # une requête qui échoue de façon imprévue reçoit aussi une erreur
+                executer_requete = requetes_bornes.executer_requete
+                requetes_bornes.executer_requete = executer_en_panne
+                try:
+                    reponses_imprevues = await envoyer_lignes(port_test, [b'cote N'])
+                finally:
+                    requetes_bornes.executer_requete = executer_requete
+        finally:
+            serveur_test.fermer()
+        return reponses + reponses_imprevues
+
+    reponses_test = asyncio.run(tester_serveur())
+    inventaire_test = cache_inventaire.charger_inventaire('vdq-bornestationnement.txt')
+
+    def executer_localement(ligne):
+        resultat = requetes_bornes.executer_requete(inventaire_test, *requetes_bornes.analyser_requete(ligne))
+        return {'resultat': json.loads(json.dumps(requetes_bornes.convertir_resultat(resultat)))}
+
+    assert reponses_test[0] == executer_localement('numero 3008')
+    assert [list(reponse) for reponse in reponses_test[1:5]] == [['erreur']] * 4
+    assert reponses_test[3] == {'erreur': 'requête vide'}
+    assert reponses_test[4] == {'erreur': 'ligne de plus de 1024 octets'}
+    assert reponses_test[5] == reponses_test[0]
+    assert reponses_test[6] == executer_localement('centrale')
+    assert reponses_test[7] == {'erreur': 'erreur interne: panne simulée'}
+    print('serveur_bornes: OK')
@@ -0,0 +1,177 @@
+"""
+Module permettant de trouver la borne la plus proche de plusieurs bornes à la fois, en répartissant les recherches
+entre plusieurs processus.
+
+Les coordonnées projetées des bornes et les informations nécessaires aux filtres sont placées une seule fois dans un
+segment de mémoire partagée. Chaque processus y accède en lecture seule et construit son propre index spatial, ce
+qui évite de transmettre l'inventaire à chacun d'eux.
+"""
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+
+import index_spatial
+import inventaire_bornes as ibornes
+
+# état de chaque processus de calcul, initialisé par _initialiser_processus()
+_etat_processus = {}
+
+
+def _preparer_donnees(inventaire):
+    """
+    Construit les tableaux partagés avec les processus de calcul.
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+
+    Returns:
+        tuple: Les tableaux (x, y, groupes, rues). Deux bornes ont le même groupe si elles sont égales et le même
+            code de rue si elles ont le même nom de rue.
+    """
+    colonnes = ibornes.obtenir_colonnes(inventaire)
+    codes_groupes = {}
+    groupes = array('q', [codes_groupes.setdefault(frozenset(borne.items()), len(codes_groupes))
+                          for borne in inventaire])
+    codes_rues = {}
+    rues = array('q', [codes_rues.setdefault(rue, len(codes_rues)) for rue in colonnes['Rue']])
+    return colonnes['X'], colonnes['Y'], groupes, rues
+
+
+def _initialiser_etat(colonnes):
+    """
+    Prépare le processus courant pour les recherches: conserve les tableaux et construit l'index spatial.
+
+    Args:
+        colonnes (tuple): Les tableaux (x, y, groupes, rues), tels que retournés par _preparer_donnees()
+    """
+    xs, ys, groupes, rues = colonnes
+    _etat_processus.update(xs=xs, ys=ys, groupes=groupes, rues=rues,
+                           arbre=index_spatial.construire_arbre_kd(list(zip(xs, ys))))
+
+
+def _initialiser_processus(nom_memoire, nb_bornes):
+    """
+    Initialise un processus de calcul: attache le segment de mémoire partagée, sans copier son contenu, et
+    construit l'index spatial.
+
+    Args:
+        nom_memoire (str): Le nom du segment de mémoire partagée
+        nb_bornes (int): Le nombre de bornes de l'inventaire
+    """
+    memoire = shared_memory.SharedMemory(name=nom_memoire)
+    taille = 8 * nb_bornes
+    colonnes = tuple(memoire.buf[debut:debut + taille].cast(code)
+                     for debut, code in zip(range(0, 4 * taille, taille), 'ddqq'))
+    _etat_processus['memoire'] = memoire
+    _initialiser_etat(colonnes)
+
+
+def _chercher_plus_proches(positions, autre_rue):
+    """
+    Trouve la borne la plus proche de chacune des bornes données, dans un processus de calcul initialisé.
+
+    Args:
+        positions (list): Les positions des bornes de référence dans l'inventaire
+        autre_rue (bool): True si les bornes trouvées doivent se trouver sur une autre rue
+
+    Returns:
+        list: La position de la borne la plus proche de chaque borne de référence, ou -1 s'il n'y en a pas
+    """
+    etat = _etat_processus
+    xs, ys, groupes, rues, arbre = etat['xs'], etat['ys'], etat['groupes'], etat['rues'], etat['arbre']
+    resultats = []
+    for position in positions:
+        groupe = groupes[position]
+        if autre_rue:
+            rue = rues[position]
+
+            def accepter(candidate):
+                return groupes[candidate] != groupe and rues[candidate] != rue
+        else:
+            def accepter(candidate):
+                return groupes[candidate] != groupe
+
+        resultats.append(index_spatial.trouver_plus_proche(arbre, xs[position], ys[position], accepter)[0])
+    return resultats
+
+
+def trouver_bornes_plus_pres_lot(inventaire, numeros=None, autre_rue=False, nb_processus=None, taille_lot=512):
+    """
+    Trouve la borne la plus proche de chacune des bornes données, avec les mêmes résultats que des appels successifs
+    à trouver_borne_plus_pres().
+
+    Args:
+        inventaire (list): La liste des bornes de l'inventaire
+        numeros (list): Les numéros des bornes de référence. Par défaut, toutes les bornes de l'inventaire.
+        autre_rue (bool): True si les bornes retournées doivent se trouver sur une autre rue, False sinon
+        nb_processus (int): Le nombre de processus de calcul. Par défaut, le nombre de processeurs. Avec 1, les
+            recherches se font dans le processus courant.
+        taille_lot (int): Le nombre de recherches confiées à la fois à un processus
+
+    Returns:
+        list: La borne la plus proche de chaque borne de référence, dans l'ordre des numéros. Comme pour
+            trouver_borne_plus_pres(), le dictionnaire {'Numero': -1} est retourné pour un numéro introuvable ou
+            une borne sans voisine.
+    """
+    if not isinstance(inventaire, ibornes.Inventaire):
+        inventaire = ibornes.Inventaire(inventaire)  # pour chercher les numéros avec l'index
+    if numeros is None:
+        numeros = [borne['Numero'] for borne in inventaire]
+    positions_bornes = {id(borne): position for position, borne in enumerate(inventaire)}
+    positions = [positions_bornes.get(id(ibornes.selectionner_borne_par_numero(inventaire, numero)), -1)
+                 for numero in numeros]
+    a_chercher = [position for position in positions if position != -1]
+    if nb_processus is None:
+        nb_processus = os.cpu_count() or 1
+    nb_processus = max(1, min(nb_processus, -(-len(a_chercher) // taille_lot)))
+
+    lots = [a_chercher[debut:debut + taille_lot] for debut in range(0, len(a_chercher), taille_lot)]
+    colonnes = _preparer_donnees(inventaire)
+    if nb_processus == 1:
+        _initialiser_etat(colonnes)
+        try:
+            resultats_lots = [_chercher_plus_proches(lot, autre_rue) for lot in lots]
+        finally:
+            _etat_processus.clear()
+    else:
+        taille = 8 * len(inventaire)
+        memoire = shared_memory.SharedMemory(create=True, size=4 * taille)
+        try:
+            for debut, colonne in zip(range(0, 4 * taille, taille), colonnes):
+                memoire.buf[debut:debut + taille] = colonne.tobytes()
+            with ProcessPoolExecutor(nb_processus, initializer=_initialiser_processus,
+                                     initargs=(memoire.name, len(inventaire))) as executeur:
+                resultats_lots = list(executeur.map(_chercher_plus_proches, lots, [autre_rue] * len(lots)))
+        finally:
+            memoire.close()
+            memoire.unlink()
+
+    trouvees = iter(position for resultats in resultats_lots for position in resultats)
+    bornes = []
+    for position in positions:
+        position_trouvee = next(trouvees) if position != -1 else -1
+        bornes.append(inventaire[position_trouvee] if position_trouvee != -1 else {'Numero': -1})
+    return bornes
+
+
+if __name__ == '__main__':
+    print('Exécution des tests...')
+    print('-----------------------')
+
+    inventaire = ibornes.lire_fichier_bornes('vdq-bornestationnement.txt')
+    inventaire_test = ibornes.lire_fichier_bornes('vdq-bornestationnement-reduit.txt')
+
+# tests pour trouver_bornes_plus_pres_lot
+    resultat = trouver_bornes_plus_pres_lot(inventaire_test, [3170, 5555, '4034'], nb_processus=1)
+    assert [borne['Numero'] for borne in resultat] == ['3008', -1, '4083']
+    assert trouver_bornes_plus_pres_lot(inventaire_test[:1], nb_processus=1) == [{'Numero': -1}]
+    assert trouver_bornes_plus_pres_lot(list(inventaire_test), [3170], True, nb_processus=1)[0]['Numero'] == '3008'
+    assert trouver_bornes_plus_pres_lot([], nb_processus=1) == []
+
+    for autre_rue in (False, True):
+        attendu = [ibornes.trouver_borne_plus_pres(inventaire, borne['Numero'], autre_rue) for borne in inventaire]
+        assert trouver_bornes_plus_pres_lot(inventaire, autre_rue=autre_rue, nb_processus=2, taille_lot=200) == attendu
+        assert trouver_bornes_plus_pres_lot(inventaire, autre_rue=autre_rue, nb_processus=1) == attendu
+    print('voisins_lot: OK')